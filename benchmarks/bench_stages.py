@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# benchmark the working tree rather than an installed xmind2testcase
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gen_xmind import gen_xmind_file, add_generator_arguments, get_generator_options  # noqa: E402
+from xmind2testcase.__about__ import __version__  # noqa: E402
+from xmind2testcase.loader import load_xmind_content  # noqa: E402
+from xmind2testcase.parser import xmind_to_testsuites  # noqa: E402
+from xmind2testcase.testlink import testsuites_to_testlink_xml_file  # noqa: E402
+from xmind2testcase.utils import testsuites_to_testcase_list, testcases_to_json_file, testsuites_to_excel_file  # noqa
+from xmind2testcase.zentao import testcases_to_zentao_csv_file  # noqa: E402
+
+"""
+Time and memory-profile every stage of the XMind file conversion on its own:
+
+    zip_load             load_xmind_content: unzip and parse content.xml/content.json to the sheet dicts
+    xmind_to_testsuites  parse the sheet dicts to `TestSuite` list
+    reparse              parse the sheet dicts again after a topic of the last testsuite is edited, the unchanged
+                         testsuites are reused from `xmind2testcase.cache.suite_cache`
+    to_dict              convert the `TestSuite` list to dicts
+    json                 the testcase json exporter
+    testlink             the TestLink xml exporter
+    zentao               the Zentao csv exporter
+    excel                the excel(.xls) exporter
+
+Each stage gets the output of the previous stages as its input, which is prepared before timing it. The wall
+time of every run is recorded, and the peak memory is measured by tracemalloc in an extra run, since tracing
+the allocations slows down the stage. The results are written as json:
+
+{"meta": {"version": "1.5.0", "python": "3.8.10", "xmind_file": "...", "topics": 3906, ...},
+ "stages": {"zip_load": {"runs": [0.031, ...], "min": 0.030, "median": 0.031, "mean": 0.031, "peak_memory": 5242880},
+            ...}}
+
+With --baseline, the results are compared with a previous result file, and the exit code is 1 if the median time
+or the peak memory of any stage is more than --tolerance worse than the baseline. Usage:
+
+    python benchmarks/bench_stages.py --breadth 8 --depth 2 -o results.json
+    python benchmarks/bench_stages.py --xmind docs/xmind_testcase_demo.xmind --repeat 10 --baseline results.json
+"""
+
+STAGES = ('zip_load', 'xmind_to_testsuites', 'reparse', 'to_dict', 'json', 'testlink', 'zentao', 'excel')
+
+
+def gen_stages(xmind_file, output_dir):
+    """Yield (stage name, prepare function, stage function), the result of prepare() is passed to the stage"""
+    def load():
+        return load_xmind_content(xmind_file)
+
+    def parse():
+        return xmind_to_testsuites(load())
+
+    def parse_testcases():
+        return testsuites_to_testcase_list(parse())
+
+    edits = itertools.count(1)
+
+    def parse_and_edit():
+        sheets = load()
+        xmind_to_testsuites(sheets, use_cache=True)
+        topic = sheets[0]['topic']['topics'][-1]
+        while topic.get('topics'):
+            topic = topic['topics'][0]
+        # a different edit every run, otherwise the edited testsuite is cached by the previous run
+        topic['title'] += ' (edit {})'.format(next(edits))
+        return sheets
+
+    yield 'zip_load', lambda: xmind_file, load_xmind_content
+    yield 'xmind_to_testsuites', load, xmind_to_testsuites
+    yield 'reparse', parse_and_edit, lambda sheets: xmind_to_testsuites(sheets, use_cache=True)
+    yield 'to_dict', parse, lambda testsuites: [testsuite.to_dict() for testsuite in testsuites]
+    yield 'json', parse_testcases, lambda testcases: testcases_to_json_file(
+        testcases, os.path.join(output_dir, 'testcases.json'))
+    yield 'testlink', parse, lambda testsuites: testsuites_to_testlink_xml_file(
+        testsuites, os.path.join(output_dir, 'testcases.xml'))
+    yield 'zentao', parse_testcases, lambda testcases: testcases_to_zentao_csv_file(
+        testcases, os.path.join(output_dir, 'testcases.csv'))
+    yield 'excel', parse, lambda testsuites: testsuites_to_excel_file(testsuites, output_dir)
+
+
+def bench_stage(prepare, stage, repeat):
+    """Return the wall time of every run and the peak memory of the stage"""
+    runs = []
+    for _ in range(repeat):
+        data = prepare()
+        begin = time.perf_counter()
+        stage(data)
+        runs.append(time.perf_counter() - begin)
+
+    data = prepare()
+    tracemalloc.start()
+    try:
+        stage(data)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'runs': runs, 'min': min(runs), 'median': statistics.median(runs), 'mean': statistics.mean(runs),
+            'peak_memory': peak_memory}
+
+
+def run_benchmark(xmind_file, repeat=5, stages=STAGES):
+    """Benchmark the stages on the XMind file, and return the results dict"""
+    results = {}
+    output_dir = tempfile.mkdtemp(prefix='xmind2testcase_bench_')
+    try:
+        for name, prepare, stage in gen_stages(xmind_file, output_dir):
+            if name in stages:
+                results[name] = bench_stage(prepare, stage, repeat)
+                logging.info('%-20s median: %.4fs  peak memory: %.1fKB', name, results[name]['median'],
+                             results[name]['peak_memory'] / 1024)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Return the regressions: the stages whose median time or peak memory is worse than the baseline"""
+    regressions = []
+    for name, result in results['stages'].items():
+        base = baseline['stages'].get(name)
+        if not base:
+            continue
+        for metric in ('median', 'peak_memory'):
+            if base[metric] and result[metric] > base[metric] * (1 + tolerance):
+                regressions.append('{} {}: {:.6g} -> {:.6g} (+{:.1%})'.format(
+                    name, metric, base[metric], result[metric], result[metric] / base[metric] - 1))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the stages of XMind file conversion')
+    parser.add_argument('--xmind', help='benchmark this XMind file instead of a generated one')
+    parser.add_argument('--repeat', type=int, default=5, help='the number of timed runs of every stage')
+    parser.add_argument('--stages', default=','.join(STAGES), help='the stages to run, default: all')
+    parser.add_argument('-o', '--output', help='write the results to this json file')
+    parser.add_argument('--baseline', help='compare the results with a previous result file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='the allowed regression ratio, default: 0.2')
+    add_generator_arguments(parser)
+    options = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    stages = [stage.strip() for stage in options.stages.split(',') if stage.strip()]
+    for stage in stages:
+        if stage not in STAGES:
+            parser.error('unknown stage: {}, should be one of {}'.format(stage, ', '.join(STAGES)))
+
+    meta = {'version': __version__, 'python': platform.python_version(), 'platform': platform.platform(),
+            'repeat': options.repeat}
+    temp_dir = None
+    if options.xmind:
+        xmind_file = options.xmind
+    else:
+        temp_dir = tempfile.mkdtemp(prefix='xmind2testcase_bench_')
+        xmind_file = os.path.join(temp_dir, 'synthetic.xmind')
+        generator_options = get_generator_options(options)
+        meta['topics'] = gen_xmind_file(xmind_file, **generator_options)
+        meta['generator'] = dict(generator_options, markers=options.markers)
+
+    # the parser logs every testcase at DEBUG level, keep it out of the measurement
+    logging.getLogger().setLevel(logging.INFO)
+    try:
+        meta['xmind_file'] = os.path.abspath(xmind_file)
+        meta['xmind_size'] = os.path.getsize(xmind_file)
+        results = {'meta': meta, 'stages': run_benchmark(xmind_file, options.repeat, stages)}
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    content = json.dumps(results, indent=2, ensure_ascii=False)
+    if options.output:
+        with open(options.output, 'w', encoding='utf8') as f:
+            f.write(content)
+    else:
+        print(content)
+
+    if options.baseline:
+        with open(options.baseline, encoding='utf8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, options.tolerance)
+        for regression in regressions:
+            logging.error('Performance regression: %s', regression)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+"""
+Measure the startup time of the command line tool, and make sure that the heavy modules are only imported
+when they're used: the webtool(flask、werkzeug、arrow、sqlite3), tkinter and the excel libraries.
+
+Every scenario runs in a fresh python process for --repeat times:
+
+    import_cli      python -c "import xmind2testcase.cli"
+    usage           xmind2testcase (print the usage)
+    convert_csv     xmind2testcase <docs/xmind_testcase_demo.xmind> -csv
+    convert_xml     xmind2testcase <docs/xmind_testcase_demo.xmind> -xml
+
+The results are written as json, such as:
+
+{"meta": {"python": "3.8.10", ...},
+ "scenarios": {"import_cli": {"runs": [0.08, ...], "min": 0.08, "median": 0.08, "heavy_modules": []}, ...}}
+
+The exit code is 1 if any heavy module is imported in a scenario, or the median time of a scenario is more than
+--tolerance worse than the --baseline result file. Usage:
+
+    python benchmarks/bench_startup.py -o startup.json
+    python benchmarks/bench_startup.py --baseline startup.json --tolerance 0.3
+"""
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEMO_XMIND_FILE = os.path.join(ROOT_DIR, 'docs', 'xmind_testcase_demo.xmind')
+HEAVY_MODULES = ('flask', 'werkzeug', 'jinja2', 'arrow', 'sqlite3', 'webtool', 'tkinter', 'xlwt', 'xlrd',
+                 'xlsxwriter', 'multiprocessing')
+
+# run the command line tool in the child process, and report the heavy modules it has imported
+RUNNER = '''
+import json, sys
+args = json.loads(sys.argv[1])
+sys.argv = ['xmind2testcase'] + args
+try:
+    import xmind2testcase.cli
+    if args != ['--import-only']:
+        xmind2testcase.cli.cli_main()
+finally:
+    loaded = sorted({{name.split('.')[0] for name in sys.modules}} & set({heavy_modules!r}))
+    sys.stderr.write('\\nHEAVY_MODULES=' + json.dumps(loaded) + '\\n')
+'''
+
+
+def run_scenario(args, repeat, cwd):
+    """Run the command line tool with the args in fresh processes, return the wall times and heavy modules"""
+    code = RUNNER.format(heavy_modules=list(HEAVY_MODULES))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT_DIR, os.environ.get('PYTHONPATH')])))
+    runs = []
+    heavy_modules = set()
+    for _ in range(repeat):
+        # remove the outputs of the last run, so that every run really converts the XMind file
+        for f in os.listdir(cwd):
+            if not f.endswith('.xmind'):
+                os.remove(os.path.join(cwd, f))
+        begin = time.perf_counter()
+        process = subprocess.run([sys.executable, '-c', code, json.dumps(args)], cwd=cwd, env=env,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+        runs.append(time.perf_counter() - begin)
+        if process.returncode != 0:
+            raise RuntimeError('xmind2testcase {} failed:\n{}'.format(' '.join(args), process.stderr))
+        for line in process.stderr.splitlines():
+            if line.startswith('HEAVY_MODULES='):
+                heavy_modules.update(json.loads(line[len('HEAVY_MODULES='):]))
+
+    return {'runs': runs, 'min': min(runs), 'median': statistics.median(runs), 'mean': statistics.mean(runs),
+            'heavy_modules': sorted(heavy_modules)}
+
+
+def run_benchmark(repeat=10):
+    work_dir = tempfile.mkdtemp(prefix='xmind2testcase_startup_')
+    try:
+        xmind_file = os.path.join(work_dir, 'demo.xmind')
+        shutil.copy(DEMO_XMIND_FILE, xmind_file)
+        scenarios = {
+            'import_cli': ['--import-only'],
+            'usage': [],
+            'convert_csv': [xmind_file, '-csv'],
+            'convert_xml': [xmind_file, '-xml'],
+        }
+        results = {}
+        for name, args in scenarios.items():
+            results[name] = run_scenario(args, repeat, work_dir)
+            print('{:<12} median: {:.4f}s  heavy modules: {}'.format(
+                name, results[name]['median'], ', '.join(results[name]['heavy_modules']) or '-'), file=sys.stderr)
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def check_results(results, baseline=None, tolerance=0.3):
+    """Return the problems: the heavy modules imported, and the regressions against the baseline"""
+    problems = []
+    for name, result in results['scenarios'].items():
+        if result['heavy_modules']:
+            problems.append('{} imports {}'.format(name, ', '.join(result['heavy_modules'])))
+        base = (baseline or {}).get('scenarios', {}).get(name)
+        if base and result['median'] > base['median'] * (1 + tolerance):
+            problems.append('{} median: {:.4f}s -> {:.4f}s (+{:.1%})'.format(
+                name, base['median'], result['median'], result['median'] / base['median'] - 1))
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the startup time of the xmind2testcase command')
+    parser.add_argument('--repeat', type=int, default=10, help='the number of runs of every scenario')
+    parser.add_argument('-o', '--output', help='write the results to this json file')
+    parser.add_argument('--baseline', help='compare the results with a previous result file')
+    parser.add_argument('--tolerance', type=float, default=0.3, help='the allowed regression ratio, default: 0.3')
+    options = parser.parse_args(argv)
+
+    results = {'meta': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'repeat': options.repeat},
+               'scenarios': run_benchmark(options.repeat)}
+
+    content = json.dumps(results, indent=2)
+    if options.output:
+        with open(options.output, 'w', encoding='utf8') as f:
+            f.write(content)
+    else:
+        print(content)
+
+    baseline = None
+    if options.baseline:
+        with open(options.baseline, encoding='utf8') as f:
+            baseline = json.load(f)
+    problems = check_results(results, baseline, options.tolerance)
+    for problem in problems:
+        print('Startup regression: {}'.format(problem), file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
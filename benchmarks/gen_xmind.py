@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import argparse
+import json
+import random
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+"""
+Generate a synthetic XMind testcase file for benchmarking, with the layout that xmind2testcase parses:
+
+    product(root topic) -> testsuite -> module(`depth` levels) -> testcase -> test step -> expected result
+
+Every level below the root has `breadth` topics, so a sheet has breadth ** (depth + 2) testcases. A testcase
+title gets a `P0|`/`P1|`/`P2|` priority prefix at `priority_ratio`, and a test step gets a `R|` remark instead of
+the expected result at `remark_ratio`. The markers of the testcases and expected results are drawn from `markers`,
+a {marker id: weight} dict, where None means no marker. A testcase without a priority prefix but with steps is
+parsed as a module, the same as in a real XMind file. As xmind2testcase merges the testcases of the same module
+into one, with the checkpoints as its steps, the merge stage is exercised by every module.
+
+The same arguments and seed always generate the same file. Usage:
+
+    python benchmarks/gen_xmind.py /tmp/large.xmind --sheets 4 --breadth 10 --depth 2 --steps 3
+"""
+
+DEFAULT_MARKERS = {None: 6, 'symbol-right': 2, 'symbol-wrong': 1, 'symbol-pause': 0.5, 'symbol-minus': 0.5}
+LABELS = ('手动', '自动')
+XMIND8_NAMESPACE = 'urn:xmind:xmap:xmlns:content:2.0'
+
+
+class TopicGenerator(object):
+
+    def __init__(self, breadth=5, depth=1, steps=3, priority_ratio=1.0, remark_ratio=0.1, markers=None, seed=0):
+        """
+        :param breadth: the number of sub topics of every topic, from the testsuites to the test steps
+        :param depth: the number of module levels between a testsuite and its testcases
+        :param steps: the number of test steps of a testcase
+        :param priority_ratio: the ratio of testcases with a P0|/P1|/P2| priority prefix
+        :param remark_ratio: the ratio of test steps with a R| remark instead of the expected result
+        :param markers: the {marker id: weight} of the testcase and expected result markers
+        :param seed: the random seed
+        """
+        self.breadth = breadth
+        self.depth = depth
+        self.steps = steps
+        self.priority_ratio = priority_ratio
+        self.remark_ratio = remark_ratio
+        markers = DEFAULT_MARKERS if markers is None else markers
+        self.marker_ids = list(markers)
+        self.marker_weights = list(markers.values())
+        self.random = random.Random(seed)
+        self.topic_count = 0
+
+    def gen_topic(self, title, markers=None, note=None, label=None, children=None):
+        self.topic_count += 1
+        return {'id': 'topic{}'.format(self.topic_count), 'title': title, 'markers': markers or [],
+                'note': note, 'label': label, 'children': children or []}
+
+    def gen_marker(self):
+        marker = self.random.choices(self.marker_ids, self.marker_weights)[0]
+        return [marker] if marker else []
+
+    def gen_sheet(self, index):
+        """A sheet dict of {'id', 'title', 'topic'}, the topic has its sub topics in 'children'"""
+        suites = [self.gen_topic('测试集{}'.format(i), children=self.gen_modules(self.depth))
+                  for i in range(1, self.breadth + 1)]
+        root_topic = self.gen_topic('产品{}'.format(index), children=suites)
+        return {'id': 'sheet{}'.format(index), 'title': '画布{}'.format(index), 'topic': root_topic}
+
+    def gen_modules(self, depth):
+        if depth == 0:
+            return self.gen_testcases()
+        return [self.gen_topic('模块{}'.format(i), note='前置条件{}'.format(i) if i == 1 else None,
+                               children=self.gen_modules(depth - 1))
+                for i in range(1, self.breadth + 1)]
+
+    def gen_testcases(self):
+        testcases = []
+        for i in range(1, self.breadth + 1):
+            title = '用例{}'.format(i)
+            if self.random.random() < self.priority_ratio:
+                title = 'P{}|{}'.format(self.random.randrange(3), title)
+            steps = [self.gen_step(j) for j in range(1, self.steps + 1)]
+            testcases.append(self.gen_topic(title, markers=self.gen_marker(), label=self.random.choice(LABELS),
+                                            children=steps))
+        return testcases
+
+    def gen_step(self, index):
+        if self.random.random() < self.remark_ratio:
+            expected = self.gen_topic('R|备注{}'.format(index))
+        else:
+            expected = self.gen_topic('预期结果{}'.format(index), markers=self.gen_marker())
+        return self.gen_topic('测试步骤{}'.format(index), children=[expected])
+
+
+def gen_xmind_file(xmind_file, sheets=1, zen=False, **kwargs):
+    """Generate a XMind file, and return the number of topics in it
+
+    :param xmind_file: the output XMind file
+    :param sheets: the number of sheets
+    :param zen: generate a XMind Zen file(content.json) instead of a XMind 8 file(content.xml)
+    :param kwargs: the arguments of `TopicGenerator`
+    """
+    generator = TopicGenerator(**kwargs)
+    with zipfile.ZipFile(xmind_file, 'w', zipfile.ZIP_DEFLATED) as zf:
+        if zen:
+            sheet_list = [_zen_sheet(generator.gen_sheet(i)) for i in range(1, sheets + 1)]
+            zf.writestr('content.json', json.dumps(sheet_list, ensure_ascii=False))
+        else:
+            # write the sheets one by one, a large file is never held in memory as a whole
+            with zf.open('content.xml', 'w') as f:
+                f.write('<?xml version="1.0" encoding="UTF-8" standalone="no"?>'
+                        '<xmap-content xmlns={} version="2.0">'.format(quoteattr(XMIND8_NAMESPACE)).encode('utf-8'))
+                for i in range(1, sheets + 1):
+                    f.write(_xmind8_sheet(generator.gen_sheet(i)).encode('utf-8'))
+                f.write(b'</xmap-content>')
+            zf.writestr('META-INF/manifest.xml',
+                        '<?xml version="1.0" encoding="UTF-8" standalone="no"?>'
+                        '<manifest xmlns="urn:xmind:xmap:xmlns:manifest:1.0">'
+                        '<file-entry full-path="content.xml" media-type="text/xml"/></manifest>')
+
+    return generator.topic_count
+
+
+def _xmind8_sheet(sheet):
+    parts = ['<sheet id={}>'.format(quoteattr(sheet['id']))]
+    _xmind8_topic(sheet['topic'], parts)
+    parts.append('<title>{}</title></sheet>'.format(escape(sheet['title'])))
+    return ''.join(parts)
+
+
+def _xmind8_topic(topic, parts):
+    parts.append('<topic id={}><title>{}</title>'.format(quoteattr(topic['id']), escape(topic['title'])))
+    if topic['note']:
+        parts.append('<notes><plain>{}</plain></notes>'.format(escape(topic['note'])))
+    if topic['label']:
+        parts.append('<labels><label>{}</label></labels>'.format(escape(topic['label'])))
+    if topic['markers']:
+        parts.append('<marker-refs>{}</marker-refs>'.format(
+            ''.join('<marker-ref marker-id={}/>'.format(quoteattr(marker)) for marker in topic['markers'])))
+    if topic['children']:
+        parts.append('<children><topics type="attached">')
+        for child in topic['children']:
+            _xmind8_topic(child, parts)
+        parts.append('</topics></children>')
+    parts.append('</topic>')
+
+
+def _zen_sheet(sheet):
+    return {'id': sheet['id'], 'class': 'sheet', 'title': sheet['title'], 'rootTopic': _zen_topic(sheet['topic'])}
+
+
+def _zen_topic(topic):
+    topic_json = {'id': topic['id'], 'class': 'topic', 'title': topic['title']}
+    if topic['note']:
+        topic_json['notes'] = {'plain': {'content': topic['note']}}
+    if topic['label']:
+        topic_json['labels'] = [topic['label']]
+    if topic['markers']:
+        topic_json['markers'] = [{'markerId': marker} for marker in topic['markers']]
+    if topic['children']:
+        topic_json['children'] = {'attached': [_zen_topic(child) for child in topic['children']]}
+    return topic_json
+
+
+def add_generator_arguments(parser):
+    parser.add_argument('--sheets', type=int, default=1, help='the number of sheets')
+    parser.add_argument('--breadth', type=int, default=5, help='the number of sub topics of every topic')
+    parser.add_argument('--depth', type=int, default=1, help='the number of module levels above the testcases')
+    parser.add_argument('--steps', type=int, default=3, help='the number of test steps of a testcase')
+    parser.add_argument('--priority-ratio', type=float, default=1.0, help='the ratio of testcases with P0|/P1|/P2|')
+    parser.add_argument('--remark-ratio', type=float, default=0.1, help='the ratio of test steps with a R| remark')
+    parser.add_argument('--markers', type=json.loads, default=None,
+                        help='the marker weights in json, such as \'{"symbol-right": 1, "null": 3}\'')
+    parser.add_argument('--seed', type=int, default=0, help='the random seed')
+    parser.add_argument('--zen', action='store_true', help='generate a XMind Zen file')
+
+
+def get_generator_options(options):
+    markers = options.markers
+    if markers is not None:  # json has no None key, "null" stands for no marker
+        markers = {None if marker == 'null' else marker: weight for marker, weight in markers.items()}
+    return {'sheets': options.sheets, 'zen': options.zen, 'breadth': options.breadth, 'depth': options.depth,
+            'steps': options.steps, 'priority_ratio': options.priority_ratio, 'remark_ratio': options.remark_ratio,
+            'markers': markers, 'seed': options.seed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic XMind testcase file for benchmarking')
+    parser.add_argument('xmind_file', help='the output XMind file')
+    add_generator_arguments(parser)
+    options = parser.parse_args(argv)
+
+    topic_count = gen_xmind_file(options.xmind_file, **get_generator_options(options))
+    print('Generate XMind file with {} topics: {}'.format(topic_count, options.xmind_file))
+
+
+if __name__ == '__main__':
+    main()
@@ -83,7 +83,11 @@ setup(
         'webtool': ['static/*', 'static/css/*', 'static/guide/*', 'templates/*', 'schema.sql'],
     },
     install_requires=install_requires,
-    extras_require={},
+    extras_require={
+        'xlsx': ['xlsxwriter'],
+        'watch': ['inotify_simple'],
+        'test': ['pytest', 'xlsxwriter', 'openpyxl'],  # pip install -e .[test] && python -m pytest tests
+    },
     python_requires='>=3.0, <4',  # custom
     classifiers=[
         "Programming Language :: Python :: 3",
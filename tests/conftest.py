@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import itertools
+import json
+import os
+import shutil
+import zipfile
+import pytest
+from xmind2testcase import cache
+from xmind2testcase import parser
+
+DOCS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'docs')
+DEMO_XMIND_FILE = os.path.join(DOCS_DIR, 'xmind_testcase_demo.xmind')
+
+
+@pytest.fixture(autouse=True)
+def clean_caches(monkeypatch):
+    """Every test starts with empty in-process caches and without the disk cache"""
+    monkeypatch.setattr(cache, '_disk_cache', None)
+    cache.parse_cache.clear()
+    cache.suite_cache.clear()
+    yield
+    cache.parse_cache.clear()
+    cache.suite_cache.clear()
+
+
+@pytest.fixture
+def demo_xmind(tmp_path):
+    """A copy of the demo XMind file in a temp directory, so that the outputs are written next to it"""
+    xmind_file = str(tmp_path / 'demo.xmind')
+    shutil.copy(DEMO_XMIND_FILE, xmind_file)
+    return xmind_file
+
+
+_topic_ids = itertools.count()
+
+
+def zen_topic(title, *children, **fields):
+    """A XMind Zen topic, the extra fields are such as notes={'plain': {'content': 'a note'}}"""
+    topic = dict(fields, id=fields.get('id') or 'topic-{}'.format(next(_topic_ids)), title=title)
+    if children:
+        topic['children'] = {'attached': [child if isinstance(child, dict) else zen_topic(child)
+                                          for child in children]}
+    return topic
+
+
+def write_xmind(xmind_file, *root_topics):
+    """Write a XMind Zen file with a sheet for every root topic, see `zen_topic`"""
+    sheets = [{'id': 'sheet-{}'.format(index), 'title': 'Sheet {}'.format(index), 'rootTopic': root_topic}
+              for index, root_topic in enumerate(root_topics, 1)]
+    with zipfile.ZipFile(str(xmind_file), 'w') as zip_file:
+        zip_file.writestr('content.json', json.dumps(sheets, ensure_ascii=False))
+    return str(xmind_file)
+
+
+def write_suites_xmind(xmind_file, edited_suite=None):
+    """A XMind file of the testsuites suite0、suite1、suite2, every topic has a fixed id so that only the testsuite
+    renamed by `edited_suite` differs between the files"""
+    suites = []
+    for index in range(3):
+        steps = [zen_topic(step, id='{}-{}'.format(step, index)) for step in ('step', 'step2')]
+        case_name = 'edited' if index == edited_suite else 'case{}'.format(index)
+        suites.append(zen_topic('suite{}'.format(index), zen_topic(case_name, *steps, id='case-{}'.format(index)),
+                                zen_topic('case', id='other-case-{}'.format(index)), id='suite-{}'.format(index)))
+    return write_xmind(xmind_file, zen_topic('product', *suites, id='product'))
+
+
+@pytest.fixture
+def parsed_suites(monkeypatch):
+    """The titles of the testsuites parsed instead of taken from `xmind2testcase.cache.suite_cache`"""
+    parsed = []
+    parse_testsuite = parser.parse_testsuite
+
+    def count(suite_dict, config=parser.DEFAULT_CONFIG):
+        parsed.append(suite_dict['title'])
+        return parse_testsuite(suite_dict, config)
+
+    monkeypatch.setattr(parser, 'parse_testsuite', count)
+    return parsed
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import os
+import shutil
+import zipfile
+import pytest
+from xmind2testcase.cli import batch_main, convert_main
+from xmind2testcase.convert import xmind_files_to_testcase_files
+from xmind2testcase.loader import load_xmind_content
+from conftest import DEMO_XMIND_FILE
+
+
+def write_truncated_xmind(xmind_file):
+    with open(DEMO_XMIND_FILE, 'rb') as f:
+        content = f.read()
+    with open(xmind_file, 'wb') as f:
+        f.write(content[:len(content) // 2])
+    return xmind_file
+
+
+def write_broken_content_xmind(xmind_file):
+    with zipfile.ZipFile(xmind_file, 'w') as zip_file:
+        zip_file.writestr('content.xml', '<xmap-content><sheet')
+    return xmind_file
+
+
+@pytest.fixture
+def xmind_dir(tmp_path):
+    shutil.copy(DEMO_XMIND_FILE, str(tmp_path / 'good.xmind'))
+    write_truncated_xmind(str(tmp_path / 'truncated.xmind'))
+    write_broken_content_xmind(str(tmp_path / 'broken.xmind'))
+    return tmp_path
+
+
+@pytest.mark.parametrize('write', [write_truncated_xmind, write_broken_content_xmind])
+def test_loader_raises_for_invalid_xmind_file(tmp_path, write):
+    with pytest.raises(ValueError, match='Invalid XMind file'):
+        load_xmind_content(write(str(tmp_path / 'invalid.xmind')))
+
+
+def test_invalid_xmind_files_fail_without_outputs(xmind_dir):
+    xmind_files = sorted(str(path) for path in xmind_dir.iterdir())
+    results = xmind_files_to_testcase_files(xmind_files, formats=('json', 'xml', 'csv'), processes=1)
+
+    errors = {os.path.basename(xmind_file): error for xmind_file, _, error in results}
+    assert errors['good.xmind'] is None
+    assert 'Invalid XMind file' in errors['broken.xmind']
+    assert 'Invalid XMind file' in errors['truncated.xmind']
+    assert sorted(os.listdir(str(xmind_dir))) == [
+        'broken.xmind', 'good.csv', 'good.csv.manifest', 'good.json', 'good.json.manifest', 'good.xmind',
+        'good.xml', 'good.xml.manifest', 'truncated.xmind']
+
+
+def test_batch_exits_non_zero_for_invalid_xmind_file(xmind_dir):
+    assert batch_main([str(xmind_dir), '-j', '1', '--formats', 'csv']) == 1
+    assert not os.path.exists(str(xmind_dir / 'broken.csv'))
+    assert os.path.exists(str(xmind_dir / 'good.csv'))
+
+
+@pytest.mark.parametrize('fmt', ['-csv', '-xml', '-json', None])
+def test_convert_exits_non_zero_for_invalid_xmind_file(xmind_dir, fmt):
+    with pytest.raises(SystemExit) as exc_info:
+        convert_main([str(xmind_dir / 'truncated.xmind')] + ([fmt] if fmt else []))
+    assert exc_info.value.code == 1
+    assert sorted(os.listdir(str(xmind_dir))) == ['broken.xmind', 'good.xmind', 'truncated.xmind']
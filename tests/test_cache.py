@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+from xmind2testcase import cache as cache_module
+from xmind2testcase import utils
+from xmind2testcase.cache import DiskCache, ParseCache, parse_cache, suite_cache
+from xmind2testcase import filters
+from xmind2testcase import metadata
+from xmind2testcase import parser
+from xmind2testcase.convert import xmind_to_testcase_files
+from xmind2testcase.testlink import xmind_to_testlink_xml_file
+from xmind2testcase.utils import get_xmind_testsuites, load_xmind_file, xmind_testcase_to_json_file, \
+    xmind_testsuite_to_json_file
+from xmind2testcase.zentao import xmind_to_zentao_csv_file
+from conftest import DOCS_DIR, write_suites_xmind
+
+
+def test_parse_cache_hit_and_miss():
+    cache = ParseCache()
+    assert cache.get(('hash', ())) is None
+
+    cache.put(('hash', ()), [metadata.TestSuite(name='suite')])
+    assert cache.get(('hash', ()))[0].name == 'suite'
+    assert cache.get(('other hash', ())) is None
+
+
+def test_parse_cache_returns_isolated_copies():
+    cache = ParseCache()
+    testsuites = [metadata.TestSuite(name='suite', sub_suites=[])]
+    cache.put('key', testsuites)
+    testsuites[0].name = 'changed after put'
+
+    copy = cache.get('key')
+    copy[0].name = 'changed after get'
+    copy[0].sub_suites.append(metadata.TestSuite(name='sub suite'))
+
+    cached = cache.get('key')
+    assert cached[0].name == 'suite'
+    assert cached[0].sub_suites == []
+
+
+def test_parse_cache_evicts_least_recently_used():
+    cache = ParseCache(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+
+
+def test_parse_cache_skips_too_large_values():
+    cache = ParseCache(max_bytes=100)
+    cache.put('key', 'x' * 1000)
+    assert cache.get('key') is None
+    assert len(cache) == 0
+
+
+def test_get_xmind_testsuites_uses_cache(demo_xmind, monkeypatch):
+    testsuites = get_xmind_testsuites(demo_xmind)
+    assert len(parse_cache) == 1
+
+    def fail(*args, **kwargs):
+        raise AssertionError('the XMind file should not be loaded again')
+
+    monkeypatch.setattr(utils, 'load_xmind_file', fail)
+    cached = get_xmind_testsuites(demo_xmind)
+    assert [suite.to_dict() for suite in cached] == [suite.to_dict() for suite in testsuites]
+    assert cached[0] is not testsuites[0]
+
+
+def test_get_xmind_testsuites_cache_key(demo_xmind):
+    testsuites = get_xmind_testsuites(demo_xmind)
+    filtered = get_xmind_testsuites(demo_xmind, config={'filter': filters.TestCaseFilter(priorities=[0])})
+    assert len(parse_cache) == 2
+    assert [suite.to_dict() for suite in filtered] != [suite.to_dict() for suite in testsuites]
+
+    # the same path with a different content
+    shutil.copy(os.path.join(DOCS_DIR, 'xmind_testcase_template_v1.1.xmind'), demo_xmind)
+    assert [suite.to_dict() for suite in get_xmind_testsuites(demo_xmind)] == \
+        [suite.to_dict() for suite in get_xmind_testsuites(demo_xmind, use_cache=False)] != \
+        [suite.to_dict() for suite in testsuites]
+
+
+def load_suites_xmind(tmp_path):
+    return load_xmind_file(write_suites_xmind(tmp_path / 'suites.xmind'))
+
+
+def to_dicts(testsuites):
+    return [testsuite.to_dict() for testsuite in testsuites]
+
+
+def test_suite_cache_hit_and_miss(tmp_path, parsed_suites):
+    sheets = load_suites_xmind(tmp_path)
+    expected = to_dicts(parser.xmind_to_testsuites(sheets))
+    del parsed_suites[:]  # the expected result is parsed without the cache
+
+    assert to_dicts(parser.xmind_to_testsuites(sheets, use_cache=True)) == expected
+    assert parsed_suites == ['suite0', 'suite1', 'suite2'] and len(suite_cache) == 3
+    assert to_dicts(parser.xmind_to_testsuites(sheets, use_cache=True)) == expected
+    assert parsed_suites == ['suite0', 'suite1', 'suite2']
+
+    # only the edited testsuite is parsed again
+    del parsed_suites[:]
+    sheets[0]['topic']['topics'][1]['topics'][0]['title'] = 'edited'
+    testsuites = parser.xmind_to_testsuites(sheets, use_cache=True)
+    assert parsed_suites == ['suite1']
+    assert to_dicts(testsuites) == to_dicts(parser.xmind_to_testsuites(sheets))
+    assert testsuites[0].sub_suites[1].testcase_list[0].name == 'edited'
+
+    # another config, such as a filter, parses all of them
+    del parsed_suites[:]
+    parser.xmind_to_testsuites(sheets, config={'filter': filters.TestCaseFilter(priorities=[1])}, use_cache=True)
+    assert parsed_suites == ['suite0', 'suite1', 'suite2']
+
+
+@pytest.mark.parametrize('convert', [
+    lambda xmind_file: get_xmind_testsuites(xmind_file, use_suite_cache=True),
+    lambda xmind_file: xmind_to_testcase_files(xmind_file, formats=('json',), use_suite_cache=True),
+], ids=['testsuites', 'files'])
+def test_edited_xmind_file_reuses_unchanged_suites(tmp_path, parsed_suites, convert):
+    xmind_file = write_suites_xmind(tmp_path / 'suites.xmind')
+    convert(xmind_file)
+    assert parsed_suites == ['suite0', 'suite1', 'suite2']
+
+    write_suites_xmind(xmind_file, edited_suite=1)
+    convert(xmind_file)
+    assert parsed_suites == ['suite0', 'suite1', 'suite2', 'suite1']
+    testsuites = get_xmind_testsuites(xmind_file, use_suite_cache=True)
+    assert to_dicts(testsuites) == to_dicts(get_xmind_testsuites(xmind_file, use_cache=False))
+    assert testsuites[0].sub_suites[1].testcase_list[0].name == 'edited'
+
+
+def test_suite_cache_returns_isolated_copies(tmp_path):
+    sheets = load_suites_xmind(tmp_path)
+    testsuites = parser.xmind_to_testsuites(sheets, use_cache=True)
+    expected = to_dicts(testsuites)
+    testsuites[0].sub_suites[0].name = 'changed'
+    testsuites[0].sub_suites[0].testcase_list.clear()
+
+    cached = parser.xmind_to_testsuites(sheets, use_cache=True)
+    assert to_dicts(cached) == expected
+    assert cached[0].sub_suites[0] is not parser.xmind_to_testsuites(sheets, use_cache=True)[0].sub_suites[0]
+
+
+def test_suite_cache_is_off_by_default(demo_xmind, tmp_path):
+    get_xmind_testsuites(demo_xmind)
+    get_xmind_testsuites(demo_xmind, use_cache=False)
+    parser.xmind_to_testsuites(load_suites_xmind(tmp_path))
+    assert len(suite_cache) == 0
+
+
+def test_topic_hash():
+    topic = {'id': 'suite', 'title': 'suite', 'topics': [{'id': 'case', 'title': 'case', 'markers': []}]}
+    same = {'id': 'suite', 'title': 'suite', 'topics': [{'id': 'case', 'title': 'case', 'markers': []}]}
+    assert parser.get_topic_hash(topic) == parser.get_topic_hash(same)
+    same['topics'][0]['markers'].append('priority-1')
+    assert parser.get_topic_hash(topic) != parser.get_topic_hash(same)
+
+    deep = {'title': 'deep'}
+    for _ in range(5000):
+        deep = {'title': 'deep', 'topics': [deep]}
+    assert parser.get_topic_hash(deep) is None
+
+
+def test_disk_cache_round_trip(tmp_path):
+    disk_cache = DiskCache(str(tmp_path / 'cache'))
+    key = disk_cache.make_key('hash', parser.make_config())
+    assert disk_cache.get(key) is None and disk_cache.get_bytes(key, 'csv') is None
+
+    disk_cache.put(key, [metadata.TestSuite(name='suite')])
+    disk_cache.put_bytes(key, 'csv', b'a,b\n')
+    assert disk_cache.get(key)[0].name == 'suite'
+    assert disk_cache.get_bytes(key, 'csv') == b'a,b\n'
+    # another process opening the same directory sees the entries
+    assert DiskCache(str(tmp_path / 'cache')).get_bytes(key, 'csv') == b'a,b\n'
+
+    assert key != disk_cache.make_key('hash', parser.make_config({'ignore_char': '@'}))
+    assert key != disk_cache.make_key('other hash', parser.make_config())
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    disk_cache = DiskCache(str(tmp_path), max_bytes=250)
+    for index, name in enumerate(('old', 'used', 'recent')):
+        disk_cache.put_bytes('key', name, b'x' * 100)  # over max_bytes from the third entry on
+        if index < 2:
+            os.utime(os.path.join(str(tmp_path), 'key.' + name), (time.time() - 100 + index, ) * 2)
+    assert sorted(os.listdir(str(tmp_path))) == ['key.recent', 'key.used']
+
+    os.utime(os.path.join(str(tmp_path), 'key.recent'), (time.time() - 50, ) * 2)
+    assert disk_cache.get_bytes('key', 'used') is not None  # a read marks it as recently used
+    disk_cache.put_bytes('key', 'new', b'x' * 100)
+    assert sorted(os.listdir(str(tmp_path))) == ['key.new', 'key.used']
+
+
+def test_disk_cache_ignores_corrupt_entries(tmp_path):
+    disk_cache = DiskCache(str(tmp_path))
+    with open(os.path.join(str(tmp_path), 'key.testsuites'), 'wb') as f:
+        f.write(b'not a pickle')
+    assert disk_cache.get('key') is None
+
+    disk_cache.put('key', ['fixed'])
+    assert disk_cache.get('key') == ['fixed']
+
+
+def write_disk_cache_entry(cache_dir, index):
+    disk_cache = DiskCache(cache_dir)
+    for _ in range(20):
+        disk_cache.put_bytes('key', 'csv', bytes([index]) * 100000)
+        content = disk_cache.get_bytes('key', 'csv')
+        # a reader sees a complete entry of one of the writers, never a partial or mixed one
+        assert len(content) == 100000 and len(set(content)) == 1
+    return index
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='requires fork')
+def test_disk_cache_concurrent_writers(tmp_path):
+    cache_dir = str(tmp_path)
+    with ProcessPoolExecutor(4, mp_context=multiprocessing.get_context('fork')) as executor:
+        assert sorted(executor.map(write_disk_cache_entry, [cache_dir] * 4, range(4))) == [0, 1, 2, 3]
+    assert os.listdir(cache_dir) == ['key.csv']  # no temp file is left
+
+
+SINGLE_FORMAT_CONVERSIONS = {
+    'csv': xmind_to_zentao_csv_file,
+    'gbk csv': lambda xmind_file: xmind_to_zentao_csv_file(xmind_file, encoding='gbk'),
+    'xml': xmind_to_testlink_xml_file,
+    'first sheet xml': lambda xmind_file: xmind_to_testlink_xml_file(xmind_file, is_all_sheet=False),
+    'json': xmind_testcase_to_json_file,
+    'ndjson': lambda xmind_file: xmind_testcase_to_json_file(xmind_file, ndjson=True),
+    'testsuite json': xmind_testsuite_to_json_file,
+}
+
+
+@pytest.mark.parametrize('name', sorted(SINGLE_FORMAT_CONVERSIONS))
+def test_single_format_conversion_uses_disk_cache(demo_xmind, tmp_path, monkeypatch, name):
+    convert = SINGLE_FORMAT_CONVERSIONS[name]
+    monkeypatch.setattr(cache_module, '_disk_cache', DiskCache(str(tmp_path / 'cache')))
+    output_file = convert(demo_xmind)
+    with open(output_file, 'rb') as f:
+        content = f.read()
+    # the parsing result and the output file
+    assert len(os.listdir(str(tmp_path / 'cache'))) == 2
+
+    # another process: nothing in memory, no output file, the XMind file isn't loaded again
+    os.remove(output_file)
+    parse_cache.clear()
+    monkeypatch.setattr(utils, 'load_xmind_file', fail_to_load)
+    assert convert(demo_xmind) == output_file
+    with open(output_file, 'rb') as f:
+        assert f.read() == content
+
+
+def fail_to_load(*args, **kwargs):
+    raise AssertionError('the XMind file should not be loaded again')
+
+
+def test_conversions_share_disk_cache(demo_xmind, tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, '_disk_cache', DiskCache(str(tmp_path / 'cache')))
+    output_files = xmind_to_testcase_files(demo_xmind, formats=('csv', 'xml'))
+    assert len(os.listdir(str(tmp_path / 'cache'))) == 3
+
+    for output_file in output_files.values():
+        os.remove(output_file)
+    parse_cache.clear()
+    monkeypatch.setattr(utils, 'load_xmind_file', fail_to_load)
+    assert xmind_to_zentao_csv_file(demo_xmind) == output_files['csv']
+    assert xmind_to_testlink_xml_file(demo_xmind) == output_files['xml']
+    with open(output_files['csv'], 'rb') as f:
+        utf8_content = f.read()
+
+    # the output of other options is generated from the cached parsing result, and cached on its own
+    with open(xmind_to_zentao_csv_file(demo_xmind, encoding='gbk'), 'rb') as f:
+        assert f.read() == utf8_content.decode('utf-8').encode('gbk') != utf8_content
+    assert len(os.listdir(str(tmp_path / 'cache'))) == 4
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import json
+import os
+from xmind2testcase import convert
+from xmind2testcase.convert import xmind_to_testcase_files
+from xmind2testcase.utils import get_xmind_testcase_list
+
+
+def test_all_formats_are_written(demo_xmind):
+    output_files = xmind_to_testcase_files(demo_xmind, formats=('json', 'xml', 'csv'))
+
+    assert sorted(output_files) == ['csv', 'json', 'xml']
+    for fmt, output_file in output_files.items():
+        assert output_file == demo_xmind[:-len('xmind')] + fmt
+        assert os.path.getsize(output_file) > 0
+
+    with open(output_files['json'], encoding='utf8') as f:
+        assert json.load(f) == get_xmind_testcase_list(demo_xmind)
+
+
+def test_xmind_file_is_parsed_once(demo_xmind, monkeypatch):
+    calls = []
+    get_xmind_testsuites = convert.get_xmind_testsuites
+
+    def counting_get_xmind_testsuites(*args, **kwargs):
+        calls.append(args)
+        return get_xmind_testsuites(*args, **kwargs)
+
+    monkeypatch.setattr(convert, 'get_xmind_testsuites', counting_get_xmind_testsuites)
+    xmind_to_testcase_files(demo_xmind, formats=('json', 'xml', 'csv'))
+    assert len(calls) == 1
+
+
+def test_fresh_outputs_are_reused(demo_xmind, monkeypatch):
+    xmind_to_testcase_files(demo_xmind, formats=('json', 'csv'))
+
+    def fail(*args, **kwargs):
+        raise AssertionError('the XMind file should not be parsed again')
+
+    monkeypatch.setattr(convert, 'get_xmind_testsuites', fail)
+    assert sorted(xmind_to_testcase_files(demo_xmind, formats=('json', 'csv'))) == ['csv', 'json']
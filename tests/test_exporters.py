@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import argparse
+from importlib.metadata import EntryPoint
+import pytest
+from xmind2testcase import cli, exporters
+from xmind2testcase.convert import xmind_to_testcase_files
+from xmind2testcase.exporters import Exporter, get_exporter, get_exporter_names, register_exporter
+from xmind2testcase.zentao import ZentaoExporter
+
+
+class MarkdownExporter(Exporter):
+    extension = '.md'
+    input = 'testcases'
+
+    def export(self, testcases, output_file, config=None):
+        with open(output_file, 'w', encoding='utf8') as f:
+            for testcase in testcases:
+                f.write('- {}\n'.format(testcase['name']))
+        return output_file
+
+
+class NotAnExporter(object):
+    pass
+
+
+@pytest.fixture
+def entry_points(monkeypatch):
+    """The entry points of the installed packages, and the number of times they are looked up"""
+    monkeypatch.setattr(exporters, '_exporters', dict(exporters.BUILTIN_EXPORTERS))
+    monkeypatch.setattr(exporters, '_entry_points_loaded', False)
+    installed = [EntryPoint('md', 'test_exporters:MarkdownExporter', exporters.ENTRY_POINT_GROUP),
+                 EntryPoint('csv', 'test_exporters:MarkdownExporter', exporters.ENTRY_POINT_GROUP)]
+    lookups = []
+
+    def iter_entry_points():
+        lookups.append(len(installed))
+        return installed
+
+    monkeypatch.setattr(exporters, '_iter_entry_points', iter_entry_points)
+    return lookups
+
+
+def test_builtin_exporter(entry_points):
+    exporter = get_exporter('csv')
+    assert isinstance(exporter, ZentaoExporter)
+    assert (exporter.name, exporter.extension, exporter.input) == ('csv', '.csv', 'testcases')
+    assert get_exporter('csv') is exporter
+    assert entry_points == []
+
+
+def test_entry_point_exporter(entry_points, demo_xmind):
+    exporter = get_exporter('md')
+    assert isinstance(exporter, MarkdownExporter) and exporter.name == 'md'
+    assert isinstance(get_exporter('csv'), ZentaoExporter)  # a built-in format isn't replaced
+    assert get_exporter_names() == list(exporters.BUILTIN_EXPORTERS) + ['md']
+    assert entry_points == [2]
+
+    output_files = xmind_to_testcase_files(demo_xmind, formats=('md', 'csv'))
+    assert output_files['md'] == demo_xmind[:-len('.xmind')] + '.md'
+    with open(output_files['md'], encoding='utf8') as f:
+        assert f.read().startswith('- ')
+
+
+def test_register_exporter(entry_points):
+    register_exporter('md', MarkdownExporter)
+    register_exporter('csv', 'test_exporters:MarkdownExporter')
+    assert isinstance(get_exporter('md'), MarkdownExporter)
+    assert isinstance(get_exporter('csv'), MarkdownExporter)
+    assert entry_points == []
+
+    register_exporter('bad', 'test_exporters:NotAnExporter')
+    with pytest.raises(TypeError, match='should be a subclass of Exporter'):
+        get_exporter('bad')
+
+
+def test_unknown_format(entry_points, demo_xmind):
+    with pytest.raises(ValueError, match='Unsupported output format: unknown'):
+        get_exporter('unknown')
+    with pytest.raises(ValueError, match='Unsupported output format: unknown'):
+        xmind_to_testcase_files(demo_xmind, formats=('csv', 'unknown'))
+
+
+def get_formats(formats):
+    parser = argparse.ArgumentParser()
+    return cli.get_formats(parser, argparse.Namespace(formats=formats))
+
+
+def test_cli_formats(entry_points, capsys):
+    assert get_formats('csv, xml,json,xlsx,') == ['csv', 'xml', 'json', 'xlsx']
+    assert entry_points == []  # the built-in formats are known without looking up the entry points
+
+    assert get_formats('csv,md') == ['csv', 'md']
+    assert entry_points == [2]
+
+    with pytest.raises(SystemExit) as exc_info:
+        get_formats('csv,unknown,other')
+    assert exc_info.value.code == 2
+    assert 'unsupported formats: unknown,other' in capsys.readouterr().err
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import pickle
+import pytest
+from xmind2testcase import filters
+from xmind2testcase.parser import DEFAULT_CONFIG, parse_a_testcase
+from xmind2testcase.utils import get_xmind_testsuites, load_xmind_file
+from conftest import write_xmind, zen_topic
+
+
+def marked(title, marker, *children, **fields):
+    return zen_topic(title, *children, markers=[{'markerId': marker}], **fields)
+
+
+@pytest.fixture
+def xmind_file(tmp_path):
+    return write_xmind(
+        tmp_path / 'testcases.xmind',
+        zen_topic('product',
+                  zen_topic('login',
+                            zen_topic('P0|passed', marked('step1', 'symbol-right')),
+                            zen_topic('P2|automated', 'step1', labels=['自动']),
+                            zen_topic('unmarked', 'step1')),
+                  zen_topic('search',
+                            zen_topic('P1|failed', zen_topic('step1', marked('expected', 'symbol-wrong'))),
+                            labels=['auto'])),
+        zen_topic('other', zen_topic('login', zen_topic('P0|other', 'step1'))))
+
+
+def get_case_names(xmind_file, **kwargs):
+    """{(sheet topic, testsuite): [testcase]} of the testcases matching TestCaseFilter(**kwargs)"""
+    testsuites = get_xmind_testsuites(xmind_file, config={'filter': filters.TestCaseFilter(**kwargs)})
+    return {(testsuite.name, sub_suite.name): [case.name for case in sub_suite.testcase_list]
+            for testsuite in testsuites for sub_suite in testsuite.sub_suites}
+
+
+def test_no_condition(xmind_file):
+    assert get_case_names(xmind_file) == {
+        ('product', 'login'): ['passed', 'automated', 'unmarked'],
+        ('product', 'search'): ['failed'],
+        ('other', 'login'): ['other'],
+    }
+
+
+def test_priorities(xmind_file):
+    assert get_case_names(xmind_file, priorities=[0]) == {('product', 'login'): ['passed'],
+                                                         ('other', 'login'): ['other']}
+    # a testcase without a priority in its title is P1
+    assert get_case_names(xmind_file, priorities=['1']) == {('product', 'login'): ['unmarked'],
+                                                           ('product', 'search'): ['failed']}
+
+
+def test_execution_types(xmind_file):
+    # the label of the testsuite topic isn't inherited by its testcases, the same as `parse_a_testcase`
+    assert get_case_names(xmind_file, execution_types=[2]) == {('product', 'login'): ['automated']}
+    assert get_case_names(xmind_file, execution_types=[1]) == {('product', 'login'): ['passed', 'unmarked'],
+                                                              ('product', 'search'): ['failed'],
+                                                              ('other', 'login'): ['other']}
+
+
+def test_results(xmind_file):
+    assert get_case_names(xmind_file, results=[1, 2]) == {('product', 'login'): ['passed'],
+                                                         ('product', 'search'): ['failed']}
+    assert get_case_names(xmind_file, results=[3, 4]) == {}
+
+
+def test_sheets_and_suites(xmind_file):
+    assert get_case_names(xmind_file, sheets=['Sheet 2']) == {('other', 'login'): ['other']}
+    assert get_case_names(xmind_file, suites=['s*']) == {('product', 'search'): ['failed']}
+    assert get_case_names(xmind_file, sheets=['Sheet 1'], suites=['log*'], priorities=[0, 2]) == {
+        ('product', 'login'): ['passed', 'automated']}
+    assert get_case_names(xmind_file, sheets=['Sheet 3']) == {}
+
+
+def test_filter_is_part_of_cache_key(xmind_file):
+    assert get_case_names(xmind_file, priorities=[0]) != get_case_names(xmind_file, priorities=[2])
+    assert get_case_names(xmind_file, priorities=[2]) == {('product', 'login'): ['automated']}
+
+
+def test_topic_result_is_the_testcase_result(tmp_path):
+    case_topics = [
+        marked('case marked', 'symbol-pause', marked('step', 'symbol-right')),
+        zen_topic('case', marked('step1', 'symbol-right'), marked('step2', 'symbol-minus')),
+        zen_topic('case', marked('step1', 'symbol-wrong'), marked('step2', 'symbol-right')),
+        zen_topic('case', zen_topic('step', marked('expected', 'symbol-pause'))),
+        zen_topic('case', zen_topic('step', marked('expected1', 'symbol-right'), 'expected2')),
+        zen_topic('case', marked('R|remark', 'symbol-right')),
+        zen_topic('case', zen_topic('step', marked('R|remark', 'symbol-wrong'))),
+    ]
+    xmind_file = write_xmind(tmp_path / 'results.xmind', zen_topic('suite', *case_topics))
+    case_dicts = load_xmind_file(xmind_file)[0]['topic']['topics']
+
+    results = [filters.get_topic_result(case_dict, DEFAULT_CONFIG) for case_dict in case_dicts]
+    assert results == [parse_a_testcase(case_dict, [], DEFAULT_CONFIG).result for case_dict in case_dicts]
+    assert results == [3, 4, 2, 3, 0, 0, 0]
+
+
+def test_filter_equality_and_pickle():
+    case_filter = filters.TestCaseFilter(priorities=['1', 0, 1], suites=['登录*'])
+    assert case_filter == filters.TestCaseFilter(priorities=[0, 1], suites=('登录*',))
+    assert hash(case_filter) == hash(filters.TestCaseFilter(priorities=[1, 0], suites=['登录*']))
+    assert case_filter != filters.TestCaseFilter(priorities=[0, 1])
+    assert repr(case_filter) == ("TestCaseFilter(priorities=(0, 1), execution_types=None, results=None, "
+                                 "sheets=None, suites=('登录*',))")
+    assert pickle.loads(pickle.dumps(case_filter)) == case_filter
+    assert case_filter.filters_cases
+    assert not filters.TestCaseFilter(sheets=['a']).filters_cases
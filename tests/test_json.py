@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import io
+import json
+import sys
+import pytest
+from xmind2testcase import utils
+from xmind2testcase.utils import write_json_array
+
+ITEMS = [
+    {'name': '登录', 'steps': [{'actions': 'input "password"\n', 'result': 0}], 'remark': '', 'empty': {}},
+    {'name': 'emoji 😀 \\ \t', 'importance': 1.5, 'execution_type': None, 'passed': True, 'steps': []},
+    [],
+    'a string',
+]
+
+
+def dumps_json_array(items):
+    return json.dumps(items, indent=4, separators=(',', ': '), ensure_ascii=False)
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def json_line_serializer(request, monkeypatch):
+    """The ndjson lines are serialized by orjson if it's installed, otherwise by the standard json"""
+    utils.import_orjson.cache_clear()
+    if request.param == 'orjson':
+        orjson = pytest.importorskip('orjson')
+        assert utils.import_orjson() is orjson
+    else:
+        monkeypatch.setitem(sys.modules, 'orjson', None)  # make the import fail
+        assert utils.import_orjson() is None
+    yield request.param
+    utils.import_orjson.cache_clear()
+
+
+@pytest.mark.parametrize('items', [[], ITEMS[:1], ITEMS, [[]], [{}]], ids=['empty', 'one', 'many', 'list', 'dict'])
+def test_write_json_array(items):
+    f = io.StringIO()
+    write_json_array(iter(items), f)
+    assert f.getvalue() == dumps_json_array(items)
+
+
+@pytest.mark.parametrize('items', [[], ITEMS], ids=['empty', 'many'])
+def test_json_file(tmp_path, items):
+    json_file = utils.testcases_to_json_file(iter(items), str(tmp_path / 'testcases.json'))
+    with open(json_file, 'rb') as f:
+        assert f.read().decode('utf-8') == dumps_json_array(items)
+
+
+@pytest.mark.parametrize('items', [[], ITEMS], ids=['empty', 'many'])
+def test_ndjson_file(tmp_path, json_line_serializer, items):
+    ndjson_file = utils.testcases_to_json_file(iter(items), str(tmp_path / 'testcases.ndjson'), ndjson=True)
+    with open(ndjson_file, 'rb') as f:
+        content = f.read().decode('utf-8')
+    # the non-ASCII characters are written as they are by both serializers
+    assert content == ''.join(json.dumps(item, separators=(',', ':'), ensure_ascii=False) + '\n' for item in items)
+    assert [json.loads(line) for line in content.splitlines()] == items
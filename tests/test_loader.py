@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import glob
+import json
+import os
+import zipfile
+import pytest
+import xmind
+from xmind2testcase import loader
+from xmind2testcase.loader import load_xmind_content
+from xmind2testcase.utils import get_xmind_testcase_list
+from conftest import DOCS_DIR
+
+DEEP_MAP_DEPTH = 20000  # far deeper than the recursion limit
+
+ZEN_CONTENT = [{
+    'id': 'sheet-1',
+    'title': 'Sheet 1',
+    'rootTopic': {
+        'id': 'root',
+        'title': 'Product/',
+        'notes': {'plain': {'content': 'root note'}},
+        'children': {
+            'attached': [{
+                'id': 'suite',
+                'title': 'Suite',
+                'href': 'https://example.com',
+                'labels': ['auto', 'ignored label'],
+                'children': {'attached': [{
+                    'id': 'case',
+                    'title': 'p1|Case',
+                    'markers': [{'markerId': 'priority-1'}, {'markerId': 'symbol-right'}],
+                    'children': {'attached': [{'id': 'step', 'title': 'Step'}]},
+                }]},
+            }, {
+                'id': 'other-suite',
+                'title': 'Other suite',
+            }],
+            'detached': [{'id': 'detached', 'title': 'Detached'}],
+        },
+    },
+}, {
+    'id': 'sheet-2',
+    'title': 'Sheet 2',
+    'rootTopic': {'id': 'root-2', 'title': 'Product 2'},
+}]
+
+
+def topic(topic_id, title, note=None, label=None, link=None, markers=None, topics=None):
+    topic_dict = {'id': topic_id, 'link': link, 'title': title, 'note': note, 'label': label, 'comment': None,
+                  'markers': markers or []}
+    if topics is not None:
+        topic_dict['topics'] = topics
+    return topic_dict
+
+
+@pytest.fixture
+def zen_xmind(tmp_path):
+    xmind_file = str(tmp_path / 'zen.xmind')
+    with zipfile.ZipFile(xmind_file, 'w') as zip_file:
+        zip_file.writestr('content.json', json.dumps(ZEN_CONTENT))
+        zip_file.writestr('content.xml', '<xmap-content>the legacy version warning</xmap-content>')
+    return xmind_file
+
+
+@pytest.mark.parametrize('xmind_file', sorted(glob.glob(os.path.join(DOCS_DIR, '*.xmind'))),
+                         ids=os.path.basename)
+def test_xmind8_content_is_the_same_as_xmind_sdk(xmind_file):
+    assert load_xmind_content(xmind_file) == xmind.load(xmind_file).getData()
+
+
+def test_zen_content(zen_xmind):
+    step = topic('step', 'Step')
+    case = topic('case', 'p1|Case', markers=['priority-1', 'symbol-right'], topics=[step])
+    suite = topic('suite', 'Suite', label='auto', link='https://example.com', topics=[case])
+    root = topic('root', 'Product/', note='root note', topics=[suite, topic('other-suite', 'Other suite')])
+
+    assert load_xmind_content(zen_xmind) == [
+        {'id': 'sheet-1', 'title': 'Sheet 1', 'topic': root},
+        {'id': 'sheet-2', 'title': 'Sheet 2', 'topic': topic('root-2', 'Product 2')},
+    ]
+
+
+def test_zen_sheets_and_suites_are_selected(zen_xmind):
+    sheets = load_xmind_content(zen_xmind, sheets=['Sheet 1'], suites=['Other*'])
+    assert [sheet['title'] for sheet in sheets] == ['Sheet 1']
+    assert [suite['title'] for suite in sheets[0]['topic']['topics']] == ['Other suite']
+
+
+def test_xmind8_sheets_and_suites_are_selected():
+    xmind_file = os.path.join(DOCS_DIR, 'xmind_testcase_template_v1.1.xmind')
+    full = load_xmind_content(xmind_file)
+    sheet_title = full[-1]['title']
+    suite_title = full[-1]['topic']['topics'][-1]['title']
+
+    sheets = load_xmind_content(xmind_file, sheets=[sheet_title], suites=[suite_title])
+    assert [sheet['title'] for sheet in sheets] == [sheet_title]
+    assert sheets[0]['topic']['topics'] == [full[-1]['topic']['topics'][-1]]
+    assert load_xmind_content(xmind_file, max_sheets=1) == full[:1]
+
+
+def write_deep_zen_xmind(xmind_file, depth):
+    """A chain of `depth` topics under the root topic, json.dumps would recurse too"""
+    text = ''.join('{{"id": "topic-{0}", "title": "topic{0}", "children": {{"attached": ['.format(level)
+                   for level in range(depth))
+    text += '{"id": "leaf", "title": "leaf"}' + ']}}' * depth
+    with zipfile.ZipFile(xmind_file, 'w') as zip_file:
+        zip_file.writestr('content.json', '[{"id": "sheet", "title": "Sheet 1", "rootTopic": %s}]' % text)
+
+
+def write_deep_xmind8_xmind(xmind_file, depth):
+    text = ''.join('<topic id="topic-{0}"><title>topic{0}</title><children><topics type="attached">'.format(level)
+                   for level in range(depth))
+    text += '<topic id="leaf"><title>leaf</title></topic>' + '</topics></children></topic>' * depth
+    with zipfile.ZipFile(xmind_file, 'w') as zip_file:
+        zip_file.writestr('content.xml', '<xmap-content xmlns="urn:xmind:xmap:xmlns:content:2.0">'
+                                         '<sheet id="sheet">%s<title>Sheet 1</title></sheet></xmap-content>' % text)
+
+
+@pytest.mark.parametrize('write_deep_xmind', [write_deep_zen_xmind, write_deep_xmind8_xmind])
+def test_deep_map(tmp_path, write_deep_xmind):
+    xmind_file = str(tmp_path / 'deep.xmind')
+    write_deep_xmind(xmind_file, DEEP_MAP_DEPTH)
+
+    topic_dict, depth = load_xmind_content(xmind_file)[0]['topic'], 0
+    while topic_dict.get('topics'):
+        assert topic_dict['title'] == 'topic{}'.format(depth)
+        topic_dict, depth = topic_dict['topics'][0], depth + 1
+    assert (topic_dict['title'], depth) == ('leaf', DEEP_MAP_DEPTH)
+
+    testcases = get_xmind_testcase_list(xmind_file)
+    assert [(testcase['suite'], testcase['name']) for testcase in testcases] == [
+        ('topic1', 'topic{}'.format(DEEP_MAP_DEPTH - 1))]
+
+
+@pytest.mark.parametrize('text', [
+    json.dumps(ZEN_CONTENT), json.dumps(ZEN_CONTENT, indent='\t', ensure_ascii=False),
+    '[]', '{}', '[{"a": [], "b": {}}, -1.5e3, 0, "中文\\n", true, false, null, NaN, -Infinity]'])
+def test_loads_json_iteratively(text):
+    assert json.dumps(loader._loads_json_iteratively(text)) == json.dumps(json.loads(text))
+
+
+@pytest.mark.parametrize('text', ['', '[1,]', '{"a" 1}', '[1 2]', '{"a": 1,}', '[1] 2', '{1: 2}', '[', '{"a":'])
+def test_loads_invalid_json_iteratively(text):
+    with pytest.raises(json.JSONDecodeError):
+        loader._loads_json_iteratively(text)
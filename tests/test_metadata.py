@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import copy
+import pytest
+from xmind2testcase.metadata import ListView, MetadataView
+from xmind2testcase.utils import get_xmind_testsuites
+from conftest import DEMO_XMIND_FILE
+
+
+def to_plain(value):
+    """The views with their sub views converted to dicts and lists recursively"""
+    if isinstance(value, MetadataView):
+        return {key: to_plain(item) for key, item in value.items()}
+    if isinstance(value, ListView):
+        return [to_plain(item) for item in value]
+    return value
+
+
+@pytest.fixture
+def testsuites():
+    testsuites = get_xmind_testsuites(DEMO_XMIND_FILE)
+    testsuites[0].statistics = {'case_num': 3, 'non_execution': 1, 'pass': 1, 'failed': 1, 'blocked': 0,
+                                'skipped': 0}
+    return testsuites
+
+
+def test_dict_view_is_the_same_as_to_dict(testsuites):
+    assert 'statistics' in testsuites[0].dict_view() and 'statistics' not in testsuites[0].sub_suites[0].dict_view()
+    for testsuite in testsuites:
+        assert to_plain(testsuite.dict_view()) == testsuite.to_dict()
+        for sub_suite in testsuite.sub_suites:
+            assert to_plain(sub_suite.dict_view()) == sub_suite.to_dict()
+            for testcase in sub_suite.testcase_list:
+                assert to_plain(testcase.dict_view()) == testcase.to_dict()
+                for step in testcase.steps:
+                    assert to_plain(step.dict_view()) == step.to_dict()
+
+
+def test_dict_view_reads_on_access(testsuites):
+    testcase = testsuites[0].sub_suites[0].testcase_list[0]
+    view = testcase.dict_view()
+    testcase.name = 'renamed'
+    testcase.steps = None
+    assert view['name'] == 'renamed'
+    assert to_plain(view) == testcase.to_dict()
+    with pytest.raises(KeyError):
+        view['unknown']
+
+
+def test_dict_view_is_read_only(testsuites):
+    before = [testsuite.to_dict() for testsuite in testsuites]
+    view = testsuites[0].dict_view()
+    testcases = view['sub_suites'][0]['testcase_list']
+    steps = testcases[0]['steps']
+
+    for mapping, key in ((view, 'name'), (view, 'statistics'), (view['statistics'], 'case_num'),
+                         (testcases[0], 'name'), (steps[0], 'actions')):
+        with pytest.raises(TypeError):
+            mapping[key] = 'changed'
+        with pytest.raises(TypeError):
+            del mapping[key]
+    for sequence in (view['sub_suites'], testcases, steps):
+        with pytest.raises(TypeError):
+            sequence[0] = None
+        with pytest.raises(AttributeError):
+            sequence.append(None)
+    testcases[:].clear()  # a slice is a new list of the views
+    copy.copy(view)
+
+    assert [testsuite.to_dict() for testsuite in testsuites] == before
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import os
+import shutil
+import pytest
+from xmind2testcase import filters, output
+from xmind2testcase.convert import xmind_to_testcase_files
+from xmind2testcase.output import atomic_open, get_manifest_file, is_fresh_output, write_manifest
+from conftest import DOCS_DIR
+
+
+@pytest.fixture
+def output_file(tmp_path):
+    output_file = str(tmp_path / 'testcases.csv')
+    with open(output_file, 'w') as f:
+        f.write('a,b\n')
+    write_manifest(output_file, 'hash', {'ignore_char': '#'}, {'option': 1})
+    return output_file
+
+
+def test_fresh_output(output_file):
+    assert is_fresh_output(output_file, 'hash', {'ignore_char': '#'}, {'option': 1})
+
+
+@pytest.mark.parametrize('source_hash, config, options', [
+    ('other hash', {'ignore_char': '#'}, {'option': 1}),
+    ('hash', None, {'option': 1}),
+    ('hash', {'ignore_char': '#', 'filter': filters.TestCaseFilter(priorities=[1])}, {'option': 1}),
+    ('hash', {'ignore_char': '#'}, None),
+])
+def test_stale_source_or_config(output_file, source_hash, config, options):
+    assert not is_fresh_output(output_file, source_hash, config, options)
+
+
+def test_stale_version(output_file, monkeypatch):
+    monkeypatch.setattr(output, '__version__', '0.0.0')
+    assert not is_fresh_output(output_file, 'hash', {'ignore_char': '#'}, {'option': 1})
+
+
+def test_modified_output_file(output_file):
+    stat = os.stat(output_file)
+    with open(output_file, 'w') as f:
+        f.write('c,d\n')
+    os.utime(output_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    assert not is_fresh_output(output_file, 'hash', {'ignore_char': '#'}, {'option': 1})
+
+
+@pytest.mark.parametrize('manifest', [None, '', '{"source_hash": "hash"', '[]'])
+def test_missing_or_invalid_manifest(output_file, manifest):
+    os.remove(get_manifest_file(output_file))
+    if manifest is not None:
+        with open(get_manifest_file(output_file), 'w') as f:
+            f.write(manifest)
+    assert not is_fresh_output(output_file, 'hash', {'ignore_char': '#'}, {'option': 1})
+
+
+def test_atomic_open_keeps_the_old_file_on_error(output_file):
+    with pytest.raises(RuntimeError):
+        with atomic_open(output_file) as f:
+            f.write('partial')
+            raise RuntimeError('failed while writing')
+
+    with open(output_file) as f:
+        assert f.read() == 'a,b\n'
+    assert sorted(os.listdir(os.path.dirname(output_file))) == ['testcases.csv', 'testcases.csv.manifest']
+
+
+def test_changed_xmind_file_is_converted_again(demo_xmind):
+    csv_file = xmind_to_testcase_files(demo_xmind, formats=('csv',))['csv']
+    with open(csv_file, 'rb') as f:
+        demo_csv = f.read()
+
+    shutil.copy(os.path.join(DOCS_DIR, 'xmind_testcase_template_v1.1.xmind'), demo_xmind)
+    assert xmind_to_testcase_files(demo_xmind, formats=('csv',))['csv'] == csv_file
+    with open(csv_file, 'rb') as f:
+        assert f.read() != demo_csv
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import concurrent.futures
+import logging
+import random
+import pytest
+from xmind2testcase import metadata
+from xmind2testcase.parser import count_topics, merge_same_name_cases, xmind_to_testsuites
+from xmind2testcase.utils import get_xmind_testsuites, load_xmind_file
+from conftest import DEMO_XMIND_FILE, write_xmind, zen_topic
+
+
+def make_case(name, *actions, importance=1):
+    return metadata.TestCase(name=name, importance=importance, preconditions='',
+                             steps=[metadata.TestStep(actions=action) for action in actions])
+
+
+def reference_merge(cases):
+    """The merge of consecutive same-named testcases before it's done in one pass"""
+    merged = []
+    for case in cases:
+        if merged and merged[-1].name == case.name:
+            first_case = merged[-1]
+            merged[-1] = make_case(first_case.name, importance=first_case.importance)
+            merged[-1].steps = first_case.steps + case.steps
+        else:
+            merged.append(case)
+    return merged
+
+
+def summarize(cases):
+    return [(case.name, case.importance, [step.actions for step in case.steps]) for case in cases]
+
+
+def test_consecutive_same_name_cases_are_merged_in_order():
+    cases = [make_case('login', 's1'), make_case('login', 's2', 's3', importance=2), make_case('logout', 's4'),
+             make_case('login', 's5'), make_case('exit', 's6'), make_case('exit', 's7')]
+
+    assert summarize(merge_same_name_cases(cases)) == [
+        ('login', 1, ['s1', 's2', 's3']),
+        ('logout', 1, ['s4']),
+        ('login', 1, ['s5']),
+        ('exit', 1, ['s6', 's7']),
+    ]
+
+
+def test_merge_is_the_same_as_reference():
+    rand = random.Random(0)
+    for _ in range(200):
+        names = [rand.choice('abc') for _ in range(rand.randint(0, 12))]
+
+        def gen_cases():
+            return [make_case(name, '{}{}'.format(name, index), importance=index % 3)
+                    for index, name in enumerate(names)]
+
+        assert summarize(merge_same_name_cases(gen_cases())) == summarize(reference_merge(gen_cases()))
+
+
+def test_merge_is_lazy():
+    def gen_cases():
+        yield make_case('a', 's1')
+        yield make_case('b', 's2')
+        raise AssertionError('the merge should not read ahead more than one testcase')
+
+    merged = merge_same_name_cases(gen_cases())
+    assert next(merged).name == 'a'
+
+
+def test_testcases_keep_the_order_of_topics(tmp_path):
+    xmind_file = write_xmind(tmp_path / 'testcases.xmind', zen_topic(
+        'product', zen_topic('suite', zen_topic('login', 'ok1', 'ok2', 'ok3'), zen_topic('logout', 'bye1'),
+                             zen_topic('login', 'ok4'))))
+
+    testcases = get_xmind_testsuites(xmind_file)[0].sub_suites[0].testcase_list
+    assert [(case.name, [step.actions for step in case.steps]) for case in testcases] == [
+        ('login', ['ok1', 'ok2', 'ok3']),
+        ('logout', ['bye1']),
+        ('login', ['ok4']),
+    ]
+
+
+@pytest.fixture
+def sheets(tmp_path):
+    """The sheet dict list of 5 sheets, each with a different number of testsuites"""
+    root_topics = [zen_topic('product{}'.format(index),
+                             *[zen_topic('suite{}'.format(suite), zen_topic('case', 'step{}'.format(index)), 'case2')
+                               for suite in range(index + 1)])
+                   for index in range(5)]
+    return load_xmind_file(write_xmind(tmp_path / 'sheets.xmind', *root_topics))
+
+
+@pytest.fixture
+def process_pools(monkeypatch):
+    """The worker counts of the process pools created by `xmind_to_testsuites`"""
+    pools = []
+
+    class RecordedProcessPoolExecutor(concurrent.futures.ProcessPoolExecutor):
+        def __init__(self, max_workers=None, *args, **kwargs):
+            pools.append(max_workers)
+            super(RecordedProcessPoolExecutor, self).__init__(max_workers, *args, **kwargs)
+
+    monkeypatch.setattr(concurrent.futures, 'ProcessPoolExecutor', RecordedProcessPoolExecutor)
+    return pools
+
+
+def test_parallel_parsing_is_the_same_as_serial(sheets, process_pools):
+    serial = [testsuite.to_dict() for testsuite in xmind_to_testsuites(sheets)]
+    assert process_pools == []
+
+    parallel = xmind_to_testsuites(sheets, processes=2, parallel_threshold=count_topics(
+        [sheet['topic'] for sheet in sheets]))
+    assert process_pools == [2]
+    assert [testsuite.name for testsuite in parallel] == ['product{}'.format(index) for index in range(5)]
+    assert [testsuite.to_dict() for testsuite in parallel] == serial
+
+
+def test_small_file_is_parsed_in_process(sheets, process_pools):
+    threshold = count_topics([sheet['topic'] for sheet in sheets]) + 1
+    testsuites = xmind_to_testsuites(sheets, processes=2, parallel_threshold=threshold)
+    assert process_pools == []
+    assert [testsuite.to_dict() for testsuite in testsuites] == [
+        testsuite.to_dict() for testsuite in xmind_to_testsuites(sheets)]
+
+
+@pytest.fixture
+def rendered(monkeypatch):
+    """The classes of the metadata rendered by `to_dict`"""
+    classes = []
+    for cls in (metadata.TestSuite, metadata.TestCase, metadata.TestStep):
+        def to_dict(self, to_dict=cls.to_dict):
+            classes.append(type(self).__name__)
+            return to_dict(self)
+
+        monkeypatch.setattr(cls, 'to_dict', to_dict)
+    return classes
+
+
+def test_no_metadata_is_rendered_without_debug_logging(caplog, rendered):
+    caplog.set_level(logging.INFO)
+    assert get_xmind_testsuites(DEMO_XMIND_FILE)
+    assert rendered == []
+
+
+def test_debug_logging_renders_no_testsuite(caplog, rendered):
+    caplog.set_level(logging.DEBUG)
+    assert get_xmind_testsuites(DEMO_XMIND_FILE)
+    assert 'TestCase' in rendered and 'TestSuite' not in rendered
+    assert 'sheet(画布 1) parsing complete: 2 testsuites, 10 testcases' in caplog.messages
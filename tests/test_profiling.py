@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import json
+import pstats
+from xmind2testcase import cache
+from xmind2testcase.parser import count_topics
+from xmind2testcase.profiling import ConversionStats
+from xmind2testcase.utils import get_xmind_testsuites, load_xmind_file, xmind_testcase_to_json_file
+
+
+def assert_not_parsed(stats):
+    assert isinstance(stats, ConversionStats)
+    assert (stats.topics, stats.testcases, stats.steps, stats.stages) == (0, 0, 0, {})
+    assert stats.wall_time > 0
+
+
+def test_profile_conversion(demo_xmind):
+    json_file, stats = xmind_testcase_to_json_file(demo_xmind, profile=True)
+    with open(json_file, encoding='utf-8') as f:
+        testcases = json.load(f)
+
+    assert stats.topics == count_topics([sheet['topic'] for sheet in load_xmind_file(demo_xmind)])
+    assert stats.testcases == len(testcases)
+    assert stats.steps == sum(len(testcase['steps']) for testcase in testcases)
+    assert sorted(stats.stages) == ['export:json', 'filter', 'load', 'merge']
+    assert stats.wall_time >= stats.stages['export:json'] > 0
+    assert stats.peak_memory > 0
+    assert stats.to_dict()['testcases'] == len(testcases)
+    assert 'testcases: {}'.format(len(testcases)) in str(stats)
+
+    # the json file is up to date, nothing is parsed
+    assert xmind_testcase_to_json_file(demo_xmind) == json_file
+    result, stats = xmind_testcase_to_json_file(demo_xmind, profile=True)
+    assert result == json_file
+    assert_not_parsed(stats)
+
+
+def test_profile_cached_parsing(demo_xmind):
+    testsuites, stats = get_xmind_testsuites(demo_xmind, profile=True)
+    assert stats.testcases == sum(len(suite.testcase_list) for suite in testsuites[0].sub_suites) > 0
+    assert 'traverse' in stats.stages
+
+    cached_testsuites, stats = get_xmind_testsuites(demo_xmind, profile=True)
+    assert [suite.to_dict() for suite in cached_testsuites] == [suite.to_dict() for suite in testsuites]
+    assert_not_parsed(stats)
+
+    cache.parse_cache.clear()
+    _, stats = get_xmind_testsuites(demo_xmind, profile=True)
+    assert stats.testcases > 0
+
+
+def test_profile_file(demo_xmind, tmp_path):
+    profile_file = str(tmp_path / 'convert.prof')
+    _, stats = get_xmind_testsuites(demo_xmind, profile=profile_file)
+    assert stats.profile_file == profile_file
+    assert 'cProfile stats: {}'.format(profile_file) in str(stats)
+    assert pstats.Stats(profile_file).total_calls > 0
+
+
+def test_without_profile(demo_xmind):
+    testsuites = get_xmind_testsuites(demo_xmind, profile=None)
+    assert isinstance(testsuites, list) and testsuites[0].name
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import functools
+import json
+import os
+import socket
+import threading
+import pytest
+from xmind2testcase import server
+from xmind2testcase.cli import batch_main, convert_main
+from xmind2testcase.utils import get_xmind_testcase_list
+from conftest import write_suites_xmind
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='requires Unix domain sockets')
+POLL_INTERVAL = 0.05  # of serve_forever, a shorter one stops the daemons of the tests faster
+
+
+@pytest.fixture
+def socket_path(tmp_path, monkeypatch):
+    monkeypatch.delenv('XMIND2TESTCASE_SOCKET', raising=False)
+    return str(tmp_path / 'daemon.sock')
+
+
+@pytest.fixture
+def daemon(socket_path):
+    """A conversion daemon serving in a thread of the test process"""
+    conversion_server = server.ConversionServer(socket_path, server.ConversionRequestHandler)
+    thread = threading.Thread(target=conversion_server.serve_forever, args=(POLL_INTERVAL,))
+    thread.start()
+    yield conversion_server
+    conversion_server.shutdown()
+    conversion_server.server_close()
+    thread.join()
+
+
+def test_handle_request():
+    assert server.handle_request({'command': 'ping'})['pid'] == os.getpid()
+    with pytest.raises(ValueError, match='Unknown command'):
+        server.handle_request({'command': 'unknown'})
+    with pytest.raises(ValueError, match='should be absolute'):
+        server.handle_request({'xmind_files': ['relative.xmind']})
+    assert server.handle_request({'xmind_files': []}) == {'results': []}
+
+
+def test_handle_request_reuses_unchanged_suites(tmp_path, parsed_suites):
+    xmind_file = write_suites_xmind(tmp_path / 'suites.xmind')
+    request = {'xmind_files': [xmind_file], 'formats': ['json']}
+    server.handle_request(request)
+    write_suites_xmind(xmind_file, edited_suite=1)
+    assert server.handle_request(request)['results'][0]['error'] is None
+    assert parsed_suites == ['suite0', 'suite1', 'suite2', 'suite1']
+
+
+def test_ping(daemon, socket_path):
+    assert server.send_request(socket_path, {'command': 'ping'})['pid'] == os.getpid()
+    assert server.is_server_running(socket_path)
+
+
+def test_convert_remotely(daemon, socket_path, demo_xmind, monkeypatch):
+    monkeypatch.chdir(os.path.dirname(demo_xmind))
+    missing_file = os.path.join(os.path.dirname(demo_xmind), 'missing.xmind')
+    results = server.convert_remotely(socket_path, ['demo.xmind', missing_file], formats=['json'])
+
+    assert results[0] == (demo_xmind, {'json': demo_xmind[:-len('.xmind')] + '.json'}, None)
+    with open(results[0][1]['json'], encoding='utf-8') as f:
+        assert json.load(f) == get_xmind_testcase_list(demo_xmind)
+    xmind_file, output_files, error = results[1]
+    assert (xmind_file, output_files) == (missing_file, None)
+    assert error.startswith('FileNotFoundError')
+
+
+def test_error_response(daemon, socket_path):
+    with pytest.raises(RuntimeError, match='Unknown command: unknown'):
+        server.send_request(socket_path, {'command': 'unknown'})
+
+    # a malformed request is answered with an error too, and the daemon keeps serving
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+        client.sendall(b'not json\n')
+        with client.makefile('rb') as f:
+            assert json.loads(f.readline().decode('utf-8'))['error'].startswith('JSONDecodeError')
+    finally:
+        client.close()
+    assert server.is_server_running(socket_path)
+
+
+def test_daemon_not_running(socket_path):
+    with pytest.raises(OSError):
+        server.send_request(socket_path, {'command': 'ping'})
+    assert not server.is_server_running(socket_path)
+
+
+def test_shutdown(socket_path):
+    conversion_server = server.ConversionServer(socket_path, server.ConversionRequestHandler)
+    thread = threading.Thread(target=conversion_server.serve_forever, args=(POLL_INTERVAL,))
+    thread.start()
+    try:
+        server.send_request(socket_path, {'command': 'shutdown'})
+        thread.join(5)
+        assert not thread.is_alive()
+    finally:
+        conversion_server.server_close()
+
+
+def fail_request(request, conversion_server=None):
+    raise ValueError('the daemon is broken')
+
+
+@pytest.mark.parametrize('main', [convert_main, batch_main])
+def test_cli_exits_non_zero_for_error_response(daemon, socket_path, demo_xmind, monkeypatch, main):
+    monkeypatch.setattr(server, 'handle_request', fail_request)
+    with pytest.raises(SystemExit) as exc_info:
+        main([demo_xmind, '--socket', socket_path])
+    assert exc_info.value.code == 1
+    assert sorted(os.listdir(os.path.dirname(demo_xmind))) == ['daemon.sock', 'demo.xmind']
+
+
+@pytest.mark.parametrize('main', [convert_main, batch_main])
+def test_cli_exits_non_zero_for_timeout(daemon, socket_path, demo_xmind, monkeypatch, main):
+    released = threading.Event()
+
+    def slow_request(request, conversion_server=None):
+        released.wait(5)
+        return {'results': []}
+
+    monkeypatch.setattr(server, 'handle_request', slow_request)
+    monkeypatch.setattr(server, 'send_request', functools.partial(server.send_request, timeout=0.1))
+    try:
+        with pytest.raises(SystemExit) as exc_info:
+            main([demo_xmind, '--socket', socket_path])
+    finally:
+        released.set()
+    assert exc_info.value.code == 1
+    # the daemon may still be converting, the XMind file isn't converted locally at the same time
+    assert sorted(os.listdir(os.path.dirname(demo_xmind))) == ['daemon.sock', 'demo.xmind']
+
+
+def test_cli_exits_non_zero_for_failed_file(daemon, socket_path, tmp_path):
+    with pytest.raises(SystemExit) as exc_info:
+        convert_main([str(tmp_path / 'missing.xmind'), '--socket', socket_path])
+    assert exc_info.value.code == 1
+
+
+def test_cli_converts_by_daemon(daemon, socket_path, demo_xmind, monkeypatch):
+    converted = []
+    monkeypatch.setattr(server, 'handle_request', lambda request, conversion_server=None: converted.append(
+        request) or {'results': [{'xmind_file': demo_xmind, 'output_files': {'csv': 'demo.csv'}, 'error': None}]})
+
+    convert_main([demo_xmind, '-csv', '--socket', socket_path, '--suite', '登录*'])
+    assert converted == [{'command': 'convert', 'xmind_files': [demo_xmind], 'formats': ['csv'], 'sheets': None,
+                          'suites': ['登录*']}]
+
+    del converted[:]
+    convert_main([demo_xmind, '-csv', '-json', '--socket', socket_path])
+    assert converted[0]['formats'] == ['json', 'csv']
+
+
+def test_cli_converts_locally_without_daemon(socket_path, demo_xmind):
+    convert_main([demo_xmind, '-csv', '--socket', socket_path])
+    assert os.path.exists(demo_xmind[:-len('.xmind')] + '.csv')
+
+
+@pytest.mark.parametrize('flags, extensions', [
+    (['-csv', '-xml'], ['.csv', '.xml']),
+    (['-json', '-csv'], ['.csv', '.json']),
+    ([], ['.csv', '.json', '.xml']),
+])
+def test_cli_converts_selected_formats_locally(socket_path, demo_xmind, flags, extensions):
+    convert_main([demo_xmind, '--socket', socket_path] + flags)
+    outputs = [name for name in os.listdir(os.path.dirname(demo_xmind)) if not name.endswith('.manifest')]
+    assert sorted(outputs) == sorted(['demo.xmind'] + ['demo' + extension for extension in extensions])
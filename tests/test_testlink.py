@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+from xmind2testcase import metadata
+from xmind2testcase.parser import DEFAULT_CONFIG
+from xmind2testcase import testlink
+from xmind2testcase.convert import xmind_to_testcase_files
+from conftest import write_xmind, zen_topic
+
+
+def make_testsuites():
+    testcase = metadata.TestCase(name='@skipped testcase', steps=[])
+    kept = metadata.TestCase(name='kept testcase', summary='@skipped summary', steps=[
+        metadata.TestStep(actions='kept step'), metadata.TestStep(step_number=2, actions='@skipped step')])
+    sub_suite = metadata.TestSuite(name='suite', details='@skipped details', testcase_list=[testcase, kept])
+    return [metadata.TestSuite(name='product', details='product details', sub_suites=[sub_suite])]
+
+
+def test_default_ignore_char():
+    xml = testlink.testsuites_to_xml_content(make_testsuites()).decode('utf-8')
+    assert '@skipped testcase' in xml and '@skipped details' in xml and '@skipped step' in xml
+
+
+def test_ignore_char_of_config():
+    xml = testlink.testsuites_to_xml_content(make_testsuites(), config={'ignore_char': '@'}).decode('utf-8')
+    assert '@skipped' not in xml
+    assert 'kept testcase' in xml and 'kept step' in xml and 'product details' in xml
+    assert DEFAULT_CONFIG['ignore_char'] == '#!！'
+
+
+def test_xmind_to_testlink_xml_file_passes_config(tmp_path):
+    xmind_file = write_xmind(tmp_path / 'testcases.xmind', zen_topic(
+        'product', zen_topic('suite', zen_topic('testcase', 'step1', '@step2'), notes={
+            'plain': {'content': '@details'}})))
+
+    with open(testlink.xmind_to_testlink_xml_file(xmind_file), encoding='utf-8') as f:
+        xml = f.read()
+    assert '@step2' in xml and '@details' in xml
+
+    with open(testlink.xmind_to_testlink_xml_file(xmind_file, config={'ignore_char': '@'}), encoding='utf-8') as f:
+        xml = f.read()
+    assert '@' not in xml and 'testcase' in xml
+
+
+def test_exporter_gets_config(tmp_path):
+    xmind_file = write_xmind(tmp_path / 'testcases.xmind', zen_topic(
+        'product', zen_topic('suite', zen_topic('testcase', 'step1', '@step2'), notes={
+            'plain': {'content': '@details'}})))
+
+    output_files = xmind_to_testcase_files(xmind_file, formats=('xml',), config={'ignore_char': '@'})
+    with open(output_files['xml'], encoding='utf-8') as f:
+        assert '@' not in f.read()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import json
+import logging
+import os
+import pytest
+from xmind2testcase import trace
+from xmind2testcase.utils import get_xmind_testsuites
+from xmind2testcase.zentao import xmind_to_zentao_csv_file
+
+
+@pytest.fixture
+def events(monkeypatch):
+    """The events passed to a trace hook, which is removed after the test"""
+    monkeypatch.setattr(trace, '_sample_rate', 1.0)
+    events = []
+    trace.add_trace_hook(events.append)
+    yield events
+    trace.remove_trace_hook(events.append)
+
+
+def test_conversion_is_traced(demo_xmind, events):
+    testsuites = get_xmind_testsuites(demo_xmind)
+    assert [event['stage'] for event in events] == ['load', 'filter', 'merge', 'merge', 'traverse']
+    assert len({event['trace_id'] for event in events}) == 1
+    assert {event['pid'] for event in events} == {os.getpid()}
+    assert all(event['duration'] >= 0 and event['start'] > 0 for event in events)
+
+    load, _, merge, _, traverse = events
+    assert (load['xmind_file'], load['sheets']) == (demo_xmind, 1)
+    assert merge['suite'] == testsuites[0].sub_suites[0].name
+    assert (traverse['suites'], traverse['cases']) == (2, sum(
+        len(sub_suite.testcase_list) for sub_suite in testsuites[0].sub_suites))
+
+
+def test_streaming_conversion_is_traced(demo_xmind, events):
+    csv_file = xmind_to_zentao_csv_file(demo_xmind)
+    assert [event['stage'] for event in events] == ['load', 'filter', 'merge', 'merge', 'export']
+    export = events[-1]
+    assert (export['format'], export['output_file'], export['size']) == ('csv', csv_file, os.path.getsize(csv_file))
+    # the export pulls the testcases from the parser, so its stage covers the others
+    assert export['start'] <= events[0]['start']
+
+    del events[:]
+    xmind_to_zentao_csv_file(demo_xmind)  # the fresh csv file is returned without any stage
+    assert events == []
+
+
+def test_conversions_are_separate_traces(demo_xmind, events):
+    get_xmind_testsuites(demo_xmind, use_cache=False)
+    get_xmind_testsuites(demo_xmind, use_cache=False)
+    assert len({event['trace_id'] for event in events}) == 2
+
+
+def test_sampling_off(demo_xmind, events):
+    trace.set_trace_sample_rate(0)
+    get_xmind_testsuites(demo_xmind)
+    assert events == []
+
+    with trace.start_trace(sampled=True) as trace_id:  # a conversion can be traced regardless of the sample rate
+        assert trace.is_tracing()
+        get_xmind_testsuites(demo_xmind, use_cache=False)
+    assert events and {event['trace_id'] for event in events} == {trace_id}
+
+
+def test_no_hook(demo_xmind):
+    with trace.start_trace() as trace_id:
+        assert trace_id is None and not trace.is_tracing()
+        with trace.trace_stage('load') as event:
+            event['sheets'] = 1
+    assert event == {'sheets': 1}
+
+
+def test_failed_hook_never_breaks_conversion(demo_xmind, events, caplog):
+    def fail(event):
+        raise ValueError('the hook is broken')
+
+    trace.add_trace_hook(fail)
+    try:
+        assert get_xmind_testsuites(demo_xmind)
+    finally:
+        trace.remove_trace_hook(fail)
+    assert [event['stage'] for event in events] == ['load', 'filter', 'merge', 'merge', 'traverse']
+    assert 'The trace hook' in caplog.text
+
+
+def test_log_trace_event(demo_xmind, caplog, monkeypatch):
+    monkeypatch.setattr(trace, '_sample_rate', 1.0)
+    caplog.set_level(logging.INFO, logger='xmind2testcase.trace')
+    trace.add_trace_hook(trace.log_trace_event)
+    try:
+        get_xmind_testsuites(demo_xmind)
+    finally:
+        trace.remove_trace_hook(trace.log_trace_event)
+    events = [json.loads(record.getMessage()) for record in caplog.records if record.name == 'xmind2testcase.trace']
+    assert [event['stage'] for event in events] == ['load', 'filter', 'merge', 'merge', 'traverse']
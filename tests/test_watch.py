@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import os
+import shutil
+import threading
+import time
+import pytest
+from xmind2testcase import watch
+from conftest import DEMO_XMIND_FILE, write_suites_xmind
+
+
+class ScriptedObserver(object):
+    """Return the given changes one read after another, then stop the watcher, a change can be a function making
+    the change and returning the changed files"""
+
+    def __init__(self, changes):
+        self.changes = list(changes)
+        self.watcher = None
+        self.closed = False
+
+    def read(self, timeout):
+        time.sleep(0.01)
+        if self.changes:
+            change = self.changes.pop(0)
+            return change() if callable(change) else change
+        if not self.watcher._running and not self.watcher._pending:
+            self.watcher.stop()
+        return []
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def conversions(monkeypatch):
+    """The XMind files passed to the conversion, the output files aren't written"""
+    converted = []
+
+    def convert(xmind_file, formats, concurrent=True, config=None, use_suite_cache=False):
+        assert use_suite_cache
+        converted.append(xmind_file)
+        return {fmt: xmind_file + '.' + fmt for fmt in formats}
+
+    monkeypatch.setattr(watch, 'xmind_to_testcase_files', convert)
+    return converted
+
+
+@pytest.fixture
+def xmind_dir(tmp_path, monkeypatch):
+    os.makedirs(str(tmp_path / 'sub'))
+    shutil.copy(DEMO_XMIND_FILE, str(tmp_path / 'demo.xmind'))
+    shutil.copy(DEMO_XMIND_FILE, str(tmp_path / 'sub' / 'other.xmind'))
+    (tmp_path / '~demo.xmind').write_bytes(b'a temp file of XMind')
+    monkeypatch.chdir(str(tmp_path))
+    return tmp_path
+
+
+def run_watcher(changes, root_dir='.', initial=True):
+    observer = ScriptedObserver(changes)
+    watcher = watch.Watcher(root_dir, formats=('csv',), workers=2, debounce=0, observer=observer)
+    observer.watcher = watcher
+    watcher.run(initial=initial)
+    assert observer.closed
+    return watcher
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_relative_paths_are_tracked_once(xmind_dir, conversions):
+    # the changes of the same file under different paths, before and after its initial conversion
+    run_watcher([['demo.xmind', './demo.xmind'], [], [str(xmind_dir / 'demo.xmind'), 'sub/../demo.xmind']])
+    assert sorted(conversions) == [str(xmind_dir / 'demo.xmind'), str(xmind_dir / 'sub' / 'other.xmind')]
+
+
+def test_changed_content_is_converted_again(xmind_dir, conversions):
+    def change():
+        with open('demo.xmind', 'ab') as f:
+            f.write(b'\0')
+        return ['demo.xmind']
+
+    run_watcher([['demo.xmind'], change, ['./demo.xmind']], initial=False)
+    assert conversions == [str(xmind_dir / 'demo.xmind')] * 2
+
+
+def test_polling_observer_with_relative_root(xmind_dir):
+    observer = watch.PollingObserver('.', interval=0)
+    assert observer.read(0) == []
+
+    os.utime('demo.xmind', (time.time() + 10, time.time() + 10))
+    shutil.copy('demo.xmind', str(xmind_dir / 'sub' / 'new.xmind'))
+    assert sorted(observer.read(0)) == [str(xmind_dir / 'demo.xmind'), str(xmind_dir / 'sub' / 'new.xmind')]
+    assert observer.read(0) == []
+
+
+def test_inotify_observer_with_relative_root(xmind_dir):
+    pytest.importorskip('inotify_simple')
+    observer = watch.InotifyObserver('.')
+    try:
+        with open('demo.xmind', 'ab') as f:
+            f.write(b'\0')
+        os.makedirs('new')
+        shutil.copy('demo.xmind', 'new/new.xmind')
+        changed = observer.read(1)
+    finally:
+        observer.close()
+    assert set(changed) == {str(xmind_dir / 'demo.xmind'), str(xmind_dir / 'new' / 'new.xmind')}
+
+
+def test_touched_file_is_not_converted_again(xmind_dir, conversions):
+    observer = watch.PollingObserver('.', interval=0.02)
+    watcher = watch.Watcher('.', formats=('csv',), debounce=0.02, observer=observer)
+    thread = threading.Thread(target=watcher.run)
+    thread.start()
+    try:
+        wait_for(lambda: len(conversions) == 2)
+        os.utime('demo.xmind', (time.time() + 10, time.time() + 10))  # a save without any change
+        time.sleep(0.3)
+        assert len(conversions) == 2
+
+        with open('demo.xmind', 'ab') as f:
+            f.write(b'\0')
+        wait_for(lambda: len(conversions) == 3)
+    finally:
+        watcher.stop()
+        thread.join(5)
+    assert conversions[-1] == str(xmind_dir / 'demo.xmind')
+
+
+def test_watch_passes_absolute_root_to_observer(xmind_dir, monkeypatch):
+    roots = []
+
+    def get_observer(root_dir, polling=False):
+        roots.append(root_dir)
+        return ScriptedObserver([])
+
+    monkeypatch.setattr(watch, 'get_observer', get_observer)
+    monkeypatch.setattr(watch.Watcher, 'run', lambda self, initial=True: roots.append(self.root_dir))
+    watch.watch('sub', polling=True)
+    assert roots == [str(xmind_dir / 'sub')] * 2
+
+
+def test_iter_xmind_files(xmind_dir):
+    os.makedirs('.hidden')
+    shutil.copy('demo.xmind', '.hidden/hidden.xmind')
+    assert sorted(watch.iter_xmind_files('.')) == ['./demo.xmind', './sub/other.xmind']
+
+
+def test_edited_file_reuses_unchanged_suites(tmp_path, parsed_suites):
+    xmind_file = write_suites_xmind(tmp_path / 'suites.xmind')
+
+    def edit():
+        write_suites_xmind(xmind_file, edited_suite=1)
+        return [xmind_file]
+
+    run_watcher([[], edit], root_dir=str(tmp_path))
+    assert parsed_suites == ['suite0', 'suite1', 'suite2', 'suite1']
+    with open(str(tmp_path / 'suites.csv'), encoding='utf8') as f:
+        assert 'edited' in f.read()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import pytest
+from xmind2testcase import metadata
+from xmind2testcase import xlsx
+
+xlsxwriter = pytest.importorskip('xlsxwriter')
+openpyxl = pytest.importorskip('openpyxl')
+
+
+def make_testsuites():
+    login = metadata.TestCase(name='login', preconditions='an account', steps=[
+        metadata.TestStep(actions='input|password', expectedresults='masked', priority=1, remark='note'),
+        metadata.TestStep(step_number=2, actions='submit', expectedresults='logged in', priority=2)])
+    logout = metadata.TestCase(name='logout', importance=3, remark='manual', steps=[])
+    module = metadata.TestSuite(name='account', testcase_list=[login, logout])
+    empty_module = metadata.TestSuite(name='empty module')
+    search = metadata.TestCase(name='=search', steps=[metadata.TestStep(actions='type', expectedresults='found')])
+    return [metadata.TestSuite(name='product', sub_suites=[module, empty_module]),
+            metadata.TestSuite(name='other[1]', sub_suites=[metadata.TestSuite(name='search',
+                                                                               testcase_list=[search])])]
+
+
+def read_rows(worksheet):
+    return [list(row) for row in worksheet.iter_rows(min_row=2, values_only=True)]
+
+
+@pytest.fixture
+def workbook_options(monkeypatch):
+    """The options of the workbooks created by `xlsx.testsuites_to_xlsx_file`"""
+    options = []
+
+    class RecordedWorkbook(xlsxwriter.Workbook):
+        def __init__(self, filename=None, workbook_options=None):
+            options.append(workbook_options)
+            super(RecordedWorkbook, self).__init__(filename, workbook_options)
+
+    monkeypatch.setattr(xlsxwriter, 'Workbook', RecordedWorkbook)
+    return options
+
+
+def test_read_back_xlsx_file(tmp_path, workbook_options):
+    xlsx_file = xlsx.testsuites_to_xlsx_file(iter(make_testsuites()), str(tmp_path / 'testcases.xlsx'))
+    workbook = openpyxl.load_workbook(xlsx_file)
+    assert workbook.sheetnames == ['product', 'other_1_']
+
+    product = workbook['product']
+    assert [cell.value for cell in product[1]] == xlsx.FIRST_ROW
+    assert read_rows(product) == [
+        ['account', 'an account', 'login', 'password', 'masked', 1, 'note'],
+        [None, None, None, 'submit', 'logged in', 2, None],
+        [None, None, 'logout', None, None, 3, 'manual'],
+        ['empty module', None, None, None, None, None, None],
+    ]
+    # a row written out of order would be dropped silently in constant_memory mode
+    assert workbook_options[0]['constant_memory']
+    assert not product.merged_cells.ranges
+    assert [product.cell(row, 1).alignment.vertical for row in range(2, 6)] == ['top', 'top', 'top', 'top']
+    assert [product.cell(row, 3).alignment.vertical for row in range(2, 6)] == ['top', 'top', 'top', None]
+    assert product.cell(2, 4).alignment.vertical is None
+
+    other = workbook['other_1_']
+    assert read_rows(other) == [['search', None, '=search', 'type', 'found', 0, None]]
+    assert not other.merged_cells.ranges
+
+
+def test_empty_xlsx_file(tmp_path):
+    workbook = openpyxl.load_workbook(xlsx.testsuites_to_xlsx_file([], str(tmp_path / 'empty.xlsx')))
+    assert len(workbook.sheetnames) == 1
+
+
+def test_gen_sheet_name():
+    used_names = {'product'}
+    assert xlsx.gen_sheet_name('Product', used_names) == 'Product(2)'
+    assert xlsx.gen_sheet_name('a' * 40, used_names) == 'a' * xlsx.SHEET_NAME_LENGTH
+    assert xlsx.gen_sheet_name('', used_names) == 'Sheet'
@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import csv
+from xmind2testcase.zentao import xmind_to_zentao_csv_file
+from conftest import write_xmind, zen_topic
+
+
+def read_csv(csv_file, encoding):
+    with open(csv_file, encoding=encoding, newline='') as f:
+        return list(csv.reader(f))
+
+
+def test_gbk_round_trip(tmp_path):
+    # '€' and '😀' can't be encoded in gbk, 'é' and '—' can
+    xmind_file = write_xmind(tmp_path / 'testcases.xmind', zen_topic(
+        '产品', zen_topic('登录模块（€）', zen_topic('登录成功😀', zen_topic('输入密码—é', '登录成功')))))
+
+    utf8_rows = read_csv(xmind_to_zentao_csv_file(xmind_file), 'utf-8')
+    assert utf8_rows[1][:5] == ['登录模块(€)', '输入密码—é', '登录成功😀', '1. 登录成功\n', '']
+
+    gbk_rows = read_csv(xmind_to_zentao_csv_file(xmind_file, encoding='gbk'), 'gbk')
+    assert gbk_rows[1][:5] == ['登录模块(?)', '输入密码—é', '登录成功?', '1. 登录成功\n', '']
+    assert gbk_rows == [[value.replace('€', '?').replace('😀', '?') for value in row] for row in utf8_rows]
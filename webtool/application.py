@@ -8,9 +8,10 @@ import sqlite3
 from contextlib import closing
 from os.path import join, exists
 from werkzeug.utils import secure_filename
+from xmind2testcase.output import remove_output_file
 from xmind2testcase.zentao import xmind_to_zentao_csv_file
 from xmind2testcase.testlink import xmind_to_testlink_xml_file
-from xmind2testcase.utils import get_xmind_testsuites, get_xmind_testcase_list
+from xmind2testcase.utils import get_xmind_testsuites, testsuites_to_testcase_list
 from flask import Flask, request, send_from_directory, g, render_template, abort, redirect, url_for
 
 here = os.path.abspath(os.path.dirname(__file__))
@@ -27,7 +28,8 @@ stream_handler.setLevel(logging.INFO)
 root_logger = logging.getLogger()
 root_logger.addHandler(file_handler)
 root_logger.addHandler(stream_handler)
-root_logger.setLevel(logging.DEBUG)
+# 解析过程的DEBUG日志量很大，默认INFO，排查问题时设置环境变量 XMIND2TESTCASE_LOG_LEVEL=DEBUG 写入running.log
+root_logger.setLevel(os.environ.get('XMIND2TESTCASE_LOG_LEVEL', 'INFO').upper())
 # flask and werkzeug logger
 werkzeug_logger = logging.getLogger('werkzeug')
 werkzeug_logger.addHandler(file_handler)
@@ -94,8 +96,7 @@ def delete_record(filename, record_id):
     zentao_file = join(app.config['UPLOAD_FOLDER'], filename[:-5] + 'csv')
 
     for f in [xmind_file, testlink_file, zentao_file]:
-        if exists(f):
-            os.remove(f)
+        remove_output_file(f)
 
     c = g.db.cursor()
     sql = 'UPDATE records SET is_deleted=1 WHERE id = ?'
@@ -117,8 +118,7 @@ def delete_records(keep=20):
         zentao_file = join(app.config['UPLOAD_FOLDER'], name[:-5] + 'csv')
 
         for f in [xmind_file, testlink_file, zentao_file]:
-            if exists(f):
-                os.remove(f)
+            remove_output_file(f)
 
         sql = 'UPDATE records SET is_deleted=1 WHERE id = ?'
         c.execute(sql, (row[0],))
@@ -268,7 +268,7 @@ def preview_file(filename):
     for suite in testsuites:
         suite_count += len(suite.sub_suites)
 
-    testcases = get_xmind_testcase_list(full_path)
+    testcases = testsuites_to_testcase_list(testsuites)
 
     return render_template('preview.html', name=filename, suite=testcases, suite_count=suite_count)
 
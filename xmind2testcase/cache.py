@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from xmind2testcase.__about__ import __version__
+
+"""
+Cache the parsing result of XMind files, keyed by the file content hash and the parser config, and the parsing
+result of every testsuite, keyed by the hash of its topic subtree
+
+The in-process cache is always on, the on-disk cache is optional: set the environment variable
+XMIND2TESTCASE_CACHE_DIR (and XMIND2TESTCASE_CACHE_SIZE in MB) or call `enable_disk_cache`.
+"""
+
+
+def get_file_hash(file_path, chunk_size=1024 * 1024):
+    """Return the sha1 hex digest of a file's content"""
+    sha1 = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def get_config_key(config):
+    """Return a hashable key of the parser config, the separator is excluded since it's set by each sheet"""
+    return tuple(sorted((k, v) for k, v in config.items() if k != 'sep'))
+
+
+class ParseCache(object):
+
+    def __init__(self, max_size=32, max_bytes=256 * 1024 * 1024):
+        """
+        An in-process LRU cache of parsed XMind files. The values are stored in pickled form, so every
+        lookup returns a fresh copy and callers can't mutate the cached one.
+        :param max_size: the max number of cached XMind files
+        :param max_bytes: the memory budget of all the pickled values
+        """
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(file_hash, config):
+        return file_hash, get_config_key(config)
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                return None
+            self._data.move_to_end(key)
+        return pickle.loads(value)
+
+    def put(self, key, value):
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(value) > self.max_bytes:
+            logging.debug('The parsing result is too large(%s bytes) to cache', len(value))
+            return
+
+        with self._lock:
+            if key in self._data:
+                self._bytes -= len(self._data.pop(key))
+            self._data[key] = value
+            self._bytes += len(value)
+
+            while len(self._data) > self.max_size or self._bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskCache(object):
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        """
+        A persistent cache directory that can be shared by several processes. Every entry is written to
+        a temp file and renamed into place, so readers never see a partial file; when the directory grows
+        over `max_bytes`, the least recently used entries are removed.
+        :param cache_dir: the cache directory, will be created if it doesn't exist
+        :param max_bytes: the size limit of the cache directory
+        """
+        self.cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(file_hash, config):
+        """Return the entry id of a XMind file: content hash + tool version + parser config"""
+        key = '{}:{}:{!r}'.format(file_hash, __version__, get_config_key(config))
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _path(self, key, name):
+        return os.path.join(self.cache_dir, '{}.{}'.format(key, name))
+
+    def get_bytes(self, key, name):
+        path = self._path(key, name)
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+            os.utime(path)  # mark as recently used
+        except OSError:  # missing, or removed by another process's eviction
+            return None
+        return content
+
+    def put_bytes(self, key, name, content):
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(temp_path, self._path(key, name))
+        except OSError as e:
+            logging.warning('Failed to write the cache file(%s): %s', self._path(key, name), e)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self.evict()
+
+    def get(self, key, name='testsuites'):
+        content = self.get_bytes(key, name)
+        if content is None:
+            return None
+        try:
+            return pickle.loads(content)
+        except Exception as e:
+            logging.warning('Ignore the broken cache entry(%s): %s', self._path(key, name), e)
+            return None
+
+    def put(self, key, value, name='testsuites'):
+        self.put_bytes(key, name, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    def evict(self):
+        """Remove the least recently used files until the cache directory fits in `max_bytes`"""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.startswith('.tmp-'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+parse_cache = ParseCache()
+# the parsed testsuites keyed by the hash of their topic subtrees, so that the unchanged testsuites of an edited
+# XMind file are not parsed again, see `xmind2testcase.parser.get_topic_hash`
+suite_cache = ParseCache(max_size=4096, max_bytes=128 * 1024 * 1024)
+_disk_cache = None
+
+
+def enable_disk_cache(cache_dir, max_bytes=512 * 1024 * 1024):
+    """Turn on the persistent cache in `cache_dir`, pass None to turn it off"""
+    global _disk_cache
+    _disk_cache = DiskCache(cache_dir, max_bytes) if cache_dir else None
+    return _disk_cache
+
+
+def get_disk_cache():
+    return _disk_cache
+
+
+if os.environ.get('XMIND2TESTCASE_CACHE_DIR'):
+    enable_disk_cache(os.environ['XMIND2TESTCASE_CACHE_DIR'],
+                      int(os.environ.get('XMIND2TESTCASE_CACHE_SIZE', 512)) * 1024 * 1024)
@@ -1,11 +1,14 @@
 #!/usr/bin/env python
 # _*_ coding:utf-8 _*_
+import argparse
+import glob
 import logging
+import os
 import sys
-from xmind2testcase.zentao import xmind_to_zentao_csv_file
-from xmind2testcase.testlink import xmind_to_testlink_xml_file
-from xmind2testcase.utils import get_absolute_path, xmind_testcase_to_json_file
-from webtool.application import launch
+from xmind2testcase.exporters import BUILTIN_EXPORTERS, get_exporter
+
+# the parser, the exporters and the webtool(flask, sqlite3 and its log files) are imported only when they're
+# invoked, the client of the conversion daemon only imports the standard library, see benchmarks/bench_startup.py
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s  %(name)s  %(levelname)s  [%(module)s - %(funcName)s]: %(message)s',
@@ -16,7 +19,10 @@ using_doc = """
     xml file or a zentao recognized cvs file, then you can import it into testlink or zentao.
     
     Usage:
-     xmind2testcase [path_to_xmind_file] [-csv] [-xml] [-json]
+     xmind2testcase [path_to_xmind_file] [-csv] [-xml] [-json] [--sheet NAME] [--suite PATTERN] [--profile [FILE]]
+     xmind2testcase batch [dir_or_glob] [-j N] [--formats csv,xml,json] [--sheet NAME] [--suite PATTERN]
+     xmind2testcase serve --socket PATH
+     xmind2testcase watch [dir] [-j N] [--formats csv,xml,json] [--debounce SECONDS] [--polling]
      xmind2testcase [webtool] [port_num]
     
     Example:
@@ -24,6 +30,18 @@ using_doc = """
      xmind2testcase /path/to/testcase.xmind -csv   => output testcase.csv
      xmind2testcase /path/to/testcase.xmind -xml   => output testcase.xml
      xmind2testcase /path/to/testcase.xmind -json  => output testcase.json
+     xmind2testcase /path/to/testcase.xmind --sheet "Team A" --suite "登录*"
+                                                   => only convert the testsuites starting with 登录 in sheet Team A
+     xmind2testcase /path/to/testcase.xmind --profile convert.prof
+                                                   => report the time and memory of every stage, dump cProfile stats
+     xmind2testcase batch /path/to/dir -j 4        => convert all XMind files in the directory with 4 processes
+     xmind2testcase batch "cases/**/*.xmind" --formats csv,xml
+                                                   => convert the matched XMind files to csv and xml files
+     xmind2testcase serve --socket /tmp/x2t.sock   => run a conversion daemon that keeps the parser warm
+     xmind2testcase /path/to/testcase.xmind --socket /tmp/x2t.sock
+                                                   => convert by the daemon, or locally if it isn't running
+     xmind2testcase watch /path/to/dir --formats csv,xml
+                                                   => convert the XMind files in the directory again when they're saved
      xmind2testcase webtool                        => launch the web testcase conversion tool locally: 127.0.0.1:5001
      xmind2testcase webtool 8000                   => launch the web testcase conversion tool locally: 127.0.0.1:8000
     """
@@ -31,31 +49,15 @@ using_doc = """
 
 def cli_main():
     if len(sys.argv) > 1 and sys.argv[1].endswith('.xmind'):
-        xmind_file = sys.argv[1]
-        xmind_file = get_absolute_path(xmind_file)
-        logging.info('Start to convert XMind file: %s', xmind_file)
-
-        if len(sys.argv) == 3 and sys.argv[2] == '-json':
-            testlink_json_file = xmind_testcase_to_json_file(xmind_file)
-            logging.info('Convert XMind file to testcase json file successfully: %s', testlink_json_file)
-        elif len(sys.argv) == 3 and sys.argv[2] == '-xml':
-            testlink_xml_file = xmind_to_testlink_xml_file(xmind_file)
-            logging.info('Convert XMind file to testlink xml files successfully: %s', testlink_xml_file)
-        elif len(sys.argv) == 3 and sys.argv[2] == '-csv':
-            zentao_csv_file = xmind_to_zentao_csv_file(xmind_file)
-            logging.info('Convert XMind file to zentao csv file successfully: %s', zentao_csv_file)
-        else:
-            testlink_json_file = xmind_testcase_to_json_file(xmind_file)
-            testlink_xml_file = xmind_to_testlink_xml_file(xmind_file)
-            zentao_csv_file = xmind_to_zentao_csv_file(xmind_file)
-            logging.info('Convert XMind file successfully: \n'
-                         '1、 testcase json file(%s)\n'
-                         '2、 testlink xml file(%s)\n'
-                         '3、 zentao csv file(%s)',
-                         testlink_json_file,
-                         testlink_xml_file,
-                         zentao_csv_file)
+        convert_main(sys.argv[1:])
+    elif len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        sys.exit(batch_main(sys.argv[2:]))
+    elif len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        serve_main(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == 'watch':
+        watch_main(sys.argv[2:])
     elif len(sys.argv) > 1 and sys.argv[1] == 'webtool':
+        from webtool.application import launch
         if len(sys.argv) == 3:
             try:
                 port = int(sys.argv[2])
@@ -69,5 +71,220 @@ def cli_main():
         print(using_doc)
 
 
+# the formats of the -json/-xml/-csv options, in the order of the converted files
+FORMAT_NAMES = {'json': 'testcase json file', 'xml': 'testlink xml file', 'csv': 'zentao csv file'}
+
+
+def convert_main(args):
+    """Convert a XMind file to testcase files"""
+    parser = argparse.ArgumentParser(prog='xmind2testcase', description='Convert a XMind file to testcase files.')
+    parser.add_argument('xmind_file', help='the XMind file to convert')
+    parser.add_argument('-csv', action='store_true', help='output a zentao csv file')
+    parser.add_argument('-xml', action='store_true', help='output a testlink xml file')
+    parser.add_argument('-json', action='store_true', help='output a testcase json file')
+    add_filter_arguments(parser)
+    add_socket_argument(parser)
+    parser.add_argument('--profile', nargs='?', const=True, metavar='FILE',
+                        help='report the time of every stage, the peak memory and the number of topics、testcases、'
+                             'steps; dump the cProfile stats to FILE if it is given')
+    options = parser.parse_args(args)
+    # the same formats for the daemon and the local conversion, all of them if none is given
+    formats = tuple(fmt for fmt in FORMAT_NAMES if getattr(options, fmt)) or tuple(FORMAT_NAMES)
+
+    if options.socket and not options.profile:
+        results = convert_by_daemon(options.socket, [options.xmind_file], formats, options)
+        if results is not None:
+            xmind_file, output_files, error = results[0]
+            if error:
+                logging.error('Failed to convert XMind file(%s): %s', xmind_file, error)
+                sys.exit(1)
+            logging.info('Convert XMind file successfully: %s', ', '.join(output_files.values()))
+            return
+
+    from xmind2testcase.utils import get_absolute_path, xmind_testcase_to_json_file
+    from xmind2testcase.convert import xmind_to_testcase_files
+    config = get_filter_config(options)
+    xmind_file = get_absolute_path(options.xmind_file)
+    logging.info('Start to convert XMind file: %s', xmind_file)
+
+    try:
+        if formats == ('json',):
+            testlink_json_file = profile_call(xmind_testcase_to_json_file, options.profile, xmind_file, config=config)
+            logging.info('Convert XMind file to testcase json file successfully: %s', testlink_json_file)
+        elif formats == ('xml',):
+            from xmind2testcase.testlink import xmind_to_testlink_xml_file
+            testlink_xml_file = profile_call(xmind_to_testlink_xml_file, options.profile, xmind_file, config=config)
+            logging.info('Convert XMind file to testlink xml files successfully: %s', testlink_xml_file)
+        elif formats == ('csv',):
+            from xmind2testcase.zentao import xmind_to_zentao_csv_file
+            zentao_csv_file = profile_call(xmind_to_zentao_csv_file, options.profile, xmind_file, config=config)
+            logging.info('Convert XMind file to zentao csv file successfully: %s', zentao_csv_file)
+        else:
+            output_files = profile_call(xmind_to_testcase_files, options.profile, xmind_file, formats=formats,
+                                        config=config)
+            logging.info('Convert XMind file successfully: \n%s',
+                         '\n'.join('{}、 {}({})'.format(index, FORMAT_NAMES[fmt], output_files[fmt])
+                                   for index, fmt in enumerate(formats, 1)))
+    except (OSError, ValueError) as e:  # such as a missing, corrupt or truncated XMind file
+        logging.error('Failed to convert XMind file(%s): %s', xmind_file, e)
+        sys.exit(1)
+
+
+def profile_call(func, profile, *args, **kwargs):
+    """Call a conversion function, and log its `ConversionStats` if profiling is on"""
+    if not profile:
+        return func(*args, **kwargs)
+
+    result, stats = func(*args, profile=profile, **kwargs)
+    logging.info('%s', stats)
+    return result
+
+
+def add_filter_arguments(parser):
+    parser.add_argument('--sheet', action='append', metavar='NAME',
+                        help='only convert the sheet with this title (shell-style wildcards allowed), '
+                             'the other sheets are not loaded; can be repeated')
+    parser.add_argument('--suite', action='append', metavar='PATTERN',
+                        help='only convert the testsuites (the sub topics of the root topic) matching this '
+                             'shell-style pattern, such as "登录*"; can be repeated')
+
+
+def get_filter_config(options):
+    """The parser config with a `TestCaseFilter` of the --sheet/--suite options, or None if neither is given"""
+    if options.sheet is None and options.suite is None:
+        return None
+    from xmind2testcase.filters import TestCaseFilter
+    return {'filter': TestCaseFilter(sheets=options.sheet, suites=options.suite)}
+
+
+def add_formats_argument(parser):
+    parser.add_argument('--formats', default='csv,xml,json',
+                        help='comma separated output formats: {}, or the formats of the installed exporters'
+                             .format(','.join(BUILTIN_EXPORTERS)))
+
+
+def get_formats(parser, options, check=True):
+    formats = [fmt.strip() for fmt in options.formats.split(',') if fmt.strip()]
+    if check:
+        unknown_formats = [fmt for fmt in formats if not is_known_format(fmt)]
+        if unknown_formats:
+            parser.error('unsupported formats: {}'.format(','.join(unknown_formats)))
+    return formats
+
+
+def is_known_format(fmt):
+    """A built-in format is known without looking up the entry points of the installed packages"""
+    if fmt in BUILTIN_EXPORTERS:
+        return True
+    try:
+        get_exporter(fmt)
+    except ValueError:
+        return False
+    return True
+
+
+def add_socket_argument(parser):
+    parser.add_argument('--socket', metavar='PATH', default=os.environ.get('XMIND2TESTCASE_SOCKET'),
+                        help='convert by the daemon of `xmind2testcase serve` on this Unix socket, or locally if '
+                             'the daemon is not running; default to $XMIND2TESTCASE_SOCKET')
+
+
+def convert_by_daemon(socket_path, xmind_files, formats, options):
+    """Convert the XMind files by the daemon, return None if the daemon isn't running, or exit if the daemon
+    fails to handle the request"""
+    import socket
+    from xmind2testcase.server import convert_remotely
+    try:
+        return convert_remotely(socket_path, xmind_files, formats, sheets=options.sheet, suites=options.suite)
+    except socket.timeout as e:  # the daemon is running, it may still be writing the output files
+        logging.error('The conversion daemon on %s timed out: %s', socket_path, e)
+        sys.exit(1)
+    except OSError as e:
+        logging.warning('The conversion daemon on %s is not available(%s), convert locally', socket_path, e)
+        return None
+    except (RuntimeError, ValueError) as e:  # an error response or a malformed one
+        logging.error('Failed to convert by the daemon on %s: %s', socket_path, e)
+        sys.exit(1)
+
+
+def serve_main(args):
+    """Run the conversion daemon"""
+    parser = argparse.ArgumentParser(prog='xmind2testcase serve',
+                                     description='Run a conversion daemon on a Unix socket, it keeps the parser and '
+                                                 'the parsing cache warm between the conversions.')
+    parser.add_argument('--socket', metavar='PATH', required=True, help='the Unix socket to listen on')
+    options = parser.parse_args(args)
+
+    from xmind2testcase.server import serve
+    serve(options.socket)
+
+
+def batch_main(args):
+    """Convert all the XMind files in a directory or matching a glob pattern, return the exit code"""
+    parser = argparse.ArgumentParser(prog='xmind2testcase batch',
+                                     description='Convert a batch of XMind files in a process pool.')
+    parser.add_argument('path', help='a directory (searched recursively) or a glob pattern of XMind files')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='the number of worker processes, default to the number of CPUs')
+    add_formats_argument(parser)
+    add_filter_arguments(parser)
+    add_socket_argument(parser)
+    options = parser.parse_args(args)
+    # the daemon checks the formats itself, its exporters may differ from the local ones
+    formats = get_formats(parser, options, check=not options.socket)
+
+    if os.path.isdir(options.path):
+        pattern = os.path.join(options.path, '**', '*.xmind')
+    else:
+        pattern = options.path
+    xmind_files = sorted(f for f in glob.glob(os.path.expanduser(pattern), recursive=True) if f.endswith('.xmind'))
+    if not xmind_files:
+        logging.error('No XMind file found: %s', options.path)
+        return 1
+
+    logging.info('Start to convert %s XMind files...', len(xmind_files))
+    results = None
+    if options.socket:
+        results = convert_by_daemon(options.socket, xmind_files, formats, options)
+    if results is None:
+        from xmind2testcase.convert import xmind_files_to_testcase_files
+        results = xmind_files_to_testcase_files(xmind_files, formats, processes=options.jobs,
+                                                config=get_filter_config(options))
+    failed = 0
+    for xmind_file, output_files, error in results:
+        if error:
+            failed += 1
+            logging.error('[FAILED] %s: %s', xmind_file, error)
+        else:
+            logging.info('[OK] %s => %s', xmind_file, ', '.join(output_files.values()))
+
+    logging.info('Batch conversion finished: %s succeeded, %s failed', len(results) - failed, failed)
+    return 1 if failed else 0
+
+
+def watch_main(args):
+    """Watch a directory and convert the XMind files again when they're saved, until it's interrupted"""
+    parser = argparse.ArgumentParser(prog='xmind2testcase watch',
+                                     description='Watch a directory and convert the XMind files in it when they are '
+                                                 'changed, by inotify(pip install xmind2testcase[watch]) or polling.')
+    parser.add_argument('path', nargs='?', default='.', help='the directory to watch recursively, default to the '
+                                                             'current directory')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='the max number of conversions at the same time, default to min(4, the number of CPUs)')
+    parser.add_argument('--debounce', type=float, default=0.5,
+                        help='convert a file after it has not changed for this many seconds, default: 0.5')
+    parser.add_argument('--polling', action='store_true', help='poll the XMind files instead of using inotify')
+    add_formats_argument(parser)
+    add_filter_arguments(parser)
+    options = parser.parse_args(args)
+    formats = get_formats(parser, options)
+    if not os.path.isdir(options.path):
+        parser.error('not a directory: {}'.format(options.path))
+
+    from xmind2testcase.watch import watch
+    watch(options.path, formats, workers=options.jobs, debounce=options.debounce,
+          config=get_filter_config(options), polling=options.polling)
+
+
 if __name__ == '__main__':
     cli_main()
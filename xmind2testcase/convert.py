@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import contextvars
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from xmind2testcase.cache import get_file_hash
+from xmind2testcase.profiling import profiled
+from xmind2testcase.trace import traced
+from xmind2testcase.exporters import BUILTIN_EXPORTERS, get_exporter
+from xmind2testcase.utils import get_xmind_testsuites, get_absolute_path, testsuites_to_testcase_list, \
+    iter_testsuites_testcases, is_cached_output, save_output
+
+"""
+Convert XMind file to several testcase files at once: the XMind file is parsed only one time,
+then all the exporters share the same `TestSuite` list. A batch of XMind files is converted in a process pool.
+
+The output formats are the exporters in `xmind2testcase.exporters`, including the ones installed by other packages.
+"""
+
+FORMATS = tuple(BUILTIN_EXPORTERS)  # the built-in formats, see `xmind2testcase.exporters.get_exporter_names`
+DEFAULT_FORMATS = ('json', 'xml', 'csv')
+
+
+@profiled
+@traced
+def xmind_to_testcase_files(xmind_file, formats=DEFAULT_FORMATS, concurrent=True, config=None, use_suite_cache=False):
+    """Convert XMind file to testcase files of the given formats
+
+    :param xmind_file: the target XMind file
+    :param formats: output formats: json、xml(testlink)、csv(zentao)、xls(excel)、xlsx(excel, requires xlsxwriter),
+                    or the formats of the registered exporters
+    :param concurrent: write the output files in a thread pool
+    :param config: the parser config, such as {'filter': `xmind2testcase.filters.TestCaseFilter`}
+    :param use_suite_cache: parse only the changed testsuites of an edited XMind file, see `get_xmind_testsuites`
+    :param profile: True or a file to dump the cProfile stats, then return
+                    (output files, `xmind2testcase.profiling.ConversionStats`)
+    :return: a dict of {format: output file}
+    """
+    exporters = {fmt: get_exporter(fmt) for fmt in formats}  # raise ValueError for an unknown format
+
+    xmind_file = get_absolute_path(xmind_file)
+    logging.info('Start converting XMind file(%s) to %s files...', xmind_file, '、'.join(formats))
+    output_files = {}
+    file_hash = get_file_hash(xmind_file)
+
+    # the same cached path as the single format conversions, such as `xmind2testcase.zentao.xmind_to_zentao_csv_file`
+    for fmt, exporter in exporters.items():
+        output_file = exporter.get_output_file(xmind_file)
+        if exporter.cacheable and is_cached_output(output_file, fmt, file_hash, config):
+            logging.debug('The %s file is up to date: %s', fmt, output_file)
+            output_files[fmt] = output_file
+
+    pending_exporters = {fmt: exporter for fmt, exporter in exporters.items() if fmt not in output_files}
+    if pending_exporters:
+        output_files.update(_write_testcase_files(xmind_file, pending_exporters, concurrent, config, use_suite_cache))
+
+        for fmt, exporter in pending_exporters.items():
+            if exporter.cacheable:
+                save_output(output_files[fmt], fmt, file_hash, config)
+
+    logging.info('Convert XMind file(%s) to %s files successfully!', xmind_file, '、'.join(formats))
+    return {fmt: output_files[fmt] for fmt in formats}
+
+
+def _write_testcase_files(xmind_file, exporters, concurrent, config=None, use_suite_cache=False):
+    testsuites = get_xmind_testsuites(xmind_file, config=config, use_suite_cache=use_suite_cache)
+    testcase_exporters = [exporter for exporter in exporters.values() if exporter.input == 'testcases']
+    # the testcases are streamed to a single exporter, and shared by several exporters as a list
+    testcases = testsuites_to_testcase_list(testsuites) if len(testcase_exporters) > 1 else None
+
+    def write(exporter):
+        if exporter.input == 'testcases':
+            data = testcases if testcases is not None else iter_testsuites_testcases(testsuites)
+        else:
+            data = testsuites
+        return exporter.export(data, exporter.get_output_file(xmind_file), config)
+
+    if concurrent and len(exporters) > 1:
+        with ThreadPoolExecutor(max_workers=len(exporters)) as executor:
+            # the exporters run in the trace of this conversion
+            futures = {fmt: executor.submit(contextvars.copy_context().run, write, exporter)
+                       for fmt, exporter in exporters.items()}
+            return {fmt: future.result() for fmt, future in futures.items()}
+    else:
+        return {fmt: write(exporter) for fmt, exporter in exporters.items()}
+
+
+def xmind_files_to_testcase_files(xmind_files, formats=DEFAULT_FORMATS, processes=None, config=None):
+    """Convert a batch of XMind files in a process pool, a failed file doesn't stop the others
+
+    :param xmind_files: the target XMind files
+    :param formats: output formats, see `xmind_to_testcase_files`
+    :param processes: the number of worker processes, default to the number of CPUs; 1 means converting
+                      in the current process one by one
+    :param config: the parser config, such as {'filter': `xmind2testcase.filters.TestCaseFilter`}
+    :return: a list of (xmind_file, {format: output file}, error message), in the order of `xmind_files`
+    """
+    xmind_files = [get_absolute_path(xmind_file) for xmind_file in xmind_files]
+    processes = processes or os.cpu_count() or 1
+    processes = min(processes, len(xmind_files))
+
+    if processes <= 1:
+        return [_convert_one(xmind_file, formats, config) for xmind_file in xmind_files]
+
+    from concurrent.futures import ProcessPoolExecutor  # multiprocessing is only imported when it's used
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(_convert_one, xmind_file, formats, config) for xmind_file in xmind_files]
+        return [future.result() for future in futures]
+
+
+def _convert_one(xmind_file, formats, config=None):
+    try:
+        return xmind_file, xmind_to_testcase_files(xmind_file, formats, concurrent=False, config=config), None
+    except Exception as e:
+        logging.exception('Failed to convert XMind file(%s)', xmind_file)
+        return xmind_file, None, '{}: {}'.format(type(e).__name__, e)
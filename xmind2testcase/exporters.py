@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import importlib
+import logging
+import threading
+
+"""
+The registry of the testcase file exporters, the output formats of `xmind2testcase.convert.xmind_to_testcase_files`
+
+An exporter gets the parsed testcases and writes an output file, it never loads or parses the XMind file itself:
+
+    from xmind2testcase.exporters import Exporter
+
+    class MarkdownExporter(Exporter):
+        extension = '.md'
+        input = 'testcases'  # or 'testsuites'
+
+        def export(self, testcases, output_file, config=None):
+            with open(output_file, 'w', encoding='utf8') as f:
+                for testcase in testcases:
+                    f.write('- {}\\n'.format(testcase['name']))
+            return output_file
+
+An in-house exporter is registered by `register_exporter('md', 'mypackage.markdown:MarkdownExporter')`, or
+discovered from the entry points of the installed packages, in the setup.py of the plugin package:
+
+    entry_points={'xmind2testcase.exporters': ['md = mypackage.markdown:MarkdownExporter']}
+
+An exporter is only imported when its format is selected, and the entry points are only looked up for a format
+that isn't built in, so the exporters never slow down the conversions that don't use them.
+"""
+
+ENTRY_POINT_GROUP = 'xmind2testcase.exporters'
+# the built-in exporters, imported on the first use
+BUILTIN_EXPORTERS = {
+    'json': 'xmind2testcase.utils:JsonExporter',
+    'xml': 'xmind2testcase.testlink:TestLinkExporter',
+    'csv': 'xmind2testcase.zentao:ZentaoExporter',
+    'xls': 'xmind2testcase.utils:ExcelExporter',
+    'xlsx': 'xmind2testcase.xlsx:XlsxExporter',
+}
+
+_exporters = dict(BUILTIN_EXPORTERS)  # {format: `Exporter` or 'module:attr' or entry point not loaded yet}
+_exporters_lock = threading.RLock()
+_entry_points_loaded = False
+
+
+class Exporter(object):
+    """The base class of exporters, an exporter is shared by all the conversions, so it should be stateless"""
+    name = ''  # the format name, set by the registry
+    extension = ''  # the extension of the output file, such as '.csv'
+    input = 'testsuites'  # 'testsuites': a list of `TestSuite`; 'testcases': an iterable of testcase data dicts
+    # the output file only depends on the XMind file and the parser config, so that it's reused while it's fresh,
+    # see `xmind2testcase.output.is_fresh_output`
+    cacheable = True
+
+    def get_output_file(self, xmind_file):
+        """The output file next to the XMind file"""
+        return xmind_file[:-6] + self.extension
+
+    def export(self, data, output_file, config=None):
+        """Write the testsuites or testcases to the output file, and return the output file
+
+        :param data: a list of `xmind2testcase.metadata.TestSuite` or an iterable of testcase data, see `input`
+        :param output_file: the output file returned by `get_output_file`
+        :param config: the parser config that the data is parsed with, such as {'ignore_char': '#'}
+        """
+        raise NotImplementedError
+
+    def __repr__(self):
+        return '<{} {!r}>'.format(type(self).__name__, self.name)
+
+
+def register_exporter(name, exporter):
+    """Register an exporter of a format, it replaces the existing one of the same format
+
+    :param name: the format name, such as 'csv'
+    :param exporter: an `Exporter` subclass or instance, or its import path 'module:attr' to import it lazily
+    """
+    with _exporters_lock:
+        _exporters[name] = exporter
+
+
+def get_exporter(name):
+    """Return the `Exporter` of the format, import it if it's not imported yet
+
+    :raise ValueError: the format is unknown
+    """
+    with _exporters_lock:
+        if name not in _exporters:
+            _load_entry_points()
+        if name not in _exporters:
+            raise ValueError('Unsupported output format: {}, should be one of {}'.format(
+                name, tuple(get_exporter_names())))
+
+        exporter = _exporters[name]
+        if not isinstance(exporter, Exporter):
+            exporter = _load_exporter(name, exporter)
+            _exporters[name] = exporter
+        return exporter
+
+
+def get_exporter_names():
+    """The names of all the registered and installed formats, the exporters aren't imported"""
+    with _exporters_lock:
+        _load_entry_points()
+        return list(_exporters)
+
+
+def _load_exporter(name, exporter):
+    if isinstance(exporter, str):
+        module_name, _, attr = exporter.partition(':')
+        exporter = getattr(importlib.import_module(module_name), attr)
+    elif hasattr(exporter, 'load') and not isinstance(exporter, type):  # an entry point
+        exporter = exporter.load()
+
+    if isinstance(exporter, type):
+        exporter = exporter()
+    if not isinstance(exporter, Exporter):
+        raise TypeError('The exporter of format {} should be a subclass of Exporter: {!r}'.format(name, exporter))
+    if not exporter.name:
+        exporter.name = name
+    logging.debug('Load the exporter of format %s: %r', name, exporter)
+    return exporter
+
+
+def _load_entry_points():
+    """Add the exporters of the installed packages, a registered format isn't replaced"""
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+
+    for entry_point in _iter_entry_points():
+        _exporters.setdefault(entry_point.name, entry_point)
+
+
+def _iter_entry_points():
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:  # python < 3.8
+        try:
+            import pkg_resources
+        except ImportError:
+            return []
+        return list(pkg_resources.iter_entry_points(ENTRY_POINT_GROUP))
+
+    eps = entry_points()
+    if hasattr(eps, 'select'):  # python 3.10+
+        return list(eps.select(group=ENTRY_POINT_GROUP))
+    return list(eps.get(ENTRY_POINT_GROUP, []))
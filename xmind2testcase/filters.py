@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+from fnmatch import fnmatchcase
+from xmind2testcase.parser import get_priority_for_tapd, get_execution_type, get_test_result, get_sub_topics
+
+"""
+Filter the testcases while parsing XMind file, pass the filter in the parser config:
+
+    config = {'filter': TestCaseFilter(priorities=[0], suites=['登录*'])}
+    testsuites = get_xmind_testsuites(xmind_file, config=config)
+
+The filter is checked on the XMind topics, a testsuite or testcase topic that doesn't match is skipped with all of
+its sub topics, so that no `TestCase`/`TestStep` is ever created for it. A testsuite without any matched testcase
+is left out too. The sheets and testsuites are also skipped by `xmind2testcase.loader.load_xmind_content`
+before building their topics, see `xmind2testcase.utils.load_xmind_file`.
+"""
+
+
+class TestCaseFilter(object):
+    __slots__ = ('priorities', 'execution_types', 'results', 'sheets', 'suites')
+
+    def __init__(self, priorities=None, execution_types=None, results=None, sheets=None, suites=None):
+        """
+        A testcase should match all the given conditions, None means no limit.
+        :param priorities: the testcase priorities(P0、P1、P2 in the title): 0, 1, 2, a testcase without one is 1
+        :param execution_types: manual: 1, automation: 2
+        :param results: the test results of markers: non-execution: 0, pass: 1, failed: 2, blocked: 3, skipped: 4
+        :param sheets: the shell-style patterns of the sheet titles, such as 'Team A'
+        :param suites: the shell-style patterns of the testsuite names, such as '登录*'
+        """
+        self.priorities = self._freeze(priorities)
+        self.execution_types = self._freeze(execution_types)
+        self.results = self._freeze(results)
+        self.sheets = tuple(sheets) if sheets is not None else None
+        self.suites = tuple(suites) if suites is not None else None
+
+    @staticmethod
+    def _freeze(values):
+        return tuple(sorted(set(int(value) for value in values))) if values is not None else None
+
+    def _key(self):
+        return self.priorities, self.execution_types, self.results, self.sheets, self.suites
+
+    def __eq__(self, other):
+        return isinstance(other, TestCaseFilter) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        """A stable repr, which is a part of the cache key of the parsing result"""
+        return 'TestCaseFilter(priorities={!r}, execution_types={!r}, results={!r}, sheets={!r}, suites={!r})'.format(
+            *self._key())
+
+    def __getstate__(self):
+        return self._key()
+
+    def __setstate__(self, state):
+        self.priorities, self.execution_types, self.results, self.sheets, self.suites = state
+
+    def match_sheet(self, sheet):
+        """Whether to parse the sheet"""
+        if self.sheets is None:
+            return True
+        title = sheet['title']
+        return title is not None and any(fnmatchcase(title, pattern) for pattern in self.sheets)
+
+    def match_suite(self, suite_dict):
+        """Whether to parse the testsuite topic"""
+        if self.suites is None:
+            return True
+        title = suite_dict['title']
+        return any(fnmatchcase(title, pattern) for pattern in self.suites)
+
+    def match_case(self, case_dict, parent, config):
+        """Whether to parse the testcase topic, the cheap conditions are checked first
+
+        :param case_dict: the testcase topic
+        :param parent: the topics from the testsuite topic(excluded) to the testcase topic(excluded)
+        :param config: the parser config
+        """
+        if self.priorities is not None:
+            priority = get_priority_for_tapd(case_dict)
+            if (1 if priority == -1 else priority) not in self.priorities:
+                return False
+
+        if self.execution_types is not None:
+            if get_execution_type(list(parent) + [case_dict], config) not in self.execution_types:
+                return False
+
+        if self.results is not None:
+            if get_topic_result(case_dict, config) not in self.results:
+                return False
+
+        return True
+
+    @property
+    def filters_cases(self):
+        return self.priorities is not None or self.execution_types is not None or self.results is not None
+
+
+def get_topic_result(case_dict, config):
+    """The test result of a testcase topic, the same as `TestCase.result` set by `parse_a_testcase`,
+    but only the markers are looked up"""
+    result = get_test_result(case_dict['markers'])
+    if result != 0:
+        return result
+
+    step_dict_list = get_sub_topics(case_dict, config)
+    if not step_dict_list or 'R|' in step_dict_list[0]['title']:
+        return result
+
+    for step_dict in step_dict_list:
+        expected_topics = get_sub_topics(step_dict, config)
+        if not expected_topics:
+            step_result = get_test_result(step_dict['markers'])
+        elif len(expected_topics) == 1 and 'R|' not in expected_topics[0]['title']:
+            step_result = get_test_result(expected_topics[0]['markers'])
+        else:
+            step_result = 0
+
+        if step_result in (2, 3):
+            return step_result
+        result = step_result
+
+    return result
@@ -0,0 +1,378 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import json
+import re
+import zipfile
+import zlib
+from fnmatch import fnmatchcase
+from json.decoder import scanstring
+from json.scanner import NUMBER_RE
+from xml.etree.ElementTree import iterparse
+from xmind2testcase.trace import trace_stage
+
+"""
+Load XMind file to the sheet dict list that `xmind2testcase.parser.xmind_to_testsuites` expects,
+the same data as `xmind.load(xmind_file).getData()`, such as:
+
+[{'id': sheet id, 'title': sheet title, 'topic': {'id': topic id, 'link': hyperlink, 'title': title,
+  'note': plain note, 'label': first label, 'comment': comment, 'markers': [marker id], 'topics': [sub topic]}}]
+
+Only content.json(XMind Zen) or content.xml and comments.xml(XMind 8) are read from the zip, the embedded
+images and attachments are never touched. The content.xml is parsed incrementally, so that every parsed
+sheet and topic element is released as soon as it has been converted. Neither of them is parsed recursively,
+a map of any depth can be loaded.
+"""
+
+CONTENT_JSON = 'content.json'
+CONTENT_XML = 'content.xml'
+COMMENTS_XML = 'comments.xml'
+ATTR_HREF = '{http://www.w3.org/1999/xlink}href'
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+JSON_CONSTANTS = (('null', None), ('true', True), ('false', False), ('NaN', float('nan')),
+                  ('Infinity', float('inf')), ('-Infinity', float('-inf')))
+
+
+def load_xmind_content(xmind_file, sheets=None, suites=None, max_sheets=None):
+    """Load the XMind file and return its sheet dict list
+
+    :param xmind_file: the target XMind file
+    :param sheets: only load the sheets whose title matches one of these shell-style patterns
+    :param suites: only load the testsuite topics(the sub topics of the root topic) whose title matches one of
+                   these shell-style patterns, the others are skipped with all of their sub topics
+    :param max_sheets: stop loading after this many non-blank sheets
+    :raise ValueError: the file is not a valid XMind file, such as a corrupt or truncated one
+    """
+    with trace_stage('load', xmind_file=xmind_file) as event:
+        sheet_list = _load_xmind_content(xmind_file, sheets, suites, max_sheets)
+        event['sheets'] = len(sheet_list)
+    return sheet_list
+
+
+def _load_xmind_content(xmind_file, sheets, suites, max_sheets):
+    try:
+        with zipfile.ZipFile(xmind_file) as zip_file:
+            names = set(zip_file.namelist())
+
+            if CONTENT_JSON in names:  # XMind Zen also has a content.xml for the legacy version's warning
+                with zip_file.open(CONTENT_JSON) as f:
+                    sheet_list = _load_json(f.read())
+                sheet_list = (_zen_sheet_to_dict(sheet, suites) for sheet in sheet_list
+                              if sheets is None or _match(sheet.get('title'), sheets))
+                if suites is not None:  # a sheet without any selected testsuite is left out
+                    sheet_list = (sheet for sheet in sheet_list if not _is_blank_sheet(sheet))
+                return _limit_sheets(sheet_list, max_sheets)
+
+            if CONTENT_XML in names:
+                sheet_indexes = None
+                if sheets is not None:  # the sheet title is after its topics in content.xml, find them out first
+                    with zip_file.open(CONTENT_XML) as f:
+                        sheet_indexes = {index for index, title in enumerate(_scan_sheet_titles(f))
+                                         if _match(title, sheets)}
+                comments = {}
+                if COMMENTS_XML in names:
+                    with zip_file.open(COMMENTS_XML) as f:
+                        comments = _parse_comments(f)
+                with zip_file.open(CONTENT_XML) as f:
+                    return _parse_content_xml(f, comments, sheet_indexes, suites, max_sheets)
+
+    except (zipfile.BadZipFile, zlib.error, EOFError, ValueError, SyntaxError) as e:
+        # an empty list would be converted to empty testcase files that look fresh, let the callers report it
+        raise ValueError('Invalid XMind file({}): {}'.format(xmind_file, e)) from e
+
+    raise ValueError('Invalid XMind file({}): neither content.json nor content.xml found!'.format(xmind_file))
+
+
+def _load_json(content):
+    try:
+        return json.loads(content)
+    except RecursionError:  # a topic is 3 levels of json, a map hundreds of topics deep is too deep for `json`
+        return _loads_json_iteratively(content.decode(json.detect_encoding(content)))
+
+
+def _loads_json_iteratively(text):
+    """The same as `json.loads(text)` with a stack of the unfinished containers instead of recursion"""
+    stack = []  # [container, the key of the value being parsed in a dict]
+    idx = 0
+    while True:
+        idx = WHITESPACE.match(text, idx).end()
+        char = text[idx:idx + 1]
+        if char in ('{', '['):
+            container = {} if char == '{' else []
+            idx = WHITESPACE.match(text, idx + 1).end()
+            if text[idx:idx + 1] != ('}' if char == '{' else ']'):
+                key = None
+                if char == '{':
+                    key, idx = _scan_json_key(text, idx)
+                stack.append([container, key])
+                continue
+            value = container
+            idx += 1
+        elif char == '"':
+            value, idx = scanstring(text, idx + 1)
+        else:
+            value, idx = _scan_json_scalar(text, idx)
+
+        # the value is complete, so are the containers closed right after it
+        while True:
+            if not stack:
+                idx = WHITESPACE.match(text, idx).end()
+                if idx != len(text):
+                    raise json.JSONDecodeError('Extra data', text, idx)
+                return value
+            container, key = stack[-1]
+            if key is None:
+                container.append(value)
+            else:
+                container[key] = value
+            idx = WHITESPACE.match(text, idx).end()
+            char = text[idx:idx + 1]
+            if char == ',':
+                if key is not None:
+                    stack[-1][1], idx = _scan_json_key(text, WHITESPACE.match(text, idx + 1).end())
+                else:
+                    idx += 1
+                break
+            if char != (']' if key is None else '}'):
+                raise json.JSONDecodeError("Expecting ',' delimiter", text, idx)
+            stack.pop()
+            value = container
+            idx += 1
+
+
+def _scan_json_key(text, idx):
+    """Scan a dict key and its ':' from idx, return the key and the index of its value"""
+    if text[idx:idx + 1] != '"':
+        raise json.JSONDecodeError('Expecting property name enclosed in double quotes', text, idx)
+    key, idx = scanstring(text, idx + 1)
+    idx = WHITESPACE.match(text, idx).end()
+    if text[idx:idx + 1] != ':':
+        raise json.JSONDecodeError("Expecting ':' delimiter", text, idx)
+    return key, idx + 1
+
+
+def _scan_json_scalar(text, idx):
+    for name, value in JSON_CONSTANTS:
+        if text.startswith(name, idx):
+            return value, idx + len(name)
+    match = NUMBER_RE.match(text, idx)
+    if match is None:
+        raise json.JSONDecodeError('Expecting value', text, idx)
+    integer, frac, exp = match.groups()
+    value = float(integer + (frac or '') + (exp or '')) if frac or exp else int(integer)
+    return value, match.end()
+
+
+def _match(title, patterns):
+    return title is not None and any(fnmatchcase(title, pattern) for pattern in patterns)
+
+
+def _is_blank_sheet(sheet):
+    return not sheet['topic'] or not sheet['topic'].get('topics')
+
+
+def _limit_sheets(sheets, max_sheets):
+    if max_sheets is None:
+        return list(sheets)
+    result = []
+    for sheet in sheets:
+        if len(result) >= max_sheets:
+            break
+        if not _is_blank_sheet(sheet):
+            result.append(sheet)
+    return result
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _text_content(element):
+    """Join all the text nodes of an element like `xmind.core.Element.getTextContent`"""
+    texts = [element.text] + [child.tail for child in element]
+    texts = [text for text in texts if text]
+    return '\n'.join(texts) if texts else None
+
+
+def _first_child(element, tag_name):
+    for child in element:
+        if _local_name(child.tag) == tag_name:
+            return child
+
+
+def _parse_comments(stream):
+    comments = {}
+    for _, element in iterparse(stream):
+        if _local_name(element.tag) != 'comment':
+            continue
+        object_id = element.get('object-id')
+        content_element = _first_child(element, 'content')
+        content = (_text_content(content_element) if content_element is not None else None) or ''
+        if object_id in comments:
+            comments[object_id] = comments[object_id] + '\n' + content
+        else:
+            comments[object_id] = content
+        element.clear()
+    return comments
+
+
+def _scan_sheet_titles(stream):
+    """Return the title of every sheet in content.xml, without building any topic"""
+    titles = []
+    depth = 0
+    sheet_depth = None
+    for event, element in iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if sheet_depth is None and _local_name(element.tag) == 'sheet':
+                sheet_depth = depth
+                titles.append(None)
+            continue
+
+        if sheet_depth is not None:
+            if depth == sheet_depth:
+                sheet_depth = None
+                element.clear()
+            elif depth == sheet_depth + 1:
+                if _local_name(element.tag) == 'title':
+                    titles[-1] = _text_content(element)
+                element.clear()  # the sheet's topic tree and other children are released at once
+        depth -= 1
+    return titles
+
+
+def _parse_content_xml(stream, comments, sheet_indexes=None, suites=None, max_sheets=None):
+    sheets = []
+    sheet = None
+    sheet_index = -1
+    path = []  # the open elements from root to current
+    topics = []  # the open topic dicts, None for an ignored one
+
+    for event, element in iterparse(stream, events=('start', 'end')):
+        tag = _local_name(element.tag)
+
+        if event == 'start':
+            path.append(element)
+            parent_tag = _local_name(path[-2].tag) if len(path) > 1 else None
+
+            if tag == 'sheet' and parent_tag == 'xmap-content':
+                sheet_index += 1
+                sheet = {'id': element.get('id'), 'title': None, 'topic': None}
+                if sheet_indexes is not None and sheet_index not in sheet_indexes:
+                    sheet = None  # skip the sheet, none of its topics is loaded
+
+            elif tag == 'topic':
+                topic_id = element.get('id')
+                topic = {
+                    'id': topic_id,
+                    'link': element.get(ATTR_HREF, element.get('href')),
+                    'title': None,
+                    'note': None,
+                    'label': None,
+                    'comment': comments.get(topic_id),
+                    'markers': [],
+                }
+                if parent_tag == 'sheet':
+                    if sheet is not None:
+                        sheet['topic'] = topic
+                    else:
+                        topic = None
+                elif _is_attached_topic(path) and topics[-1] is not None:
+                    topics[-1].setdefault('topics', []).append(topic)
+                else:  # detached or summary topic, ignore it with all of its sub topics
+                    topic = None
+                topics.append(topic)
+            continue
+
+        parent_tag = _local_name(path[-2].tag) if len(path) > 1 else None
+        topic = topics[-1] if topics else None
+
+        if tag == 'topic':
+            topics.pop()
+            element.clear()
+        elif tag == 'sheet' and parent_tag == 'xmap-content':
+            if sheet is not None and sheet['topic'] is not None:
+                if suites is None or not _is_blank_sheet(sheet):  # a sheet without any selected testsuite is left out
+                    sheets.append(sheet)
+            sheet = None
+            element.clear()
+            if max_sheets is not None and len(_limit_sheets(sheets, max_sheets)) >= max_sheets:
+                break  # the rest of content.xml is never parsed
+        elif tag == 'title' and parent_tag == 'sheet':
+            if sheet is not None:
+                sheet['title'] = _text_content(element)
+        elif topic is not None and parent_tag == 'topic':
+            if tag == 'title':
+                topic['title'] = _text_content(element)
+                # the title comes before the sub topics, a testsuite topic can be skipped as soon as it's known
+                if suites is not None and len(topics) == 2 and topics[0] is not None and \
+                        not _match(topic['title'], suites):
+                    del topics[0]['topics'][-1]
+                    topics[-1] = None
+            elif tag == 'notes':
+                plain = _first_child(element, 'plain')
+                topic['note'] = _text_content(plain) if plain is not None else None
+                element.clear()
+            elif tag == 'labels':
+                label = _first_child(element, 'label')
+                topic['label'] = _text_content(label) if label is not None else None
+                element.clear()
+            elif tag == 'marker-refs':
+                topic['markers'] = [child.get('marker-id') for child in element
+                                    if _local_name(child.tag) == 'marker-ref']
+                element.clear()
+
+        path.pop()
+
+    return _limit_sheets(sheets, max_sheets)
+
+
+def _is_attached_topic(path):
+    """<topic><children><topics type="attached"><topic>"""
+    return len(path) > 3 and \
+        _local_name(path[-2].tag) == 'topics' and path[-2].get('type') == 'attached' and \
+        _local_name(path[-3].tag) == 'children' and \
+        _local_name(path[-4].tag) == 'topic'
+
+
+def _zen_sheet_to_dict(sheet, suites=None):
+    root_topic = sheet.get('rootTopic', {})
+    if suites is not None:
+        children = root_topic.get('children') or {}
+        attached = [topic for topic in children.get('attached') or [] if _match(topic.get('title'), suites)]
+        root_topic = dict(root_topic, children=dict(children, attached=attached))
+
+    return {
+        'id': sheet.get('id'),
+        'title': sheet.get('title'),
+        'topic': _zen_topic_to_dict(root_topic)
+    }
+
+
+def _zen_topic_to_dict(root_topic):
+    """Convert a XMind Zen topic and all its attached sub topics without recursion"""
+    root = None
+    stack = [(root_topic, None)]
+    while stack:
+        topic_json, parent = stack.pop()
+        notes = topic_json.get('notes') or {}
+        labels = topic_json.get('labels') or []
+        topic = {
+            'id': topic_json.get('id'),
+            'link': topic_json.get('href'),
+            'title': topic_json.get('title'),
+            'note': (notes.get('plain') or {}).get('content'),
+            'label': labels[0] if labels else None,
+            'comment': None,  # XMind Zen doesn't support comments
+            'markers': [marker.get('markerId') for marker in topic_json.get('markers') or []],
+        }
+        if parent is None:
+            root = topic
+        else:
+            parent['topics'].append(topic)
+
+        children = (topic_json.get('children') or {}).get('attached') or []
+        if children:
+            topic['topics'] = []
+            stack.extend((child, topic) for child in reversed(children))
+
+    return root
@@ -4,9 +4,12 @@
 """
 testlink.testlink
 """
+from collections.abc import Mapping, Sequence
+from types import MappingProxyType
 
 
 class TestSuite(object):
+    __slots__ = ('name', 'details', 'testcase_list', 'sub_suites', 'statistics')
 
     def __init__(self, name='', details='', testcase_list=None, sub_suites=None, statistics=None):
         """
@@ -44,8 +47,18 @@ class TestSuite(object):
 
         return data
 
+    def dict_view(self):
+        """A read-only view with the same keys as `to_dict()`, the data is read from this testsuite on access"""
+        return TestSuiteView(self)
+
+    def __str__(self):
+        """The same text as `str(self.to_dict())`, it's only built when a log record is really emitted"""
+        return str(self.to_dict())
+
 
 class TestCase(object):
+    __slots__ = ('name', 'version', 'summary', 'preconditions', 'execution_type', 'importance',
+                 'estimated_exec_duration', 'status', 'result', 'steps', 'remark')
 
     def __init__(self, name='', version=1, summary='', preconditions='', execution_type=1, importance=2,
                  estimated_exec_duration=3, status=7, result=0, steps=None, remark=''):
@@ -95,8 +108,17 @@ class TestCase(object):
 
         return data
 
+    def dict_view(self):
+        """A read-only view with the same keys as `to_dict()`, the data is read from this testcase on access"""
+        return TestCaseView(self)
+
+    def __str__(self):
+        """The same text as `str(self.to_dict())`, it's only built when a log record is really emitted"""
+        return str(self.to_dict())
+
 
 class TestStep(object):
+    __slots__ = ('step_number', 'actions', 'expectedresults', 'execution_type', 'priority', 'result', 'remark')
 
     def __init__(self, step_number=1, actions='', expectedresults='', execution_type=1, priority=0, result=0, remark=''):
         """
@@ -129,3 +151,92 @@ class TestStep(object):
 
         return data
 
+    def dict_view(self):
+        """A read-only view with the same keys as `to_dict()`, the data is read from this teststep on access"""
+        return TestStepView(self)
+
+    def __str__(self):
+        """The same text as `str(self.to_dict())`, it's only built when a log record is really emitted"""
+        return str(self.to_dict())
+
+
+class MetadataView(Mapping):
+    """
+    The base class of read-only mapping views of the metadata, which expose the same keys as `to_dict()`
+    without copying the data: the attribute values are read on access, and the sub testsuites、testcases、
+    teststeps are exposed as read-only sequences of views.
+    """
+    __slots__ = ('_obj',)
+    fields = ()
+    list_fields = ()
+
+    def __init__(self, obj):
+        self._obj = obj
+
+    def __getitem__(self, key):
+        if key not in self.fields:
+            raise KeyError(key)
+        value = getattr(self._obj, key)
+        if key in self.list_fields:
+            return ListView(value or [])
+        return value
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, dict(self))
+
+
+class TestSuiteView(MetadataView):
+    __slots__ = ()
+    fields = ('name', 'details', 'testcase_list', 'sub_suites')
+    list_fields = ('testcase_list', 'sub_suites')
+
+    def __getitem__(self, key):
+        if key == 'statistics' and self._obj.statistics:
+            return MappingProxyType(self._obj.statistics)
+        return super(TestSuiteView, self).__getitem__(key)
+
+    def __iter__(self):
+        for key in self.fields:
+            yield key
+        if self._obj.statistics:
+            yield 'statistics'
+
+    def __len__(self):
+        return len(self.fields) + (1 if self._obj.statistics else 0)
+
+
+class TestCaseView(MetadataView):
+    __slots__ = ()
+    fields = ('name', 'version', 'summary', 'preconditions', 'execution_type', 'importance',
+             'estimated_exec_duration', 'status', 'result', 'steps', 'remark')
+    list_fields = ('steps',)
+
+
+class TestStepView(MetadataView):
+    __slots__ = ()
+    fields = ('step_number', 'actions', 'expectedresults', 'execution_type', 'priority', 'result', 'remark')
+
+
+class ListView(Sequence):
+    """A read-only sequence view of a metadata list, every item is exposed as its `dict_view()`"""
+    __slots__ = ('_items',)
+
+    def __init__(self, items):
+        self._items = items
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [item.dict_view() for item in self._items[index]]
+        return self._items[index].dict_view()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return repr(list(self))
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from xmind2testcase.__about__ import __version__
+from xmind2testcase.cache import get_config_key
+from xmind2testcase.parser import make_config
+from xmind2testcase.trace import trace_stage
+
+"""
+Write the generated testcase files safely and tell whether an existing one is still fresh
+
+Every output file is written to a temp file in the same directory and renamed into place, so that a reader
+never sees a partial file. Next to the output file, a sidecar manifest(`<output file>.manifest`) records
+the XMind content hash, the tool version and the parser config it's generated from, such as:
+
+{"source_hash": "...", "version": "1.5.0", "config": "...", "options": {}, "size": 1024, "mtime_ns": ...}
+
+An output file is reused only if its manifest matches all of them and the file itself hasn't been changed.
+"""
+
+MANIFEST_SUFFIX = '.manifest'
+
+
+def get_manifest_file(output_file):
+    return output_file + MANIFEST_SUFFIX
+
+
+def _gen_manifest(source_hash, config, options):
+    return {
+        'source_hash': source_hash,
+        'version': __version__,
+        'config': repr(get_config_key(make_config(config))),
+        'options': options or {},
+    }
+
+
+def is_fresh_output(output_file, source_hash, config=None, options=None):
+    """Whether the output file is generated from the same XMind content, tool version, config and options
+
+    :param output_file: the generated file
+    :param source_hash: the content hash of the XMind file, see `xmind2testcase.cache.get_file_hash`
+    :param config: the parser config
+    :param options: other json serializable options that affect the output
+    """
+    try:
+        with open(get_manifest_file(output_file), encoding='utf8') as f:
+            manifest = json.load(f)
+        stat = os.stat(output_file)
+    except (OSError, ValueError):
+        return False
+
+    expected = _gen_manifest(source_hash, config, options)
+    if not isinstance(manifest, dict) or any(manifest.get(k) != v for k, v in expected.items()):
+        return False
+
+    # the output file is modified or replaced by someone else
+    return manifest.get('size') == stat.st_size and manifest.get('mtime_ns') == stat.st_mtime_ns
+
+
+def write_manifest(output_file, source_hash, config=None, options=None):
+    """Record where the output file comes from, call it after the output file is completely written"""
+    stat = os.stat(output_file)
+    manifest = _gen_manifest(source_hash, config, options)
+    manifest['size'] = stat.st_size
+    manifest['mtime_ns'] = stat.st_mtime_ns
+
+    with atomic_open(get_manifest_file(output_file), 'w', encoding='utf8') as f:
+        json.dump(manifest, f)
+
+
+def remove_output_file(output_file):
+    """Remove the output file and its manifest"""
+    for path in (output_file, get_manifest_file(output_file)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+@contextmanager
+def atomic_open(output_file, mode='w', **kwargs):
+    """Open a temp file to write, it replaces `output_file` when the block exits without error,
+    otherwise it's removed and the existing output file is left untouched"""
+    # unlike tempfile.mkstemp, open() keeps the default permissions of a new file
+    temp_file = '{}.{}.{}.tmp'.format(output_file, os.getpid(), threading.get_ident())
+    try:
+        with open(temp_file, mode, **kwargs) as f:
+            yield f
+        os.replace(temp_file, output_file)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+    logging.debug('Write the output file: %s', output_file)
+
+
+@contextmanager
+def export_stage(output_format, output_file=None):
+    """Trace the writing of an output file as the 'export' stage, with the file size once it's written,
+    set event['output_file'] in the block if the output file isn't known in advance"""
+    with trace_stage('export', format=output_format, output_file=output_file) as event:
+        yield event
+        output_file = event.get('output_file')
+        if output_file and os.path.exists(output_file):
+            event['size'] = os.path.getsize(output_file)
@@ -1,54 +1,150 @@
 #!/usr/bin/env python
 # _*_ coding:utf-8 _*_
 
+import hashlib
 import logging
+import marshal
+import os
+from itertools import groupby
+from xmind2testcase.cache import suite_cache, get_config_key
 from xmind2testcase.metadata import TestSuite, TestCase, TestStep
-
-config = {'sep': ' ',
-          'valid_sep': '&>+/-',
-          'precondition_sep': '\n----\n',
-          'summary_sep': '\n----\n',
-          'ignore_char': '#!！'
-          }
-
-
-def xmind_to_testsuites(xmind_content_dict):
-    """convert xmind file to `xmind2testcase.metadata.TestSuite` list"""
-    suites = []
-
-    for sheet in xmind_content_dict:
-        logging.debug('start to parse a sheet: %s', sheet['title'])
+from xmind2testcase.trace import trace_stage, record_stage, is_tracing, TimedIterator
+
+# the default parser config, every call of `xmind_to_testsuites` works on its own copy,
+# so that the conversions running in parallel threads don't interfere with each other
+DEFAULT_CONFIG = {'sep': ' ',
+                  'valid_sep': '&>+/-',
+                  'precondition_sep': '\n----\n',
+                  'summary_sep': '\n----\n',
+                  'ignore_char': '#!！'
+                  }
+# config['filter'] is optional: a `xmind2testcase.filters.TestCaseFilter` to skip the testsuites and testcases
+# parse the sheets in worker processes only when the XMind file has at least this many topics
+PARALLEL_THRESHOLD = 20000
+
+
+def make_config(config=None):
+    """Return a new parser config: the default config updated with the given one"""
+    new_config = dict(DEFAULT_CONFIG)
+    if config:
+        new_config.update(config)
+    return new_config
+
+
+def xmind_to_testsuites(xmind_content_dict, config=None, processes=1, parallel_threshold=PARALLEL_THRESHOLD,
+                        use_cache=False):
+    """convert xmind file to `xmind2testcase.metadata.TestSuite` list
+
+    :param xmind_content_dict: the sheet dict list of XMind file
+    :param config: the parser config to override `DEFAULT_CONFIG`, such as {'ignore_char': '#'}
+    :param processes: the number of worker processes to parse the sheets concurrently, None means the number
+                      of CPUs; 1 (default) means parsing the sheets one by one in the current process
+    :param parallel_threshold: the min number of topics to use the worker processes, a small XMind file is always
+                               parsed in the current process since it's faster than starting the workers
+    :param use_cache: reuse the testsuites whose topic subtree is unchanged since they were parsed, from
+                      `xmind2testcase.cache.suite_cache`, so that an edited XMind file only parses the edited
+                      testsuites; off by default, since hashing every testsuite and copying the cached ones costs
+                      nearly as much as parsing them unless a few testsuites out of many are edited, which is the
+                      case of `xmind2testcase.watch` and `xmind2testcase.server` that turn it on
+    """
+    config = make_config(config)
+    sheets = select_sheets(xmind_content_dict, config)
+    processes = processes or os.cpu_count() or 1
+    processes = min(processes, len(sheets))
+    if processes > 1 and count_topics([sheet['topic'] for sheet in sheets], parallel_threshold) >= parallel_threshold:
+        logging.debug('parse %s sheets in %s worker processes', len(sheets), processes)
+        from concurrent.futures import ProcessPoolExecutor  # multiprocessing is only imported when it's used
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            # the testsuites aren't cached, since the worker processes are gone with the parsing results
+            return list(executor.map(sheet_dict_to_suite, sheets, [config] * len(sheets)))
+
+    return [sheet_dict_to_suite(sheet, config, use_cache) for sheet in sheets]
+
+
+def iter_testsuites(xmind_content_dict, config=None, use_cache=False):
+    """Parse and yield the `TestSuite` of every sheet one by one"""
+    config = make_config(config)
+    for sheet in select_sheets(xmind_content_dict, config):
+        yield sheet_dict_to_suite(sheet, config, use_cache)
+
+
+def iter_testcases(xmind_content_dict, config=None):
+    """Parse and yield every testcase lazily as (product name, testsuite name, `TestCase`),
+    no `TestSuite` is built, so that the testcases can be consumed before the parsing finishes"""
+    config = make_config(config)
+    for sheet in select_sheets(xmind_content_dict, config):
         root_topic = sheet['topic']
-        sub_topics = root_topic.get('topics', [])
-
-        if sub_topics:
-            root_topic['topics'] = filter_empty_or_ignore_topic(sub_topics)
-        else:
+        product, sheet_config = parse_root_title(root_topic['title'], config)
+        for suite_dict in get_suite_topics(root_topic, sheet_config):
+            for case in iter_testsuite_cases(suite_dict, sheet_config):
+                yield product, suite_dict['title'], case
+
+
+def select_sheets(sheets, config=DEFAULT_CONFIG):
+    """The non-blank sheets that match the sheet filter and have at least 1 testsuite matching the testsuite filter"""
+    with trace_stage('filter', sheets=len(sheets)) as event:
+        case_filter = config.get('filter')
+        if case_filter:
+            sheets = [sheet for sheet in sheets if case_filter.match_sheet(sheet) and
+                      (case_filter.suites is None or get_suite_topics(sheet['topic'], config))]
+        sheets = filter_blank_sheet(sheets)
+        event['selected_sheets'] = len(sheets)
+        if is_tracing():
+            event['topics'] = count_topics([sheet['topic'] for sheet in sheets])
+    return sheets
+
+
+def filter_blank_sheet(sheets):
+    result = []
+    for sheet in sheets:
+        if not sheet['topic'].get('topics', []):
             logging.warning('This is a blank sheet(%s), should have at least 1 sub topic(test suite)', sheet['title'])
             continue
-        suite = sheet_to_suite(root_topic)
-        # suite.sheet_name = sheet['title']  # root testsuite has a sheet_name attribute
-        logging.debug('sheet(%s) parsing complete: %s', sheet['title'], suite.to_dict())
-        suites.append(suite)
+        result.append(sheet)
+    return result
+
 
-    return suites
+def sheet_dict_to_suite(sheet, config=DEFAULT_CONFIG, use_cache=False):
+    logging.debug('start to parse a sheet: %s', sheet['title'])
+    # the traverse of a sheet includes the merge of its testsuites, which is traced on its own too
+    with trace_stage('traverse', sheet=sheet['title']) as event:
+        suite = sheet_to_suite(sheet['topic'], config, use_cache)
+        event['suites'] = len(suite.sub_suites)
+        event['cases'] = sum(len(sub_suite.testcase_list) for sub_suite in suite.sub_suites)
+    # suite.sheet_name = sheet['title']  # root testsuite has a sheet_name attribute
+    # the testsuites and testcases have been logged one by one, rendering the whole sheet again is too much
+    logging.debug('sheet(%s) parsing complete: %s testsuites, %s testcases', sheet['title'], event['suites'],
+                  event['cases'])
+    return suite
 
 
-def filter_empty_or_ignore_topic(topics):
+def count_topics(topics, limit=None):
+    """Count the topics and all of their sub topics, stop counting once reaching the limit"""
+    count = 0
+    stack = list(topics)
+    while stack:
+        topic = stack.pop()
+        count += 1
+        if limit and count >= limit:
+            break
+        stack.extend(topic.get('topics', []))
+    return count
+
+
+def filter_empty_or_ignore_topic(topics, config=DEFAULT_CONFIG):
     """filter blank or start with config.ignore_char topic"""
-    result = [topic for topic in topics if not(
+    return [topic for topic in topics if not(
             topic['title'] is None or
             topic['title'].strip() == '' or
             topic['title'][0] in config['ignore_char'])]
 
-    for topic in result:
-        sub_topics = topic.get('topics', [])
-        topic['topics'] = filter_empty_or_ignore_topic(sub_topics)
 
-    return result
+def get_sub_topics(topic, config=DEFAULT_CONFIG):
+    """Get the sub topics of a topic, the blank or ignored ones are filtered out"""
+    return filter_empty_or_ignore_topic(topic.get('topics', []), config)
 
 
-def filter_empty_or_ignore_element(values):
+def filter_empty_or_ignore_element(values, config=DEFAULT_CONFIG):
     """Filter all empty or ignore XMind elements, especially notes、comments、labels element"""
     result = []
     for value in values:
@@ -57,30 +153,50 @@ def filter_empty_or_ignore_element(values):
     return result
 
 
-def sheet_to_suite(root_topic):
+def sheet_to_suite(root_topic, config=DEFAULT_CONFIG, use_cache=False):
     """convert a xmind sheet to a `TestSuite` instance"""
     suite = TestSuite()
-    root_title = root_topic['title']
+    suite.name, config = parse_root_title(root_topic['title'], config)
+    suite.details = root_topic['note']
+    suite.sub_suites = []
+    case_filter = config.get('filter')
+
+    for suite_dict in get_suite_topics(root_topic, config):
+        if use_cache:
+            testsuite = parse_testsuite_with_cache(suite_dict, config)
+        else:
+            testsuite = parse_testsuite(suite_dict, config)
+        if case_filter and case_filter.filters_cases and not testsuite.testcase_list:
+            continue
+        suite.sub_suites.append(testsuite)
+
+    return suite
+
+
+def get_suite_topics(root_topic, config=DEFAULT_CONFIG):
+    """Get the testsuite topics of a sheet, the ones that don't match the testsuite filter are skipped"""
+    suite_topics = get_sub_topics(root_topic, config)
+    case_filter = config.get('filter')
+    if case_filter:
+        suite_topics = [suite_dict for suite_dict in suite_topics if case_filter.match_suite(suite_dict)]
+    return suite_topics
+
+
+def parse_root_title(root_title, config=DEFAULT_CONFIG):
+    """Get the product name and the sheet's config from the root topic's title, which may end with a separator"""
     separator = root_title[-1]
 
     if separator in config['valid_sep']:
         logging.debug('find a valid separator for connecting testcase title: %s', separator)
-        config['sep'] = separator  # set the separator for the testcase's title
+        config = dict(config, sep=separator)  # set the separator for the testcase's title of this sheet
         root_title = root_title[:-1]
     else:
-        config['sep'] = ' '
-
-    suite.name = root_title
-    suite.details = root_topic['note']
-    suite.sub_suites = []
+        config = dict(config, sep=' ')
 
-    for suite_dict in root_topic['topics']:
-        suite.sub_suites.append(parse_testsuite(suite_dict))
-
-    return suite
+    return root_title, config
 
 
-def parse_testsuite(suite_dict):
+def parse_testsuite(suite_dict, config=DEFAULT_CONFIG):
     testsuite = TestSuite()
     testsuite.name = suite_dict['title']
     # xmind无法获取note字段
@@ -88,65 +204,87 @@ def parse_testsuite(suite_dict):
     testsuite.testcase_list = []
     logging.debug('start to parse a testsuite: %s', testsuite.name)
 
-    for cases_dict in suite_dict.get('topics', []):
-        case_name = ""
-        temp = TestCase()
-        new_case = TestCase()
-        first = 1
-        index = 0
-        cases_iter = list(recurse_parse_testcase(cases_dict))
-        merge_flag = 0
-        for case in cases_iter:
-            index += 1
-            next_case = transform_case(case)
-            case_name = next_case.name
-            if case_name == temp.name:
-                # 说明2者是同一条用例，则合并
-                new_case = merge_case(temp,next_case)
-                merge_flag = 1
-                if index == len(cases_iter):
-                    # 最后一条用例，直接加入用例列表中
-                    testsuite.testcase_list.append(new_case)
-
-                temp = new_case
-            else:
-                if first == 1:
-                    if index == len(cases_iter):
-                        # 只有1条用例
-                        testsuite.testcase_list.append(next_case)
-                        continue
-                    else:
-                        # 首个用例不加入列表中
-                        first = 0
-                        temp = next_case
-                        continue
-                # 如果用例没有合并过，直接添加temp用例
-                if merge_flag == 1:
-                    testsuite.testcase_list.append(new_case)
-                    merge_flag = 0
-                else:
-                    testsuite.testcase_list.append(temp)
-                if index == len(cases_iter):
-                    # 最后一条用例，直接加入用例列表中
-                    testsuite.testcase_list.append(next_case)
-                temp = next_case
-            # if index == len()
-
-    logging.debug('testsuite(%s) parsing complete: %s', testsuite.name, testsuite.to_dict())
+    testsuite.testcase_list.extend(iter_testsuite_cases(suite_dict, config))
+
+    logging.debug('testsuite(%s) parsing complete: %s testcases', testsuite.name, len(testsuite.testcase_list))
     return testsuite
 
 
-def merge_case(case1,case2):
-    """
-    合并2条相同的用例
+def parse_testsuite_with_cache(suite_dict, config=DEFAULT_CONFIG):
+    """The same as `parse_testsuite`, the testsuite is parsed only if its topic subtree has changed since the
+    last parsing with the same config, otherwise a copy of the last result is returned"""
+    topic_hash = get_topic_hash(suite_dict)
+    if topic_hash is None:
+        return parse_testsuite(suite_dict, config)
+
+    # a testsuite only depends on its own topics and the sheet's config, including the separator of the sheet
+    key = (topic_hash, config['sep'], get_config_key(config))
+    testsuite = suite_cache.get(key)
+    if testsuite is None:
+        testsuite = parse_testsuite(suite_dict, config)
+        suite_cache.put(key, testsuite)
+    else:
+        logging.debug('testsuite(%s) is not changed, reuse the last parsing result', testsuite.name)
+        if is_tracing():
+            record_stage('merge', 0.0, suite=testsuite.name, merged_cases=len(testsuite.testcase_list),
+                         steps=sum(len(case.steps) for case in testsuite.testcase_list), cached=True)
+    return testsuite
+
+
+def get_topic_hash(topic):
+    """The hash of a topic subtree: the ids and content of the topic and all of its sub topics in order, so an edit
+    of any topic changes the hashes of all its parent topics, but not the ones of its siblings.
+
+    The subtree is serialized by marshal in C, walking the topics in python costs as much as parsing them.
+    Return None if the subtree is too deep to be serialized.
     """
-    new_case = TestCase()
-    new_case.name = case1.name
-    new_case.importance = case1.importance
-    new_case.preconditions = case1.preconditions
-    new_case.steps = case1.steps + case2.steps
+    try:
+        content = marshal.dumps(topic, 2)  # version 2 has no object references, the same content gets the same bytes
+    except ValueError:
+        return None
+    return hashlib.sha1(content).hexdigest()
+
+
+def iter_testsuite_cases(suite_dict, config=DEFAULT_CONFIG):
+    """Yield the merged testcases of a testsuite topic one by one"""
+    if is_tracing():
+        for case in iter_traced_testsuite_cases(suite_dict, config):
+            yield case
+        return
 
-    return new_case
+    for cases_dict in get_sub_topics(suite_dict, config):
+        cases = (transform_case(case) for case in iter_parse_testcase(cases_dict, config=config))
+        for case in merge_same_name_cases(cases):
+            yield case
+
+
+def iter_traced_testsuite_cases(suite_dict, config=DEFAULT_CONFIG):
+    """The same as `iter_testsuite_cases`, and record the time of merging the testcases"""
+    merge_time = 0.0
+    case_count = merged_case_count = step_count = 0
+    for cases_dict in get_sub_topics(suite_dict, config):
+        cases = TimedIterator(transform_case(case) for case in iter_parse_testcase(cases_dict, config=config))
+        merged_cases = TimedIterator(merge_same_name_cases(cases))
+        for case in merged_cases:
+            step_count += len(case.steps)
+            yield case
+        merge_time += merged_cases.elapsed - cases.elapsed
+        case_count += cases.count
+        merged_case_count += merged_cases.count
+
+    record_stage('merge', merge_time, suite=suite_dict['title'], cases=case_count, merged_cases=merged_case_count,
+                 steps=step_count)
+
+
+def merge_same_name_cases(cases):
+    """
+    合并连续的同名用例：保留第一条用例，后续用例的步骤依次追加到它的步骤列表中
+    """
+    for _, same_name_cases in groupby(cases, key=lambda case: case.name):
+        case = next(same_name_cases)
+        for other_case in same_name_cases:
+            case.steps.extend(other_case.steps)
+        yield case
 
 
 def transform_case(case_old):
@@ -185,25 +323,32 @@ def transform_case(case_old):
     return case_new
 
 
-def recurse_parse_testcase(case_dict, parent=None):
-
-    if is_testcase_topic(case_dict):
-        case = parse_a_testcase(case_dict, parent)
-        yield case
-    else:
-        if not parent:
-            parent = []
+def iter_parse_testcase(case_dict, parent=None, config=DEFAULT_CONFIG):
+    """Walk the topic tree in depth-first order with an explicit stack, and yield a `TestCase` for every
+    testcase topic, the blank or ignored topics are skipped in the same pass"""
+    parent = list(parent) if parent else []
+    stack = [iter([case_dict])]  # stack[i + 1] iterates the sub topics of parent[i]
+    case_filter = config.get('filter')
 
-        parent.append(case_dict)
-
-        for child_dict in case_dict.get('topics', []):
-            for case in recurse_parse_testcase(child_dict, parent):
-                yield case
+    while stack:
+        topic = next(stack[-1], None)
+        if topic is None:
+            stack.pop()
+            if stack:
+                parent.pop()
+            continue
 
-        parent.pop()
+        sub_topics = get_sub_topics(topic, config)
+        if is_testcase_topic(topic, sub_topics, config):
+            # a testcase that doesn't match the filter is skipped before parsing its steps
+            if case_filter is None or case_filter.match_case(topic, parent, config):
+                yield parse_a_testcase(topic, parent, config)
+        else:
+            parent.append(topic)
+            stack.append(iter(sub_topics))
 
 
-def is_testcase_topic(case_dict):
+def is_testcase_topic(case_dict, children=None, config=DEFAULT_CONFIG):
     """A topic with a priority marker, or no subtopic, indicates that it is a testcase"""
     # priority = get_priority(case_dict)
     # if priority:
@@ -212,24 +357,26 @@ def is_testcase_topic(case_dict):
     if priority != -1:
         return True
 
-    children = case_dict.get('topics', [])
+    if children is None:
+        children = get_sub_topics(case_dict, config)
     if children:
         return False
 
     return True
 
 
-def parse_a_testcase(case_dict, parent):
+def parse_a_testcase(case_dict, parent, config=DEFAULT_CONFIG):
     testcase = TestCase()
     testcase.importance = get_priority_for_tapd(case_dict)
     if testcase.importance == -1:
         testcase.importance = 1
     if '|' in case_dict['title']:
-        case_dict['title'] = case_dict['title'].split('|')[-1]
+        # strip the priority prefix on a copy, the XMind content dict must stay unchanged to be parsed again
+        case_dict = dict(case_dict, title=case_dict['title'].split('|')[-1])
 
     topics = parent + [case_dict] if parent else [case_dict]
 
-    testcase.name = gen_testcase_title(topics)
+    testcase.name = gen_testcase_title(topics, config)
     if testcase.name:
 
         preconditions = testcase.name.split(" ")[:-1]
@@ -237,16 +384,16 @@ def parse_a_testcase(case_dict, parent):
 
         testcase.preconditions = preconditions if preconditions else []
 
-    summary = gen_testcase_summary(topics)
+    summary = gen_testcase_summary(topics, config)
     testcase.summary = summary if summary else testcase.name
-    testcase.execution_type = get_execution_type(topics)
-    step_dict_list = case_dict.get('topics', [])
+    testcase.execution_type = get_execution_type(topics, config)
+    step_dict_list = get_sub_topics(case_dict, config)
     if step_dict_list:
         fist_step = step_dict_list[0]
         if 'R|' in fist_step['title']:
             testcase.remark = fist_step['title'].split('|')[-1]
         else:
-            testcase.steps = parse_test_steps(step_dict_list)
+            testcase.steps = parse_test_steps(step_dict_list, config)
 
     # the result of the testcase take precedence over the result of the teststep
     testcase.result = get_test_result(case_dict['markers'])
@@ -262,14 +409,14 @@ def parse_a_testcase(case_dict, parent):
 
             testcase.result = step.result  # there is no need to judge where test step are ignored
 
-    logging.debug('finds a testcase: %s', testcase.to_dict())
+    logging.debug('finds a testcase: %s', testcase)
 
     return testcase
 
 
-def get_execution_type(topics):
+def get_execution_type(topics, config=DEFAULT_CONFIG):
     labels = [topic.get('label', '') for topic in topics]
-    labels = filter_empty_or_ignore_element(labels)
+    labels = filter_empty_or_ignore_element(labels, config)
     exe_type = 1
     for item in labels[::-1]:
         if item.lower() in ['自动', 'auto', 'automate', 'automation']:
@@ -316,10 +463,10 @@ def get_priority_for_tapd(case_dict):
     return 1
 
 
-def gen_testcase_title(topics):
+def gen_testcase_title(topics, config=DEFAULT_CONFIG):
     """Link all topic's title as testcase title"""
     titles = [topic['title'] for topic in topics]
-    titles = filter_empty_or_ignore_element(titles)
+    titles = filter_empty_or_ignore_element(titles, config)
 
     # when separator is not blank, will add space around separator, e.g. '/' will be changed to ' / '
     separator = config['sep']
@@ -329,34 +476,34 @@ def gen_testcase_title(topics):
     return separator.join(titles)
 
 
-def gen_testcase_preconditions(topics):
+def gen_testcase_preconditions(topics, config=DEFAULT_CONFIG):
     notes = [topic['note'] for topic in topics]
-    notes = filter_empty_or_ignore_element(notes)
+    notes = filter_empty_or_ignore_element(notes, config)
     return config['precondition_sep'].join(notes)
 
 
-def gen_testcase_summary(topics):
+def gen_testcase_summary(topics, config=DEFAULT_CONFIG):
     comments = [topic['comment'] for topic in topics]
-    comments = filter_empty_or_ignore_element(comments)
+    comments = filter_empty_or_ignore_element(comments, config)
     return config['summary_sep'].join(comments)
 
 
-def parse_test_steps(step_dict_list):
+def parse_test_steps(step_dict_list, config=DEFAULT_CONFIG):
     steps = []
 
     for step_num, step_dict in enumerate(step_dict_list, 1):
-        test_step = parse_a_test_step(step_dict)
+        test_step = parse_a_test_step(step_dict, config)
         test_step.step_number = step_num
         steps.append(test_step)
 
     return steps
 
 
-def parse_a_test_step(step_dict):
+def parse_a_test_step(step_dict, config=DEFAULT_CONFIG):
     test_step = TestStep()
     test_step.actions = step_dict['title']
 
-    expected_topics = step_dict.get('topics', [])
+    expected_topics = get_sub_topics(step_dict, config)
 
 
     if expected_topics:  # have expected result
@@ -370,7 +517,7 @@ def parse_a_test_step(step_dict):
                 test_step.expectedresults = expected_topic['title']  # one test step action, one test expected result
                 markers = expected_topic['markers']
                 test_step.result = get_test_result(markers)
-                remark = expected_topic.get('topics', [])
+                remark = get_sub_topics(expected_topic, config)
                 if remark:
                     re = remark[0]
                     test_step.remark = re['title'].split('|')[-1]
@@ -385,7 +532,7 @@ def parse_a_test_step(step_dict):
         markers = step_dict['markers']
         test_step.result = get_test_result(markers)
 
-    logging.debug('finds a teststep: %s', test_step.to_dict())
+    logging.debug('finds a teststep: %s', test_step)
     return test_step
 
 
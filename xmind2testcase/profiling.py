@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import cProfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+from xmind2testcase.trace import add_trace_hook, remove_trace_hook, start_trace
+
+"""
+Profile a conversion: the wall time of every stage, the peak memory, and the number of topics, testcases
+and steps, with an optional cProfile dump. The public conversion functions take a `profile` keyword argument,
+and return a `ConversionStats` next to their result when it's given:
+
+    json_file, stats = xmind_testcase_to_json_file(xmind_file, profile=True)
+    print(stats)  # the report
+    stats.to_dict()  # the counters
+
+    json_file, stats = xmind_testcase_to_json_file(xmind_file, profile='convert.prof')  # also dump cProfile stats
+
+The stages come from `xmind2testcase.trace`, a stage is left out if it isn't run, e.g. the XMind file is parsed
+only when the output file isn't up to date and the parsing result isn't cached. The topics, testcases and steps
+are counted while parsing, so they are all 0 when the output file or the parsing result is reused.
+"""
+
+
+class ConversionStats(object):
+
+    def __init__(self):
+        self.wall_time = 0.0
+        self.peak_memory = None  # bytes, None if it isn't measured
+        self.topics = 0
+        self.testcases = 0
+        self.steps = 0
+        self.stages = {}  # {stage: total wall time}, an export stage is named by its format, such as 'export:csv'
+        self.events = []  # the raw trace events
+        self.profile_file = None
+
+    def add_event(self, event):
+        self.events.append(event)
+        stage = event['stage']
+        if stage == 'export':
+            stage = 'export:{}'.format(event.get('format'))
+        self.stages[stage] = self.stages.get(stage, 0.0) + event['duration']
+
+        if event['stage'] == 'filter':
+            self.topics += event.get('topics', 0)
+        elif event['stage'] == 'merge':
+            self.testcases += event.get('merged_cases', 0)
+            self.steps += event.get('steps', 0)
+
+    def to_dict(self):
+        return {
+            'wall_time': self.wall_time,
+            'peak_memory': self.peak_memory,
+            'topics': self.topics,
+            'testcases': self.testcases,
+            'steps': self.steps,
+            'stages': dict(self.stages),
+            'profile_file': self.profile_file,
+        }
+
+    def format_report(self):
+        lines = ['Conversion profile:',
+                 '  wall time: {:.4f}s, peak memory: {}'.format(self.wall_time, _format_size(self.peak_memory)),
+                 '  topics: {}, testcases: {}, steps: {}'.format(self.topics, self.testcases, self.steps)]
+        for stage, duration in self.stages.items():
+            lines.append('  {:<16}{:.4f}s'.format(stage, duration))
+        if self.profile_file:
+            lines.append('  cProfile stats: {}'.format(self.profile_file))
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return self.format_report()
+
+
+def _format_size(size):
+    if size is None:
+        return 'n/a'
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return '{:.1f}{}'.format(size, unit)
+        size /= 1024.0
+    return '{:.1f}GB'.format(size)
+
+
+@contextmanager
+def profile_conversion(profile_file=None, trace_memory=True):
+    """Profile the conversion in the block, the yielded `ConversionStats` is filled in when the block exits
+
+    :param profile_file: dump the cProfile stats to this file, only the current thread is profiled by cProfile
+    :param trace_memory: measure the peak memory by tracemalloc, which slows down the conversion
+    """
+    stats = ConversionStats()
+    trace_ids = set()
+
+    def collect(event):  # the other conversions running at the same time are traced by the same hook
+        if event['trace_id'] in trace_ids:
+            stats.add_event(event)
+
+    start_tracemalloc = trace_memory and not tracemalloc.is_tracing()
+    if start_tracemalloc:
+        tracemalloc.start()
+    elif trace_memory and hasattr(tracemalloc, 'reset_peak'):  # python 3.9+
+        tracemalloc.reset_peak()
+    profiler = cProfile.Profile() if profile_file else None
+
+    add_trace_hook(collect)
+    begin = time.perf_counter()
+    try:
+        with start_trace(sampled=True) as trace_id:
+            trace_ids.add(trace_id)
+            if profiler:
+                profiler.enable()
+            try:
+                yield stats
+            finally:
+                if profiler:
+                    profiler.disable()
+    finally:
+        stats.wall_time = time.perf_counter() - begin
+        remove_trace_hook(collect)
+        if trace_memory:
+            stats.peak_memory = tracemalloc.get_traced_memory()[1]
+            if start_tracemalloc:
+                tracemalloc.stop()
+
+    if profiler:
+        profiler.dump_stats(profile_file)
+        stats.profile_file = profile_file
+
+
+def profiled(func):
+    """Add a `profile` keyword argument to a conversion function: True, or a file to dump the cProfile stats.
+    With it, the function returns (result, `ConversionStats`)"""
+    @wraps(func)
+    def wrapper(*args, profile=None, **kwargs):
+        if not profile:
+            return func(*args, **kwargs)
+
+        with profile_conversion(profile if isinstance(profile, str) else None) as stats:
+            result = func(*args, **kwargs)
+        return result, stats
+    return wrapper
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import threading
+
+"""
+A long-lived conversion daemon on a Unix socket, it keeps the modules imported and the parsing results cached,
+so that a conversion request doesn't pay for the interpreter startup and a cold parser:
+
+    xmind2testcase serve --socket /tmp/xmind2testcase.sock
+    xmind2testcase /path/to/testcase.xmind --socket /tmp/xmind2testcase.sock
+
+The request and the response are a line of json each:
+
+    {"command": "convert", "xmind_files": ["/abs/path/a.xmind"], "formats": ["csv", "xml"],
+     "sheets": null, "suites": ["登录*"]}
+    {"results": [{"xmind_file": "/abs/path/a.xmind", "output_files": {"csv": "...", "xml": "..."}, "error": null}]}
+
+    {"command": "ping"}  =>  {"pid": 123, "version": "1.5.0"}
+
+A relative path is resolved by the client, the daemon only accepts absolute paths. The socket file is only
+accessible to the user running the daemon. The client side only imports the standard library.
+"""
+
+DEFAULT_FORMATS = ('json', 'xml', 'csv')  # the same as `xmind2testcase.convert.DEFAULT_FORMATS`
+MAX_REQUEST_SIZE = 1024 * 1024
+SOCKET_TIMEOUT = 600
+
+
+class ConversionRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline(MAX_REQUEST_SIZE)
+        try:
+            request = json.loads(line.decode('utf-8'))
+            response = handle_request(request, self.server)
+        except Exception as e:
+            logging.exception('Failed to handle the request: %r', line[:200])
+            response = {'error': '{}: {}'.format(type(e).__name__, e)}
+
+        self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+
+
+class ConversionServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def handle_request(request, server=None):
+    """Handle a request dict and return the response dict"""
+    command = request.get('command', 'convert')
+    if command == 'ping':
+        from xmind2testcase.__about__ import __version__
+        return {'pid': os.getpid(), 'version': __version__}
+    if command == 'shutdown':
+        if server is not None:  # shutdown() waits for serve_forever() to return, call it in another thread
+            threading.Thread(target=server.shutdown).start()
+        return {'pid': os.getpid()}
+    if command != 'convert':
+        raise ValueError('Unknown command: {}'.format(command))
+
+    from xmind2testcase.convert import xmind_to_testcase_files
+    from xmind2testcase.filters import TestCaseFilter
+
+    xmind_files = request.get('xmind_files') or []
+    for xmind_file in xmind_files:
+        if not os.path.isabs(xmind_file):
+            raise ValueError('The XMind file path should be absolute: {}'.format(xmind_file))
+    formats = request.get('formats') or DEFAULT_FORMATS
+    sheets, suites = request.get('sheets'), request.get('suites')
+    config = None if sheets is None and suites is None else {'filter': TestCaseFilter(sheets=sheets, suites=suites)}
+
+    results = []
+    for xmind_file in xmind_files:
+        try:
+            # the daemon converts the same files again and again, only the edited testsuites are parsed again
+            output_files = xmind_to_testcase_files(xmind_file, formats, concurrent=False, config=config,
+                                                   use_suite_cache=True)
+            results.append({'xmind_file': xmind_file, 'output_files': output_files, 'error': None})
+        except Exception as e:
+            logging.exception('Failed to convert XMind file(%s)', xmind_file)
+            results.append({'xmind_file': xmind_file, 'output_files': None,
+                            'error': '{}: {}'.format(type(e).__name__, e)})
+    return {'results': results}
+
+
+def serve(socket_path):
+    """Run the conversion daemon on the Unix socket until it's stopped by SIGTERM、SIGINT or a shutdown request"""
+    if not hasattr(socket, 'AF_UNIX'):
+        raise OSError('The conversion daemon requires Unix domain sockets, which are not supported on this platform')
+
+    socket_path = os.path.abspath(os.path.expanduser(socket_path))
+    if os.path.exists(socket_path):
+        if is_server_running(socket_path):
+            raise OSError('A conversion daemon is already running on {}'.format(socket_path))
+        os.remove(socket_path)  # left by a daemon that didn't exit normally
+
+    # warm up: import the parser and the default exporters before the first request
+    import xmind2testcase.convert  # noqa: F401
+    from xmind2testcase.exporters import get_exporter
+    for fmt in DEFAULT_FORMATS:
+        get_exporter(fmt)
+
+    old_umask = os.umask(0o177)  # the socket file is only accessible to the current user
+    try:
+        server = ConversionServer(socket_path, ConversionRequestHandler)
+    finally:
+        os.umask(old_umask)
+
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown).start()
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, stop)
+
+    logging.info('The conversion daemon(pid: %s) is listening on %s', os.getpid(), socket_path)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        logging.info('The conversion daemon on %s has stopped', socket_path)
+
+
+def send_request(socket_path, request, timeout=SOCKET_TIMEOUT):
+    """Send a request to the daemon and return its response
+
+    :raise OSError: the daemon isn't running
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.settimeout(timeout)
+        client.connect(os.path.expanduser(socket_path))
+        client.sendall(json.dumps(request, ensure_ascii=False).encode('utf-8') + b'\n')
+        with client.makefile('rb') as f:
+            line = f.readline()
+    finally:
+        client.close()
+
+    if not line:
+        raise ConnectionError('The conversion daemon closed the connection without a response')
+    response = json.loads(line.decode('utf-8'))
+    if response.get('error'):
+        raise RuntimeError('The conversion daemon failed: {}'.format(response['error']))
+    return response
+
+
+def is_server_running(socket_path):
+    try:
+        send_request(socket_path, {'command': 'ping'}, timeout=5)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def convert_remotely(socket_path, xmind_files, formats=None, sheets=None, suites=None):
+    """Convert the XMind files by the daemon
+
+    :return: a list of (xmind_file, {format: output file}, error message), the same as
+             `xmind2testcase.convert.xmind_files_to_testcase_files`
+    :raise OSError: the daemon isn't running
+    """
+    request = {
+        'command': 'convert',
+        'xmind_files': [os.path.abspath(os.path.expanduser(xmind_file)) for xmind_file in xmind_files],
+        'formats': list(formats) if formats else None,
+        'sheets': sheets,
+        'suites': suites,
+    }
+    response = send_request(socket_path, request)
+    return [(result['xmind_file'], result['output_files'], result['error']) for result in response['results']]
@@ -1,133 +1,202 @@
 #!/usr/bin/env python
 # _*_ coding:utf-8 _*_
 import logging
-import os
-from io import BytesIO
-from xml.dom import minidom
+from io import StringIO
+from itertools import chain, islice
 from xml.sax.saxutils import escape
 from xmind2testcase import const
-from xmind2testcase.parser import config
-from xmind2testcase.utils import get_xmind_testsuites, get_absolute_path
-from xml.etree.ElementTree import Element, SubElement, ElementTree, Comment
+from xmind2testcase.cache import get_file_hash
+from xmind2testcase.exporters import Exporter
+from xmind2testcase.output import atomic_open, export_stage
+from xmind2testcase.parser import DEFAULT_CONFIG, make_config
+from xmind2testcase.profiling import profiled
+from xmind2testcase.trace import traced
+from xmind2testcase.utils import get_absolute_path, is_cached_output, iter_xmind_testsuites, save_output
 
 """
 Convert XMind fie to TestLink testcase xml file 
 """
 
 
-def xmind_to_testlink_xml_file(xmind_file, is_all_sheet=True):
-    """Convert a XMind sheet to a testlink xml file"""
+@profiled
+@traced
+def xmind_to_testlink_xml_file(xmind_file, is_all_sheet=True, config=None):
+    """Convert a XMind sheet to a testlink xml file, the testsuite of every sheet is written once it's parsed
+
+    :param xmind_file: the target XMind file
+    :param is_all_sheet: convert all the sheets, or only the first one, the other sheets are never loaded
+    :param config: the parser config, such as {'filter': `xmind2testcase.filters.TestCaseFilter`}
+    :param profile: True or a file to dump the cProfile stats, then return
+                    (xml file, `xmind2testcase.profiling.ConversionStats`)
+    """
     xmind_file = get_absolute_path(xmind_file)
     logging.info('Start converting XMind file(%s) to testlink file...', xmind_file)
-    testsuites = get_xmind_testsuites(xmind_file)
-    if not is_all_sheet and testsuites:
-        testsuites = [testsuites[0]]
-
-    xml_content = testsuites_to_xml_content(testsuites)
-    testlink_xml_file = xmind_file[:-6] + '.xml'
-
-    if os.path.exists(testlink_xml_file):
-        logging.info('the testlink xml file already exists, return it directly: %s', testlink_xml_file)
+    testlink_xml_file = TestLinkExporter().get_output_file(xmind_file)
+    file_hash = get_file_hash(xmind_file)
+    options = None if is_all_sheet else {'is_all_sheet': False}
+    if is_cached_output(testlink_xml_file, 'xml', file_hash, config, options):
+        logging.info('the testlink xml file is up to date, return it directly: %s', testlink_xml_file)
         return testlink_xml_file
 
-    with open(testlink_xml_file, 'w', encoding='utf-8') as f:
-        pretty_content = minidom.parseString(xml_content).toprettyxml(indent='\t')
-        f.write(pretty_content)
-        logging.info('convert XMind file(%s) to a testlink xml file(%s) successfully!', xmind_file, testlink_xml_file)
+    testsuites = iter_xmind_testsuites(xmind_file, config, file_hash, max_sheets=None if is_all_sheet else 1)
+    if not is_all_sheet:
+        testsuites = islice(testsuites, 1)
 
-    return testlink_xml_file
+    testsuites_to_testlink_xml_file(testsuites, testlink_xml_file, config)
+    save_output(testlink_xml_file, 'xml', file_hash, config, options)
+    logging.info('convert XMind file(%s) to a testlink xml file(%s) successfully!', xmind_file, testlink_xml_file)
 
+    return testlink_xml_file
 
-def testsuites_to_xml_content(testsuites):
-    """Convert the testsuites to testlink xml file format"""
-    root_element = Element(const.TAG_TESTSUITE)
-    # setting the root suite's name attribute, that will generate a new testsuite folder on testlink
-    # root_element.set(const.ATTR_NMAE, testsuite.name)
 
-    for testsuite in testsuites:
-        suite_element = SubElement(root_element, const.TAG_TESTSUITE)
-        suite_element.set(const.ATTR_NMAE, testsuite.name)
-        gen_text_element(suite_element, const.TAG_DETAILS, testsuite.details)
+class TestLinkExporter(Exporter):
+    extension = '.xml'
 
-        for sub_suite in testsuite.sub_suites:
-            if is_should_skip(sub_suite.name):
-                continue
-            sub_suite_element = SubElement(suite_element, const.TAG_TESTSUITE)
-            sub_suite_element.set(const.ATTR_NMAE, sub_suite.name)
-            gen_text_element(sub_suite_element, const.TAG_DETAILS, sub_suite.details)
-            gen_testcase_element(sub_suite_element, sub_suite)
+    def export(self, testsuites, output_file, config=None):
+        return testsuites_to_testlink_xml_file(testsuites, output_file, config)
 
-    testlink = ElementTree(root_element)
-    content_stream = BytesIO()
-    testlink.write(content_stream, encoding='utf-8', xml_declaration=True)
-    return content_stream.getvalue()
 
+def testsuites_to_testlink_xml_file(testsuites, testlink_xml_file, config=None):
+    """Write the testsuites to a testlink xml file, an existing file is replaced once the new one is complete
 
-def gen_testcase_element(suite_element, suite):
-    for testcase in suite.testcase_list:
+    :param testsuites: a list or an iterator of `xmind2testcase.metadata.TestSuite`
+    :param config: the parser config, its ignore_char also skips the testsuites、testcases and steps in xml
+    """
+    with export_stage('xml', testlink_xml_file), atomic_open(testlink_xml_file, 'w', encoding='utf-8') as f:
+        write_testlink_xml(testsuites, f, config)
 
-        if is_should_skip(testcase.name):
-            continue
+    return testlink_xml_file
 
-        testcase_elment = SubElement(suite_element, const.TAG_TESTCASE)
-        testcase_elment.set(const.ATTR_NMAE, testcase.name)
 
-        gen_text_element(testcase_elment, const.TAG_VERSION, str(testcase.version))
-        gen_text_element(testcase_elment, const.TAG_SUMMARY, testcase.summary)
-        gen_text_element(testcase_elment, const.TAG_PRECONDITIONS, testcase.preconditions)
-        gen_text_element(testcase_elment, const.TAG_EXECUTION_TYPE, _convert_execution_type(testcase.execution_type))
-        gen_text_element(testcase_elment, const.TAG_IMPORTANCE, _convert_importance(testcase.importance))
+def testsuites_to_xml_content(testsuites, config=None):
+    """Convert the testsuites to testlink xml file format"""
+    stream = StringIO()
+    write_testlink_xml(testsuites, stream, config)
+    return stream.getvalue().encode('utf-8')
 
-        estimated_exec_duration_element = SubElement(testcase_elment, const.TAG_ESTIMATED_EXEC_DURATION)
-        estimated_exec_duration_element.text = str(testcase.estimated_exec_duration)
 
-        status = SubElement(testcase_elment, const.TAG_STATUS)
-        status.text = str(testcase.status) if testcase.status in (1, 2, 3, 4, 5, 6, 7) else '7'
+def write_testlink_xml(testsuites, f, config=None):
+    """Write the testsuites to a text stream as an indented testlink xml document, in a single pass
 
-        gen_steps_element(testcase_elment, testcase)
+    The output is the same as `minidom.parseString(xml).toprettyxml(indent='\t')` that is used before,
+    but no element tree is built: a testsuite is written as soon as it's produced by `testsuites`.
+    """
+    config = make_config(config)
+    f.write('<?xml version="1.0" ?>\n')
+    testsuites = iter(testsuites)
+    first_suite = next(testsuites, None)
+    if first_suite is None:
+        f.write('<{}/>\n'.format(const.TAG_TESTSUITE))
+        return
 
+    # setting the root suite's name attribute, that will generate a new testsuite folder on testlink
+    f.write('<{}>\n'.format(const.TAG_TESTSUITE))
+    for testsuite in chain([first_suite], testsuites):
+        sub_suites = [sub_suite for sub_suite in testsuite.sub_suites if not is_should_skip(sub_suite.name, config)]
+        if write_open_tag(f, 1, const.TAG_TESTSUITE, testsuite.name,
+                          is_should_parse(testsuite.details, config) or sub_suites):
+            write_text_element(f, 2, const.TAG_DETAILS, testsuite.details, config)
+            for sub_suite in sub_suites:
+                write_sub_suite(f, 2, sub_suite, config)
+            write_close_tag(f, 1, const.TAG_TESTSUITE)
+    f.write('</{}>\n'.format(const.TAG_TESTSUITE))
+
+
+def write_sub_suite(f, depth, suite, config=DEFAULT_CONFIG):
+    testcases = [testcase for testcase in suite.testcase_list if not is_should_skip(testcase.name, config)]
+    if write_open_tag(f, depth, const.TAG_TESTSUITE, suite.name, is_should_parse(suite.details, config) or testcases):
+        write_text_element(f, depth + 1, const.TAG_DETAILS, suite.details, config)
+        for testcase in testcases:
+            write_testcase(f, depth + 1, testcase, config)
+        write_close_tag(f, depth, const.TAG_TESTSUITE)
+
+
+def write_testcase(f, depth, testcase, config=DEFAULT_CONFIG):
+    # a testcase always has the execution_type and importance children
+    write_open_tag(f, depth, const.TAG_TESTCASE, testcase.name, True)
+    depth += 1
+    write_text_element(f, depth, const.TAG_VERSION, str(testcase.version), config)
+    write_text_element(f, depth, const.TAG_SUMMARY, testcase.summary, config)
+    write_text_element(f, depth, const.TAG_PRECONDITIONS, testcase.preconditions, config)
+    write_text_element(f, depth, const.TAG_EXECUTION_TYPE, _convert_execution_type(testcase.execution_type), config)
+    write_text_element(f, depth, const.TAG_IMPORTANCE, _convert_importance(testcase.importance), config)
+    write_plain_element(f, depth, const.TAG_ESTIMATED_EXEC_DURATION, str(testcase.estimated_exec_duration))
+    write_plain_element(f, depth, const.TAG_STATUS,
+                        str(testcase.status) if testcase.status in (1, 2, 3, 4, 5, 6, 7) else '7')
 
-def gen_steps_element(testcase_element, testcase):
     if testcase.steps:
-        steps_element = SubElement(testcase_element, const.TAG_STEPS)
-
-        for step in testcase.steps:
-
-            if is_should_skip(step.actions):
-                continue
-
-            step_element = SubElement(steps_element, const.TAG_STEP)
-            gen_text_element(step_element, const.TAG_STEP_NUMBER, str(step.step_number))
-            gen_text_element(step_element, const.TAG_ACTIONS, step.actions)
-            gen_text_element(step_element, const.TAG_EXPECTEDRESULTS, step.expectedresults)
-            gen_text_element(step_element, const.TAG_EXECUTION_TYPE, _convert_execution_type(step.execution_type))
+        steps = [step for step in testcase.steps if not is_should_skip(step.actions, config)]
+        if write_open_tag(f, depth, const.TAG_STEPS, None, steps):
+            for step in steps:
+                write_open_tag(f, depth + 1, const.TAG_STEP, None, True)
+                write_text_element(f, depth + 2, const.TAG_STEP_NUMBER, str(step.step_number), config)
+                write_text_element(f, depth + 2, const.TAG_ACTIONS, step.actions, config)
+                write_text_element(f, depth + 2, const.TAG_EXPECTEDRESULTS, step.expectedresults, config)
+                write_text_element(f, depth + 2, const.TAG_EXECUTION_TYPE, _convert_execution_type(step.execution_type),
+                                   config)
+                write_close_tag(f, depth + 1, const.TAG_STEP)
+            write_close_tag(f, depth, const.TAG_STEPS)
+
+    write_close_tag(f, depth - 1, const.TAG_TESTCASE)
+
+
+def write_open_tag(f, depth, tag_name, name, has_children):
+    """Write `<tag name="...">`, or `<tag name="..."/>` for an element without children
+
+    :return: whether the element is still open and needs a close tag
+    """
+    f.write('\t' * depth + '<' + tag_name)
+    if name is not None:
+        f.write(' {}="{}"'.format(const.ATTR_NMAE, _escape_data(name)))
+    f.write('>\n' if has_children else '/>\n')
+    return bool(has_children)
+
+
+def write_close_tag(f, depth, tag_name):
+    f.write('\t' * depth + '</' + tag_name + '>\n')
+
+
+def write_plain_element(f, depth, tag_name, text):
+    """<tag>text</tag>"""
+    indent = '\t' * depth
+    if text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+        f.write('{}<{}>{}</{}>\n'.format(indent, tag_name, _escape_data(text), tag_name))
+    else:
+        f.write('{}<{}/>\n'.format(indent, tag_name))
 
 
-def gen_text_element(parent_element, tag_name, content):
+def write_text_element(f, depth, tag_name, content, config=DEFAULT_CONFIG):
     """generate an element's text conent: <![CDATA[text]]>"""
-    if is_should_parse(content):
-        child_element = SubElement(parent_element, tag_name)
-        element_set_text(child_element, content)
+    if is_should_parse(content, config):
+        indent = '\t' * depth
+        f.write('{0}<{1}>\n{0}\t<!-- -->\n{2}{0}\t \n{0}\t<!-- -->\n{0}</{1}>\n'.format(
+            indent, tag_name, gen_cdata(content)))
 
 
-def element_set_text(element, content):
+def gen_cdata(content):
     # retain html tags in content
     content = escape(content, entities={'\r\n': '<br />'})
     # replace new line for *nix system
     content = content.replace('\n', '<br />')
     # add the line break in source to make it readable
     content = content.replace('<br />', '<br />\n')
+    # a xml parser reads a single carriage return as a new line
+    content = content.replace('\r', '\n')
+
+    return '<![CDATA[' + content.replace(']]>', ']]]]><![CDATA[>') + ']]>'
+
 
-    # add CDATA for a element
-    element.append(Comment(' --><![CDATA[' + content.replace(']]>', ']]]]><![CDATA[>') + ']]> <!-- '))
+def _escape_data(data):
+    return data.replace('&', '&amp;').replace('<', '&lt;').replace('"', '&quot;').replace('>', '&gt;')
 
 
-def is_should_parse(content):
+def is_should_parse(content, config=DEFAULT_CONFIG):
     """An element that has a string content and doesn't start with exclamation mark should be parsing"""
     return isinstance(content, str) and content.strip() != '' and not content[0] in config['ignore_char']
 
 
-def is_should_skip(content):
+def is_should_skip(content, config=DEFAULT_CONFIG):
     """A testsuite/testcase/teststep should be skip: 1、content is empty; 2、starts with config.ignore_char"""
     return content is None or \
         not isinstance(content, str) or \
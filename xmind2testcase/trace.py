@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+"""
+Trace the stages of XMind file conversion: load, filter, traverse, merge and export
+
+A trace hook is a callable that gets a dict for every finished stage, such as:
+
+{'trace_id': 'a0c1...', 'stage': 'load', 'start': 1700000000.0, 'duration': 0.012, 'pid': 123,
+ 'xmind_file': '/path/to/testcase.xmind', 'sheets': 2}
+
+Nothing is measured unless a hook is added, and with a sample rate only that part of the conversions are traced,
+all the stages of a conversion are traced or not together. Tracing can be turned on in production by the
+environment variable XMIND2TESTCASE_TRACE=<sample rate>, which logs every stage as json to the logger
+'xmind2testcase.trace' at INFO level.
+
+The stages of a streaming conversion overlap: an exporter pulls the testcases from the parser, so the duration of
+the 'export' stage includes the parsing of the testcases it writes.
+"""
+
+STAGES = ('load', 'filter', 'traverse', 'merge', 'export')
+
+_hooks = []
+_hooks_lock = threading.Lock()
+_sample_rate = 1.0
+# (trace id, whether the trace is sampled) of the running conversion
+_current_trace = contextvars.ContextVar('xmind2testcase_trace', default=None)
+trace_logger = logging.getLogger('xmind2testcase.trace')
+
+
+def add_trace_hook(hook):
+    """Call `hook(event)` with the event dict of every traced stage"""
+    with _hooks_lock:
+        _hooks.append(hook)
+
+
+def remove_trace_hook(hook):
+    with _hooks_lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+
+def set_trace_sample_rate(sample_rate):
+    """Trace only this part(0.0 ~ 1.0) of the conversions"""
+    global _sample_rate
+    _sample_rate = float(sample_rate)
+
+
+def is_tracing():
+    """Whether the running conversion is traced"""
+    trace = _current_trace.get()
+    return bool(_hooks) and trace is not None and trace[1]
+
+
+@contextmanager
+def start_trace(sampled=None):
+    """Start a trace for a conversion and decide whether to sample it, a nested call joins the running trace
+
+    :param sampled: trace the conversion or not regardless of the sample rate
+    :return: yield the trace id, or None if no trace is started
+    """
+    trace = _current_trace.get()
+    if not _hooks or trace is not None:
+        yield trace[0] if trace else None
+        return
+
+    if sampled is None:
+        sampled = _sample_rate >= 1 or random.random() < _sample_rate
+    trace_id = os.urandom(16).hex()  # uuid is not imported, it pulls in platform
+    token = _current_trace.set((trace_id, sampled))
+    try:
+        yield trace_id
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def trace_stage(stage, **fields):
+    """Measure a stage of the conversion, the yielded dict can be updated with more fields such as counters
+
+        with trace_stage('load', xmind_file=xmind_file) as event:
+            sheets = load_xmind_content(xmind_file)
+            event['sheets'] = len(sheets)
+    """
+    event = dict(fields)
+    if not _hooks:
+        yield event
+        return
+
+    with start_trace():
+        trace_id, sampled = _current_trace.get()
+        if not sampled:
+            yield event
+            return
+
+        start = time.time()
+        begin = time.perf_counter()
+        try:
+            yield event
+        finally:
+            event.update(trace_id=trace_id, stage=stage, start=start, duration=time.perf_counter() - begin,
+                         pid=os.getpid())
+            emit(event)
+
+
+def record_stage(stage, duration, **fields):
+    """Emit a stage measured by the caller, such as the own time of a generator"""
+    trace = _current_trace.get()
+    if _hooks and trace is not None and trace[1]:
+        fields.update(trace_id=trace[0], stage=stage, start=time.time() - duration, duration=duration,
+                      pid=os.getpid())
+        emit(fields)
+
+
+def traced(func):
+    """Decorate a conversion function, all the stages in it belong to one trace"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with start_trace():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def emit(event):
+    """Pass a finished stage event to all the hooks, a failed hook never breaks the conversion"""
+    for hook in list(_hooks):
+        try:
+            hook(event)
+        except Exception:
+            logging.exception('The trace hook(%r) failed', hook)
+
+
+def log_trace_event(event):
+    """A trace hook which logs the event as a line of json"""
+    trace_logger.info('%s', json.dumps(event, ensure_ascii=False, default=str))
+
+
+class TimedIterator(object):
+
+    def __init__(self, iterable):
+        """Iterate the iterable and sum up the time spent in it, to tell it apart from the consumer's time"""
+        self._iterator = iter(iterable)
+        self.elapsed = 0.0
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        begin = time.perf_counter()
+        try:
+            item = next(self._iterator)
+        finally:
+            self.elapsed += time.perf_counter() - begin
+        self.count += 1
+        return item
+
+
+if os.environ.get('XMIND2TESTCASE_TRACE'):
+    set_trace_sample_rate(os.environ['XMIND2TESTCASE_TRACE'])
+    add_trace_hook(log_trace_event)
@@ -1,13 +1,19 @@
 #!/usr/bin/env python
 # _*_ coding:utf-8 _*_
+import hashlib
 import json
 import os
-import xmind
 import logging
-from xmind2testcase.parser import xmind_to_testsuites
-import xlwt
-import xlrd
-from tkinter import *
+from functools import lru_cache
+from xmind2testcase.loader import load_xmind_content
+from xmind2testcase.parser import xmind_to_testsuites, iter_testsuites, iter_testcases, make_config
+from xmind2testcase.cache import parse_cache, get_disk_cache, get_file_hash
+from xmind2testcase.exporters import Exporter
+from xmind2testcase.filters import TestCaseFilter
+from xmind2testcase.output import atomic_open, export_stage, is_fresh_output, write_manifest
+from xmind2testcase.profiling import profiled
+from xmind2testcase.trace import traced
+
 
 def get_absolute_path(path):
     """
@@ -24,33 +30,173 @@ def get_absolute_path(path):
     return os.path.join(fp, fn)
 
 
-def get_xmind_testsuites(xmind_file):
-    """Load the XMind file and parse to `xmind2testcase.metadata.TestSuite` list"""
+@profiled
+@traced
+def get_xmind_testsuites(xmind_file, use_cache=True, config=None, processes=1, use_suite_cache=False):
+    """Load the XMind file and parse to `xmind2testcase.metadata.TestSuite` list
+
+    :param xmind_file: the target XMind file
+    :param use_cache: look up the parsing result in `xmind2testcase.cache.parse_cache` first,
+                      a cached result is returned as a fresh copy that is safe to modify
+    :param config: the parser config to override `xmind2testcase.parser.DEFAULT_CONFIG`
+    :param processes: the number of worker processes to parse the sheets, see `xmind_to_testsuites`
+    :param use_suite_cache: when the XMind file isn't cached, such as after it's edited, reuse the parsing results
+                            of its unchanged testsuites in `xmind2testcase.cache.suite_cache`
+    :param profile: True or a file to dump the cProfile stats, then return
+                    (testsuites, `xmind2testcase.profiling.ConversionStats`)
+    """
     xmind_file = get_absolute_path(xmind_file)
-    workbook = xmind.load(xmind_file)
-    xmind_content_dict = workbook.getData()
-    logging.debug("loading XMind file(%s) dict data: %s", xmind_file, xmind_content_dict)
+    config = make_config(config)
+    if use_cache:
+        file_hash = get_file_hash(xmind_file)
+        testsuites = get_cached_xmind_testsuites(xmind_file, config, file_hash)
+        if testsuites is not None:
+            return testsuites
+
+    xmind_content_dict = load_xmind_file(xmind_file, config)
+    logging.debug("loading XMind file(%s) with %s sheets", xmind_file, len(xmind_content_dict))
 
     if xmind_content_dict:
-        testsuites = xmind_to_testsuites(xmind_content_dict)
+        testsuites = xmind_to_testsuites(xmind_content_dict, config, processes=processes, use_cache=use_suite_cache)
+        if use_cache:
+            put_cached_xmind_testsuites(file_hash, config, testsuites)
         return testsuites
     else:
         logging.error('Invalid XMind file(%s): it is empty!', xmind_file)
         return []
 
 
+def load_xmind_file(xmind_file, config=None, max_sheets=None):
+    """Load the sheet dict list of XMind file, the sheets and testsuites that don't match the filter of parser config
+    are skipped by the loader, see `xmind2testcase.filters.TestCaseFilter`"""
+    case_filter = config.get('filter') if config else None
+    if case_filter is None:
+        return load_xmind_content(xmind_file, max_sheets=max_sheets)
+    return load_xmind_content(xmind_file, case_filter.sheets, case_filter.suites, max_sheets)
+
+
+def get_cached_xmind_testsuites(xmind_file, config=None, file_hash=None):
+    """Look up the parsing result of the XMind file in the in-process cache, then in the disk cache
+
+    :return: a fresh copy of the cached `TestSuite` list, or None if it's not cached
+    """
+    config = make_config(config)
+    file_hash = file_hash or get_file_hash(xmind_file)
+    testsuites = parse_cache.get(parse_cache.make_key(file_hash, config))
+    if testsuites is not None:
+        logging.debug('Found the parsing result of XMind file(%s) in cache', xmind_file)
+        return testsuites
+
+    disk_cache = get_disk_cache()
+    if disk_cache:
+        testsuites = disk_cache.get(disk_cache.make_key(file_hash, config))
+        if testsuites is not None:
+            logging.debug('Found the parsing result of XMind file(%s) in cache directory: %s', xmind_file,
+                          disk_cache.cache_dir)
+            parse_cache.put(parse_cache.make_key(file_hash, config), testsuites)
+            return testsuites
+
+    return None
+
+
+def put_cached_xmind_testsuites(file_hash, config, testsuites):
+    """Save the parsing result to the in-process cache and the disk cache(if enabled)"""
+    config = make_config(config)
+    parse_cache.put(parse_cache.make_key(file_hash, config), testsuites)
+    disk_cache = get_disk_cache()
+    if disk_cache:
+        disk_cache.put(disk_cache.make_key(file_hash, config), testsuites)
+
+
+def iter_xmind_testsuites(xmind_file, config=None, file_hash=None, max_sheets=None):
+    """The testsuites of the XMind file to export: the cached ones if there are; otherwise, with the disk cache
+    enabled they are parsed and saved to the caches, without it they are yielded one by one while parsing, so
+    the memory usage doesn't grow with the size of XMind file
+
+    :param max_sheets: parse the first `max_sheets` sheets only, unless the whole file is parsed to be cached
+    """
+    testsuites = get_cached_xmind_testsuites(xmind_file, config, file_hash)
+    if testsuites is not None:
+        return testsuites
+    if get_disk_cache():
+        return parse_and_cache_xmind_testsuites(xmind_file, config, file_hash)
+    return iter_testsuites(load_xmind_file(xmind_file, config, max_sheets), config)
+
+
+def parse_and_cache_xmind_testsuites(xmind_file, config=None, file_hash=None):
+    testsuites = xmind_to_testsuites(load_xmind_file(xmind_file, config), config)
+    put_cached_xmind_testsuites(file_hash or get_file_hash(xmind_file), config, testsuites)
+    return testsuites
+
+
+def get_output_cache_name(output_format, options=None):
+    """The entry name of a generated file in the disk cache, the options that change the output are a part of it"""
+    if not options:
+        return output_format
+    options_hash = hashlib.sha1(json.dumps(options, sort_keys=True).encode('utf-8')).hexdigest()
+    return '{}-{}'.format(output_format, options_hash[:16])
+
+
+def restore_cached_output(output_file, output_format, file_hash, config=None, options=None):
+    """Restore the output file generated from the same XMind content, config and options from the disk cache,
+    return False if the disk cache is disabled or there isn't one"""
+    disk_cache = get_disk_cache()
+    if not disk_cache:
+        return False
+    content = disk_cache.get_bytes(disk_cache.make_key(file_hash, make_config(config)),
+                                   get_output_cache_name(output_format, options))
+    if content is None:
+        return False
+
+    with atomic_open(output_file, 'wb') as f:
+        f.write(content)
+    write_manifest(output_file, file_hash, config, options)
+    logging.debug('Restore the output file(%s) from cache directory: %s', output_file, disk_cache.cache_dir)
+    return True
+
+
+def save_output(output_file, output_format, file_hash, config=None, options=None):
+    """Record the manifest of a newly generated output file, and save the file to the disk cache(if enabled)"""
+    write_manifest(output_file, file_hash, config, options)
+    disk_cache = get_disk_cache()
+    if disk_cache:
+        with open(output_file, 'rb') as f:
+            disk_cache.put_bytes(disk_cache.make_key(file_hash, make_config(config)),
+                                 get_output_cache_name(output_format, options), f.read())
+
+
+def is_cached_output(output_file, output_format, file_hash, config=None, options=None):
+    """Whether the output file is up to date, or restored from the disk cache"""
+    return (is_fresh_output(output_file, file_hash, config, options) or
+            restore_cached_output(output_file, output_format, file_hash, config, options))
+
+
+@profiled
 def get_xmind_testsuite_list(xmind_file):
     """Load the XMind file and get all testsuite in it
 
     :param xmind_file: the target XMind file
+    :param profile: True or a file to dump the cProfile stats, then return
+                    ((testsuite data list, max length), `xmind2testcase.profiling.ConversionStats`)
     :return: a list of testsuite data
     """
     xmind_file = get_absolute_path(xmind_file)
     logging.info('Start converting XMind file(%s) to testsuite data list...', xmind_file)
     testsuite_list = get_xmind_testsuites(xmind_file)
+    suite_data_list, max_length = testsuites_to_suite_list(testsuite_list)
+    logging.info('Convert XMind file(%s) to testsuite data list successfully!', xmind_file)
+    return suite_data_list, max_length
+
+
+def testsuites_to_suite_list(testsuites):
+    """Count the testcase results of every testsuite and convert them to a list of testsuite data
+
+    :param testsuites: a list of `xmind2testcase.metadata.TestSuite`
+    :return: a list of testsuite data and the max length of testcase preconditions
+    """
     suite_data_list = []
     max_length = 0
-    for testsuite in testsuite_list:
+    for testsuite in testsuites:
         product_statistics = {'case_num': 0, 'non_execution': 0, 'pass': 0, 'failed': 0, 'blocked': 0, 'skipped': 0}
         for sub_suite in testsuite.sub_suites:
             suite_statistics = {'case_num': len(sub_suite.testcase_list), 'non_execution': 0, 'pass': 0, 'failed': 0, 'blocked': 0, 'skipped': 0}
@@ -68,7 +214,7 @@ def get_xmind_testsuite_list(xmind_file):
                 elif case.result == 4:
                     suite_statistics['skipped'] += 1
                 else:
-                    logging.warning('This testcase result is abnormal: %s, please check it: %s', case.result, case.to_dict())
+                    logging.warning('This testcase result is abnormal: %s, please check it: %s', case.result, case)
             sub_suite.statistics = suite_statistics
             for item in product_statistics:
                 product_statistics[item] += suite_statistics[item]
@@ -77,80 +223,229 @@ def get_xmind_testsuite_list(xmind_file):
         suite_data = testsuite.to_dict()
         suite_data_list.append(suite_data)
 
-    logging.info('Convert XMind file(%s) to testsuite data list successfully!', xmind_file)
-    return suite_data_list,max_length
+    return suite_data_list, max_length
 
 
+@profiled
 def get_xmind_testcase_list(xmind_file):
     """Load the XMind file and get all testcase in it
 
     :param xmind_file: the target XMind file
+    :param profile: True or a file to dump the cProfile stats, then return
+                    (testcase data list, `xmind2testcase.profiling.ConversionStats`)
     :return: a list of testcase data
     """
     xmind_file = get_absolute_path(xmind_file)
     logging.info('Start converting XMind file(%s) to testcases dict data...', xmind_file)
     testsuites = get_xmind_testsuites(xmind_file)
-    testcases = []
+    testcases = testsuites_to_testcase_list(testsuites)
+    logging.info('Convert XMind file(%s) to testcases dict data successfully!', xmind_file)
+    return testcases
+
 
+def testsuites_to_testcase_list(testsuites):
+    """Flatten the testsuites to a list of testcase data, each one has its product and suite name"""
+    return list(iter_testsuites_testcases(testsuites))
+
+
+def iter_testsuites_testcases(testsuites):
+    """Yield the testcase data of the testsuites one by one, each one has its product and suite name"""
     for testsuite in testsuites:
         product = testsuite.name
         for suite in testsuite.sub_suites:
             for case in suite.testcase_list:
-                case_data = case.to_dict()
-                case_data['product'] = product
-                case_data['suite'] = suite.name
-                testcases.append(case_data)
+                yield gen_testcase_data(product, suite.name, case)
+
+
+def iter_xmind_testcases(xmind_file, config=None, file_hash=None):
+    """Load the XMind file and yield its testcase data one by one, the same items as `get_xmind_testcase_list`.
+    The testcases are taken from the parse cache if there is one, or the parsing result is saved to the caches
+    if the disk cache is enabled, otherwise they are yielded straight from the parser without building the
+    testsuites, so the memory usage doesn't grow with the size of XMind file.
+    """
+    xmind_file = get_absolute_path(xmind_file)
+    testsuites = get_cached_xmind_testsuites(xmind_file, config, file_hash)
+    if testsuites is None and get_disk_cache():
+        testsuites = parse_and_cache_xmind_testsuites(xmind_file, config, file_hash)
+    if testsuites is not None:
+        for case_data in iter_testsuites_testcases(testsuites):
+            yield case_data
+        return
+
+    for product, suite_name, case in iter_testcases(load_xmind_file(xmind_file, config), config):
+        yield gen_testcase_data(product, suite_name, case)
+
+
+def gen_testcase_data(product, suite_name, case):
+    case_data = case.to_dict()
+    case_data['product'] = product
+    case_data['suite'] = suite_name
+    return case_data
 
-    logging.info('Convert XMind file(%s) to testcases dict data successfully!', xmind_file)
-    return testcases
 
+@profiled
+@traced
+def xmind_testsuite_to_json_file(xmind_file, config=None):
+    """Convert XMind file to a testsuite json file, the testsuite of every sheet is written once it's parsed
 
-def xmind_testsuite_to_json_file(xmind_file):
-    """Convert XMind file to a testsuite json file"""
+    :param xmind_file: the target XMind file
+    :param config: the parser config, such as {'filter': `xmind2testcase.filters.TestCaseFilter`}
+    :param profile: True or a file to dump the cProfile stats, then return
+                    (json file, `xmind2testcase.profiling.ConversionStats`)
+    """
     xmind_file = get_absolute_path(xmind_file)
     logging.info('Start converting XMind file(%s) to testsuites json file...', xmind_file)
-    testsuites = get_xmind_testsuite_list(xmind_file)
     testsuite_json_file = xmind_file[:-6] + '_testsuite.json'
+    file_hash = get_file_hash(xmind_file)
+    if is_cached_output(testsuite_json_file, 'testsuite_json', file_hash, config):
+        logging.info('The testsuite json file is up to date, return it directly: %s', testsuite_json_file)
+        return testsuite_json_file
 
-    if os.path.exists(testsuite_json_file):
-        os.remove(testsuite_json_file)
-        # logging.info('The testsuite json file already exists, return it directly: %s', testsuite_json_file)
-        # return testsuite_json_file
+    testsuites = iter_xmind_testsuites(xmind_file, config, file_hash)
+    suite_data_list = (testsuites_to_suite_list([testsuite])[0][0] for testsuite in testsuites)
 
-    with open(testsuite_json_file, 'w', encoding='utf8') as f:
-        f.write(json.dumps(testsuites, indent=4, separators=(',', ': '), ensure_ascii=False))
-        logging.info('Convert XMind file(%s) to a testsuite json file(%s) successfully!', xmind_file, testsuite_json_file)
+    with export_stage('testsuite_json', testsuite_json_file), \
+            atomic_open(testsuite_json_file, 'w', encoding='utf8') as f:
+        write_json_array(suite_data_list, f)
+    save_output(testsuite_json_file, 'testsuite_json', file_hash, config)
+    logging.info('Convert XMind file(%s) to a testsuite json file(%s) successfully!', xmind_file, testsuite_json_file)
 
     return testsuite_json_file
 
 
-def xmind_testcase_to_json_file(xmind_file):
-    """Convert XMind file to a testcase json file"""
+@profiled
+@traced
+def xmind_testcase_to_json_file(xmind_file, ndjson=False, config=None):
+    """Convert XMind file to a testcase json file, the testcases are written one by one while parsing
+
+    :param xmind_file: the target XMind file
+    :param ndjson: write a newline delimited json file(.ndjson) with a testcase per line instead of a json array
+    :param config: the parser config, such as {'filter': `xmind2testcase.filters.TestCaseFilter`}
+    :param profile: True or a file to dump the cProfile stats, then return
+                    (json file, `xmind2testcase.profiling.ConversionStats`)
+    """
     xmind_file = get_absolute_path(xmind_file)
     logging.info('Start converting XMind file(%s) to testcases json file...', xmind_file)
-    testcases = get_xmind_testcase_list(xmind_file)
-    testcase_json_file = xmind_file[:-6] + '.json'
+    testcase_json_file = xmind_file[:-6] + '.ndjson' if ndjson else JsonExporter().get_output_file(xmind_file)
+    file_hash = get_file_hash(xmind_file)
+    output_format = 'ndjson' if ndjson else 'json'
+    if is_cached_output(testcase_json_file, output_format, file_hash, config):
+        logging.info('The testcase json file is up to date, return it directly: %s', testcase_json_file)
+        return testcase_json_file
+
+    testcases = iter_xmind_testcases(xmind_file, config, file_hash)
+    testcases_to_json_file(testcases, testcase_json_file, ndjson)
+    save_output(testcase_json_file, output_format, file_hash, config)
+    logging.info('Convert XMind file(%s) to a testcase json file(%s) successfully!', xmind_file, testcase_json_file)
+
+    return testcase_json_file
 
-    if os.path.exists(testcase_json_file):
-        os.remove(testcase_json_file)
-        # logging.info('The testcase json file already exists, return it directly: %s', testcase_json_file)
-        # return testcase_json_file
 
-    with open(testcase_json_file, 'w', encoding='utf8') as f:
-        f.write(json.dumps(testcases, indent=4, separators=(',', ': '), ensure_ascii=False))
-        logging.info('Convert XMind file(%s) to a testcase json file(%s) successfully!', xmind_file, testcase_json_file)
+def testcases_to_json_file(testcases, testcase_json_file, ndjson=False):
+    """Write the testcase data to a json file one by one
+
+    :param testcases: a list or an iterator of testcase data
+    :param testcase_json_file: the output json file
+    :param ndjson: write a testcase per line instead of a json array
+    """
+    with export_stage('ndjson' if ndjson else 'json', testcase_json_file), \
+            atomic_open(testcase_json_file, 'w', encoding='utf8') as f:
+        if ndjson:
+            for testcase in testcases:
+                f.write(dumps_json_line(testcase))
+                f.write('\n')
+        else:
+            write_json_array(testcases, f)
 
     return testcase_json_file
 
 
-def export_to_excel(xmind_file,type=0):
+class JsonExporter(Exporter):
+    extension = '.json'
+    input = 'testcases'
+
+    def export(self, testcases, output_file, config=None):
+        return testcases_to_json_file(testcases, output_file)
+
+
+def write_json_array(items, f):
+    """Write the items as a json array chunk by chunk, the same content as
+    `json.dumps(list(items), indent=4, separators=(',', ': '), ensure_ascii=False)`"""
+    count = 0
+    for item in items:
+        f.write(',\n    ' if count else '[\n    ')
+        f.write(json.dumps(item, indent=4, separators=(',', ': '), ensure_ascii=False).replace('\n', '\n    '))
+        count += 1
+    f.write('\n]' if count else '[]')
+
+
+@lru_cache(maxsize=None)
+def import_orjson():
+    """The optional fast json serializer for ndjson output, it's imported on the first use to keep the startup fast"""
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+def dumps_json_line(item):
+    """Serialize an item to a compact json line, with the fast orjson if it's installed"""
+    orjson = import_orjson()
+    if orjson:
+        return orjson.dumps(item).decode('utf-8')
+    return json.dumps(item, separators=(',', ':'), ensure_ascii=False)
+
+
+@profiled
+@traced
+def export_to_excel(xmind_file,type=0, xlsx=False):
     """
     :param xmind_file: xmind文件
+    :param type: 2：只导出优先级为P0的用例，其余：导出全部用例
+    :param xlsx: 导出为.xlsx文件，每个画布一个工作表，画布解析完即写入，写入的行立即刷新到文件，不受.xls文件65536行的限制
+    :param profile: 性能分析：True或cProfile结果的输出文件，此时返回(excel文件, `xmind2testcase.profiling.ConversionStats`)
     :return: 返回excel文件
     """
+    # 解析时直接跳过不符合条件的用例
+    config = {'filter': TestCaseFilter(priorities=[0])} if type == 2 else None
+    if xlsx:
+        from xmind2testcase.xlsx import xmind_to_xlsx_file
+        return xmind_to_xlsx_file(xmind_file, config)
+
     xmind_file = get_absolute_path(xmind_file)
     logging.info('Start converting XMind file(%s) to testsuites json file...', xmind_file)
-    testsuites, max_length = get_xmind_testsuite_list(xmind_file)
+    testsuites = get_xmind_testsuites(xmind_file, config=config)
+    return testsuites_to_excel_file(testsuites, os.path.dirname(xmind_file))
+
+
+def testsuites_to_excel_file(testsuites, excel_dir):
+    """
+    :param testsuites: 解析好的`TestSuite`列表
+    :param excel_dir: excel文件的输出目录
+    :return: 返回excel文件
+    """
+    # excel文件以产品名称命名，写完才知道文件名
+    with export_stage('xls') as event:
+        event['output_file'] = write_excel_file(testsuites, excel_dir)
+    return event['output_file']
+
+
+class ExcelExporter(Exporter):
+    """.xls文件以产品名称命名，输出到XMind文件所在目录"""
+    extension = '.xls'
+    cacheable = False
+
+    def get_output_file(self, xmind_file):
+        return os.path.dirname(xmind_file)
+
+    def export(self, testsuites, output_file, config=None):
+        return testsuites_to_excel_file(testsuites, output_file)
+
+
+def write_excel_file(testsuites, excel_dir):
+    import xlwt  # 只在导出.xls文件时才加载
+    testsuites = [testsuite.dict_view() for testsuite in testsuites]
     max_length = 0
     first_row = ['模块','前置条件','用例名称','检查点','预期结果','优先级','备注']
 
@@ -200,9 +495,6 @@ def export_to_excel(xmind_file,type=0):
                     if len(case['steps']) > 0:
                         step_count = len(case['steps'])
                         for index, step in enumerate(case['steps']):
-                            # TODO：只写优先级为0的用例，不太好搞
-                            # if type == 2 and step['priority'] > 0:
-                            #     continue
                             worksheet.write(row, 3 + max_length, step['actions'].split('|')[-1])
                             if len(step['expectedresults']) > 0:
                                 worksheet.write(row, 4 + max_length, step['expectedresults'])
@@ -237,9 +529,9 @@ def export_to_excel(xmind_file,type=0):
                 row += 1
                 case_index += 1
 
-        workbook.save(os.path.join(os.path.dirname(xmind_file),file_name + '.xls'))
+        workbook.save(os.path.join(excel_dir,file_name + '.xls'))
 
-        return os.path.join(os.path.dirname(xmind_file),file_name + '.xls')
+        return os.path.join(excel_dir,file_name + '.xls')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from xmind2testcase.cache import get_file_hash
+from xmind2testcase.convert import xmind_to_testcase_files, DEFAULT_FORMATS
+
+"""
+Watch a directory and convert the XMind files again when they are saved:
+
+    xmind2testcase watch /path/to/dir --formats csv,xml
+
+The changes are read from inotify(pip install xmind2testcase[watch]) on Linux, or by polling the modification
+time and size of the XMind files. A save of XMind writes the file several times, so a file is converted only
+after it hasn't changed for the debounce time, and only if its content hash has changed since the last
+conversion. The conversions run in a bounded thread pool, one at a time per file, and the output files are
+written through temp files(see `xmind2testcase.output.atomic_open`), so readers never see a half-written file.
+"""
+
+DEFAULT_DEBOUNCE = 0.5
+POLL_INTERVAL = 1.0
+
+
+def is_xmind_file(path):
+    name = os.path.basename(path)
+    return name.endswith('.xmind') and not name.startswith(('.', '~'))
+
+
+def iter_xmind_files(root_dir):
+    for dir_path, dir_names, file_names in os.walk(root_dir):
+        dir_names[:] = [name for name in dir_names if not name.startswith('.')]
+        for name in file_names:
+            if is_xmind_file(name):
+                yield os.path.join(dir_path, name)
+
+
+class PollingObserver(object):
+    """Find the changed XMind files by comparing the modification time and size of every file"""
+
+    def __init__(self, root_dir, interval=POLL_INTERVAL):
+        self.root_dir = os.path.abspath(root_dir)
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for xmind_file in iter_xmind_files(self.root_dir):
+            try:
+                stat = os.stat(xmind_file)
+            except OSError:  # removed while scanning
+                continue
+            snapshot[xmind_file] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def read(self, timeout):
+        """Wait up to `timeout` seconds, return the XMind files created or modified since the last read"""
+        time.sleep(min(timeout, self.interval))
+        snapshot = self._scan()
+        changed = [path for path, state in snapshot.items() if self._snapshot.get(path) != state]
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyObserver(object):
+    """Find the changed XMind files by inotify, the sub directories are watched as well"""
+
+    def __init__(self, root_dir):
+        import inotify_simple  # optional: pip install xmind2testcase[watch]
+        self.root_dir = os.path.abspath(root_dir)
+        self._flags = inotify_simple.flags
+        self._watch_flags = (self._flags.CLOSE_WRITE | self._flags.MOVED_TO | self._flags.CREATE |
+                             self._flags.DELETE_SELF)
+        self._inotify = inotify_simple.INotify()
+        self._dirs = {}  # {watch descriptor: directory}
+        try:
+            for dir_path, dir_names, _ in os.walk(self.root_dir):
+                dir_names[:] = [name for name in dir_names if not name.startswith('.')]
+                self._add_watch(dir_path)
+        except OSError:  # e.g. the limit of inotify watches is reached
+            self.close()
+            raise
+
+    def _add_watch(self, dir_path):
+        self._dirs[self._inotify.add_watch(dir_path, self._watch_flags)] = dir_path
+
+    def read(self, timeout):
+        """Wait up to `timeout` seconds, return the XMind files written or moved in"""
+        changed = []
+        for event in self._inotify.read(timeout=int(timeout * 1000)):
+            dir_path = self._dirs.get(event.wd)
+            if dir_path is None:
+                continue
+            if event.mask & self._flags.DELETE_SELF:
+                self._dirs.pop(event.wd, None)
+                continue
+
+            path = os.path.join(dir_path, event.name)
+            if event.mask & self._flags.ISDIR:
+                if event.mask & (self._flags.CREATE | self._flags.MOVED_TO) and not event.name.startswith('.'):
+                    # a new directory: watch it, and take the XMind files already in it
+                    for sub_dir, dir_names, _ in os.walk(path):
+                        dir_names[:] = [name for name in dir_names if not name.startswith('.')]
+                        self._add_watch(sub_dir)
+                    changed.extend(iter_xmind_files(path))
+            elif is_xmind_file(event.name) and event.mask & (self._flags.CLOSE_WRITE | self._flags.MOVED_TO):
+                changed.append(path)
+        return changed
+
+    def close(self):
+        self._inotify.close()
+
+
+def get_observer(root_dir, polling=False):
+    """The inotify observer if it's available, otherwise the polling one"""
+    if not polling:
+        try:
+            return InotifyObserver(root_dir)
+        except ImportError:
+            logging.info('inotify_simple is not installed, poll the XMind files every %ss', POLL_INTERVAL)
+        except OSError as e:
+            logging.warning('Failed to watch %s by inotify(%s), poll the XMind files every %ss',
+                            root_dir, e, POLL_INTERVAL)
+    return PollingObserver(root_dir)
+
+
+class Watcher(object):
+
+    def __init__(self, root_dir, formats=DEFAULT_FORMATS, workers=None, debounce=DEFAULT_DEBOUNCE, config=None,
+                 observer=None, use_suite_cache=True):
+        """
+        Convert the XMind files in a directory when they are changed
+        :param root_dir: the directory to watch, including its sub directories
+        :param formats: output formats, see `xmind2testcase.convert.xmind_to_testcase_files`
+        :param workers: the max number of conversions at the same time
+        :param debounce: a file is converted after it hasn't changed for this many seconds
+        :param config: the parser config, such as {'filter': `xmind2testcase.filters.TestCaseFilter`}
+        :param observer: a `PollingObserver` or `InotifyObserver`, default to `get_observer(root_dir)`
+        :param use_suite_cache: parse only the changed testsuites of a saved XMind file, see
+                                `xmind2testcase.convert.xmind_to_testcase_files`
+        """
+        self.root_dir = os.path.abspath(root_dir)
+        self.formats = formats
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.debounce = debounce
+        self.config = config
+        self.observer = observer or get_observer(self.root_dir)
+        self.use_suite_cache = use_suite_cache
+        self._hashes = {}  # {xmind file: content hash of the last conversion}
+        self._pending = {}  # {xmind file: time of the last change}
+        self._running = {}  # {xmind file: future}
+        self._stopped = threading.Event()
+
+    def run(self, initial=True):
+        """Watch the directory until `stop` is called
+
+        :param initial: convert all the XMind files first, the up-to-date output files are kept as they are
+        """
+        logging.info('Start watching the XMind files in %s, converting to %s files...', self.root_dir,
+                     '、'.join(self.formats))
+        if initial:
+            now = time.monotonic() - self.debounce
+            self._pending.update((xmind_file, now) for xmind_file in iter_xmind_files(self.root_dir))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                while not self._stopped.is_set():
+                    self._collect_results()
+                    self._submit_ready_files(executor)
+                    timeout = self.debounce if self._pending or self._running else POLL_INTERVAL
+                    now = time.monotonic()
+                    for xmind_file in self.observer.read(timeout):
+                        # the same file is tracked by one path, whatever root directory the observer is given
+                        self._pending[os.path.abspath(xmind_file)] = now
+            finally:
+                self.observer.close()
+        self._collect_results()
+        logging.info('Stop watching the XMind files in %s', self.root_dir)
+
+    def stop(self):
+        self._stopped.set()
+
+    def _submit_ready_files(self, executor):
+        now = time.monotonic()
+        for xmind_file, changed_time in list(self._pending.items()):
+            # wait for the burst of writes to end, and for the running conversion of the same file
+            if now - changed_time < self.debounce or xmind_file in self._running:
+                continue
+            del self._pending[xmind_file]
+
+            try:
+                file_hash = get_file_hash(xmind_file)
+            except OSError:  # removed or renamed after the change
+                self._hashes.pop(xmind_file, None)
+                continue
+            if self._hashes.get(xmind_file) == file_hash:
+                logging.debug('The content of XMind file(%s) is not changed, skip it', xmind_file)
+                continue
+
+            self._hashes[xmind_file] = file_hash  # a broken file isn't converted again until it's changed
+            self._running[xmind_file] = executor.submit(xmind_to_testcase_files, xmind_file, self.formats,
+                                                        concurrent=False, config=self.config,
+                                                        use_suite_cache=self.use_suite_cache)
+
+    def _collect_results(self):
+        for xmind_file, future in list(self._running.items()):
+            if not future.done():
+                continue
+            del self._running[xmind_file]
+            try:
+                output_files = future.result()
+            except Exception as e:
+                logging.error('[FAILED] %s: %s: %s', xmind_file, type(e).__name__, e)
+            else:
+                logging.info('[OK] %s => %s', xmind_file, ', '.join(output_files.values()))
+
+
+def watch(root_dir, formats=DEFAULT_FORMATS, workers=None, debounce=DEFAULT_DEBOUNCE, config=None, polling=False):
+    """Watch the directory and convert the changed XMind files until it's interrupted"""
+    observer = get_observer(os.path.abspath(root_dir), polling)
+    watcher = Watcher(root_dir, formats, workers, debounce, config, observer=observer)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
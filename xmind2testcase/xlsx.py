@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import logging
+import re
+from xmind2testcase.cache import get_file_hash
+from xmind2testcase.exporters import Exporter
+from xmind2testcase.output import atomic_open, export_stage
+from xmind2testcase.profiling import profiled
+from xmind2testcase.trace import traced
+from xmind2testcase.utils import get_absolute_path, is_cached_output, iter_xmind_testsuites, save_output
+
+try:
+    import xlsxwriter
+except ImportError:  # optional: pip install xmind2testcase[xlsx]
+    xlsxwriter = None
+
+"""
+Convert XMind file to an excel(.xlsx) testcase file, every sheet of XMind file goes to its own worksheet
+
+The testsuites are parsed and written one by one, and a worksheet holds 1,048,576 rows instead of the 65,536 rows
+of the legacy .xls file. The rows are flushed to the file as soon as they are written(xlsxwriter's constant_memory
+mode), so they are written strictly in order: the module, precondition and case name of several rows are written
+to the first row, the cells below it are formatted blanks instead of a merged range, since `merge_range` writes
+all the rows of the range at once.
+"""
+
+FIRST_ROW = ['模块', '前置条件', '用例名称', '检查点', '预期结果', '优先级', '备注']
+COL_MODULE, COL_PRECONDITIONS, COL_CASE, COL_ACTIONS, COL_EXPECTED, COL_PRIORITY, COL_REMARK = range(len(FIRST_ROW))
+SHEET_NAME_LENGTH = 31  # the max length of a worksheet name in excel
+
+
+@profiled
+@traced
+def xmind_to_xlsx_file(xmind_file, config=None):
+    """Convert XMind file to an excel(.xlsx) file, the testsuite of every sheet is written once it's parsed
+
+    :param xmind_file: the target XMind file
+    :param config: the parser config, such as {'filter': `xmind2testcase.filters.TestCaseFilter`}
+    :param profile: True or a file to dump the cProfile stats, then return
+                    (xlsx file, `xmind2testcase.profiling.ConversionStats`)
+    """
+    xmind_file = get_absolute_path(xmind_file)
+    logging.info('Start converting XMind file(%s) to xlsx file...', xmind_file)
+    xlsx_file = XlsxExporter().get_output_file(xmind_file)
+    file_hash = get_file_hash(xmind_file)
+    if is_cached_output(xlsx_file, 'xlsx', file_hash, config):
+        logging.info('The xlsx file is up to date, return it directly: %s', xlsx_file)
+        return xlsx_file
+
+    testsuites_to_xlsx_file(iter_xmind_testsuites(xmind_file, config, file_hash), xlsx_file)
+    save_output(xlsx_file, 'xlsx', file_hash, config)
+    logging.info('Convert XMind file(%s) to a xlsx file(%s) successfully!', xmind_file, xlsx_file)
+
+    return xlsx_file
+
+
+class XlsxExporter(Exporter):
+    extension = '.xlsx'
+
+    def export(self, testsuites, output_file, config=None):
+        return testsuites_to_xlsx_file(testsuites, output_file)
+
+
+def testsuites_to_xlsx_file(testsuites, xlsx_file):
+    """Write the testsuites to an excel(.xlsx) file, a worksheet per testsuite
+
+    :param testsuites: a list or an iterator of `xmind2testcase.metadata.TestSuite`
+    :param xlsx_file: the output xlsx file
+    """
+    if xlsxwriter is None:
+        raise ImportError('Exporting xlsx file requires xlsxwriter, please run: pip install xmind2testcase[xlsx]')
+
+    with export_stage('xlsx', xlsx_file), atomic_open(xlsx_file, 'wb') as f:
+        workbook = xlsxwriter.Workbook(f, {'constant_memory': True, 'strings_to_formulas': False,
+                                           'strings_to_urls': False})
+        formats = {
+            'first_row': workbook.add_format({'font_size': 15, 'pattern': 1, 'bg_color': '#008080'}),
+            'grouped': workbook.add_format({'valign': 'top'}),
+        }
+        sheet_names = set()
+
+        for testsuite in testsuites:
+            sheet_name = gen_sheet_name(testsuite.name, sheet_names)
+            sheet_names.add(sheet_name.lower())
+            write_testsuite_worksheet(workbook.add_worksheet(sheet_name), testsuite, formats)
+
+        if not sheet_names:
+            workbook.add_worksheet()
+        workbook.close()
+
+    return xlsx_file
+
+
+def write_testsuite_worksheet(worksheet, testsuite, formats):
+    """Write a testsuite to the worksheet row by row, a row can't be written again once a later row is started"""
+    worksheet.set_column(COL_MODULE, COL_REMARK, 19.5)
+    for col, title in enumerate(FIRST_ROW):
+        worksheet.write_string(0, col, title, formats['first_row'])
+
+    last_row = 0
+    for last_row, values in enumerate(iter_testsuite_rows(testsuite), 1):
+        for col, value in enumerate(values):
+            write_cell(worksheet, last_row, col, value, formats['grouped'] if col <= COL_CASE else None)
+
+    if last_row >= worksheet.xls_rowmax:
+        logging.warning('The testsuite(%s) has %s rows, only the first %s rows are written to the xlsx file',
+                        testsuite.name, last_row + 1, worksheet.xls_rowmax)
+
+
+def iter_testsuite_rows(testsuite):
+    """The cell values of the rows of a testsuite, a row per teststep, the module, precondition and case name
+    are only in the first row of their teststeps, the cells below it are None"""
+    for module in testsuite.sub_suites:
+        if not module.testcase_list:
+            yield [module.name]
+            continue
+
+        module_name = module.name
+        for case in module.testcase_list:
+            if not case.steps:
+                yield [module_name, case.preconditions, case.name, None, None, case.importance, case.remark]
+                module_name = None
+                continue
+
+            preconditions, case_name = case.preconditions, case.name
+            for step in case.steps:
+                yield [module_name, preconditions, case_name, step.actions.split('|')[-1], step.expectedresults,
+                       step.priority, step.remark]
+                module_name = preconditions = case_name = None
+
+
+def get_cell_value(value):
+    """A number, a string, or None for a blank cell"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return str(value) if value else None
+
+
+def write_cell(worksheet, row, col, value, cell_format=None):
+    value = get_cell_value(value)
+    if isinstance(value, str):
+        worksheet.write_string(row, col, value, cell_format)
+    elif value is not None:
+        worksheet.write_number(row, col, value, cell_format)
+    elif cell_format:
+        worksheet.write_blank(row, col, None, cell_format)
+
+
+def gen_sheet_name(name, used_names):
+    """A unique worksheet name that excel accepts: no more than 31 chars and none of []:*?/\\"""
+    name = re.sub(r'[\[\]:*?/\\]', '_', name or '').strip("'") or 'Sheet'
+    sheet_name = name[:SHEET_NAME_LENGTH]
+    index = 1
+    while sheet_name.lower() in used_names:  # excel compares the worksheet names case insensitively
+        index += 1
+        suffix = '({})'.format(index)
+        sheet_name = name[:SHEET_NAME_LENGTH - len(suffix)] + suffix
+    return sheet_name
+
+
+if __name__ == '__main__':
+    xmind_file = '../docs/xmind_testcase_template_v1.1.xmind'
+    xlsx_file = xmind_to_xlsx_file(xmind_file)
+    print('Convert XMind file to xlsx file successfully: %s' % xlsx_file)
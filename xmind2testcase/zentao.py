@@ -2,8 +2,12 @@
 # _*_ coding:utf-8 _*_
 import csv
 import logging
-import os
-from xmind2testcase.utils import get_xmind_testcase_list, get_absolute_path
+from xmind2testcase.cache import get_file_hash
+from xmind2testcase.exporters import Exporter
+from xmind2testcase.output import atomic_open, export_stage
+from xmind2testcase.profiling import profiled
+from xmind2testcase.trace import traced
+from xmind2testcase.utils import iter_xmind_testcases, get_absolute_path, is_cached_output, save_output
 
 """
 Convert XMind fie to Zentao testcase csv file 
@@ -12,28 +16,56 @@ Zentao official document about import CSV testcase file: https://www.zentao.net/
 """
 
 
-def xmind_to_zentao_csv_file(xmind_file):
-    """Convert XMind file to a zentao csv file"""
+@profiled
+@traced
+def xmind_to_zentao_csv_file(xmind_file, encoding='utf8', config=None):
+    """Convert XMind file to a zentao csv file, the testcases are written one by one while parsing
+
+    :param xmind_file: the target XMind file
+    :param encoding: the csv file encoding, older zentao versions only import a 'gbk' encoded csv file,
+                     a character that can't be encoded is replaced with '?'
+    :param config: the parser config, such as {'filter': `xmind2testcase.filters.TestCaseFilter`}
+    :param profile: True or a file to dump the cProfile stats, then return
+                    (csv file, `xmind2testcase.profiling.ConversionStats`)
+    """
     xmind_file = get_absolute_path(xmind_file)
     logging.info('Start converting XMind file(%s) to zentao file...', xmind_file)
-    testcases = get_xmind_testcase_list(xmind_file)
+    zentao_file = ZentaoExporter().get_output_file(xmind_file)
+    file_hash = get_file_hash(xmind_file)
+    options = None if encoding == 'utf8' else {'encoding': encoding}
+    if is_cached_output(zentao_file, 'csv', file_hash, config, options):
+        logging.info('The zentao csv file is up to date, return it directly: %s', zentao_file)
+        return zentao_file
+
+    testcases = iter_xmind_testcases(xmind_file, config, file_hash)
+    testcases_to_zentao_csv_file(testcases, zentao_file, encoding)
+    save_output(zentao_file, 'csv', file_hash, config, options)
+    logging.info('Convert XMind file(%s) to a zentao csv file(%s) successfully!', xmind_file, zentao_file)
+
+    return zentao_file
+
+
+class ZentaoExporter(Exporter):
+    extension = '.csv'
+    input = 'testcases'
 
+    def export(self, testcases, output_file, config=None):
+        return testcases_to_zentao_csv_file(testcases, output_file)
+
+
+def testcases_to_zentao_csv_file(testcases, zentao_file, encoding='utf8'):
+    """Write the testcase data to a zentao csv file row by row
+
+    :param testcases: a list or an iterator of testcase data
+    :param zentao_file: the output csv file
+    :param encoding: the csv file encoding, a character that can't be encoded is replaced with '?'
+    """
     fileheader = ["所属模块", "用例标题", "前置条件", "步骤", "预期", "关键词", "优先级", "用例类型", "适用阶段"]
-    zentao_testcase_rows = [fileheader]
-    for testcase in testcases:
-        row = gen_a_testcase_row(testcase)
-        zentao_testcase_rows.append(row)
-
-    zentao_file = xmind_file[:-6] + '.csv'
-    if os.path.exists(zentao_file):
-        os.remove(zentao_file)
-        # logging.info('The zentao csv file already exists, return it directly: %s', zentao_file)
-        # return zentao_file
-
-    with open(zentao_file, 'w', encoding='utf8') as f:
+
+    with export_stage('csv', zentao_file), atomic_open(zentao_file, 'w', encoding=encoding, errors='replace') as f:
         writer = csv.writer(f)
-        writer.writerows(zentao_testcase_rows)
-        logging.info('Convert XMind file(%s) to a zentao csv file(%s) successfully!', xmind_file, zentao_file)
+        writer.writerow(fileheader)
+        writer.writerows(gen_a_testcase_row(testcase) for testcase in testcases)
 
     return zentao_file
 
@@ -61,14 +93,11 @@ def gen_case_module(module_name):
 
 
 def gen_case_step_and_expected_result(steps):
-    case_step = ''
-    case_expected_result = ''
-
-    for step_dict in steps:
-        case_step += str(step_dict['step_number']) + '. ' + step_dict['actions'].replace('\n', '').strip() + '\n'
-        case_expected_result += str(step_dict['step_number']) + '. ' + \
-            step_dict['expectedresults'].replace('\n', '').strip() + '\n' \
-            if step_dict.get('expectedresults', '') else ''
+    case_step = ''.join('{}. {}\n'.format(step_dict['step_number'], step_dict['actions'].replace('\n', '').strip())
+                        for step_dict in steps)
+    case_expected_result = ''.join(
+        '{}. {}\n'.format(step_dict['step_number'], step_dict['expectedresults'].replace('\n', '').strip())
+        for step_dict in steps if step_dict.get('expectedresults', ''))
 
     return case_step, case_expected_result
 